@@ -0,0 +1,28 @@
+"""Add composite index on practice topics by profile
+
+Revision ID: 3b7d2a9c41e6
+Revises: 8e41b07c2d95
+Create Date: 2026-10-19 14:12:40.218311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7d2a9c41e6'
+down_revision: Union[str, Sequence[str], None] = '8e41b07c2d95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_practice_topics_language_profile_id_id', 'practice_topics', ['language_profile_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_practice_topics_language_profile_id_id', table_name='practice_topics')
@@ -0,0 +1,29 @@
+from fastapi import Depends
+
+from app.bulk.services import BulkTransferService
+from app.language_profiles.dependencies import (
+    get_language_profile_repository,
+    get_practice_topic_repository,
+)
+from app.language_profiles.repositories import (
+    LanguageProfileRepository,
+    PracticeTopicRepository,
+)
+from app.personas.dependencies import get_persona_repository
+from app.personas.repositories import PersonaRepository
+
+
+def get_bulk_transfer_service(
+    persona_repository: PersonaRepository = Depends(get_persona_repository),
+    language_profile_repository: LanguageProfileRepository = Depends(
+        get_language_profile_repository
+    ),
+    practice_topic_repository: PracticeTopicRepository = Depends(
+        get_practice_topic_repository
+    ),
+) -> BulkTransferService:
+    return BulkTransferService(
+        persona_repository=persona_repository,
+        language_profile_repository=language_profile_repository,
+        practice_topic_repository=practice_topic_repository,
+    )
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.bulk.dependencies import get_bulk_transfer_service
+from app.bulk.schemas import ImportReport
+from app.bulk.services import BulkTransferService, stream_export
+
+router = APIRouter()
+
+
+@router.post("/import", response_model=ImportReport, name="import_content")
+async def import_content(
+    request: Request,
+    service: BulkTransferService = Depends(get_bulk_transfer_service),
+):
+    """JSONL body, one persona, language profile or practice topic per line."""
+    return await service.import_records(request.stream())
+
+
+@router.get("/export", name="export_content")
+async def export_content():
+    return StreamingResponse(
+        stream_export(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="content.jsonl"'},
+    )
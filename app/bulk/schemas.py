@@ -0,0 +1,50 @@
+from typing import Annotated, Literal, Union
+
+from pydantic import BaseModel, Field, TypeAdapter, model_validator
+
+from app.language_profiles.schemas import LanguageProfileCreate, PracticeTopicCreate
+from app.personas.schemas import PersonaCreate
+
+
+# Records, one JSON object per line of an import or export
+class PersonaRecord(PersonaCreate):
+    type: Literal["persona"]
+
+
+class LanguageProfileRecord(LanguageProfileCreate):
+    type: Literal["language_profile"]
+    # lets topics further down the same file point at this profile
+    ref: str | None = None
+
+
+class PracticeTopicRecord(PracticeTopicCreate):
+    type: Literal["practice_topic"]
+    language_profile_id: int | None = None
+    language_profile_ref: str | None = None
+
+    @model_validator(mode="after")
+    def check_profile(self):
+        if (self.language_profile_id is None) == (self.language_profile_ref is None):
+            raise ValueError("needs exactly one of language_profile_id and language_profile_ref")
+        return self
+
+
+Record = Annotated[
+    Union[PersonaRecord, LanguageProfileRecord, PracticeTopicRecord], Field(discriminator="type")
+]
+record_adapter = TypeAdapter(Record)
+
+
+# Import report
+class RowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    created: dict[str, int] = {"persona": 0, "language_profile": 0, "practice_topic": 0}
+    # ids of the created profiles that had a ref
+    language_profile_ids: dict[str, int] = {}
+    # the first BULK_MAX_REPORTED_ERRORS of errors_total
+    errors: list[RowError] = []
+    errors_total: int = 0
@@ -0,0 +1,243 @@
+"""
+Bulk import and export of personas, language profiles and practice topics as JSONL,
+one record per line (see app.bulk.schemas):
+
+    {"type": "persona", "name": "Barista", "prompt": "..."}
+    {"type": "language_profile", "ref": "es-a1", "name": "Spanish A1", "target_language": "es"}
+    {"type": "practice_topic", "language_profile_ref": "es-a1", "name": "Ordering food"}
+
+Topics point at a profile of the same file by its ref, or at an existing one by
+language_profile_id. Both directions stream: the import reads the body line by line
+and inserts BULK_BATCH_SIZE rows per statement, the export reads keyset batches and
+writes them out as it goes. What stays in memory is a batch, plus one id per profile
+to resolve topic references. The inserts run in a worker thread, the body is read on
+the event loop.
+"""
+import asyncio
+import json
+import logging
+from typing import AsyncIterable, AsyncIterator, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.bulk.schemas import (
+    ImportReport,
+    LanguageProfileRecord,
+    PersonaRecord,
+    PracticeTopicRecord,
+    RowError,
+    record_adapter,
+)
+from app.core.config import get_settings
+from app.core.db import get_engine
+from app.core.metrics import metrics
+from app.language_profiles.repositories import LanguageProfileRepository, PracticeTopicRepository
+from app.personas.repositories import PersonaRepository
+
+logger = logging.getLogger(__name__)
+
+# flushed in this order, so profiles are in before the topics that point at them
+_RECORD_TYPES = ("persona", "language_profile", "practice_topic")
+
+
+async def read_lines(chunks: AsyncIterable[bytes], max_line_bytes: int) -> AsyncIterator[tuple[int, bytes | None]]:
+    """Numbered lines of a byte stream. Lines longer than max_line_bytes come out as None."""
+    line_number = 0
+    pending = b""
+    too_long = False
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line_number += 1
+            yield line_number, None if too_long else line
+            too_long = False
+        if len(pending) > max_line_bytes:
+            # drop what was read so far, the rest of the line is dropped when it ends
+            pending = b""
+            too_long = True
+    if pending or too_long:
+        yield line_number + 1, None if too_long else pending
+
+
+def _describe(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+class _Import:
+    """Rows waiting for their batch insert, the profile refs seen so far and the report."""
+
+    def __init__(self, max_reported_errors: int):
+        self.max_reported_errors = max_reported_errors
+        self.pending: dict[str, list[tuple[int, PersonaRecord | LanguageProfileRecord | PracticeTopicRecord]]] = {
+            record_type: [] for record_type in _RECORD_TYPES
+        }
+        # refs of profiles read so far, inserted or not
+        self.claimed_refs: set[str] = set()
+        self.report = ImportReport()
+
+    def reject(self, line: int, error: str):
+        self.report.errors_total += 1
+        if len(self.report.errors) < self.max_reported_errors:
+            self.report.errors.append(RowError(line=line, error=error))
+
+
+class BulkTransferService:
+    def __init__(
+        self,
+        persona_repository: PersonaRepository,
+        language_profile_repository: LanguageProfileRepository,
+        practice_topic_repository: PracticeTopicRepository,
+    ):
+        self.persona_repository = persona_repository
+        self.language_profile_repository = language_profile_repository
+        self.practice_topic_repository = practice_topic_repository
+
+    async def import_records(self, chunks: AsyncIterable[bytes]) -> ImportReport:
+        """
+        Imports the JSONL in `chunks`. Lines that are not a valid record, or point at a
+        profile that does not exist, are skipped and reported by line number; the
+        rest is inserted in the caller's transaction.
+        """
+        settings = get_settings()
+        batch_size = settings.BULK_BATCH_SIZE
+        state = _Import(max_reported_errors=settings.BULK_MAX_REPORTED_ERRORS)
+
+        async for line_number, line in read_lines(chunks, settings.BULK_MAX_LINE_BYTES):
+            if line is None:
+                state.reject(line_number, f"line is longer than {settings.BULK_MAX_LINE_BYTES} bytes")
+                continue
+            if not line.strip():
+                continue
+            try:
+                record = record_adapter.validate_json(line)
+            except ValidationError as e:
+                state.reject(line_number, _describe(e))
+                continue
+            if isinstance(record, LanguageProfileRecord) and record.ref is not None:
+                if record.ref in state.claimed_refs:
+                    state.reject(line_number, f"ref {record.ref!r} is already used by another profile")
+                    continue
+                state.claimed_refs.add(record.ref)
+            if isinstance(record, PracticeTopicRecord) and record.language_profile_ref is not None:
+                if record.language_profile_ref not in state.claimed_refs:
+                    state.reject(line_number, f"no profile with ref {record.language_profile_ref!r} before this line")
+                    continue
+
+            state.pending[record.type].append((line_number, record))
+            if len(state.pending[record.type]) >= batch_size:
+                await asyncio.to_thread(self._flush, state, record.type)
+
+        for record_type in _RECORD_TYPES:
+            await asyncio.to_thread(self._flush, state, record_type)
+        # topics pointing at missing profiles are only rejected when their batch is flushed
+        state.report.errors.sort(key=lambda error: error.line)
+        for record_type, created in state.report.created.items():
+            metrics.increment("bulk_import_rows_total", created, type=record_type, result="created")
+        metrics.increment("bulk_import_rows_total", state.report.errors_total, result="rejected")
+        logger.info("Imported %s, rejected %d lines.", state.report.created, state.report.errors_total)
+        return state.report
+
+    def _flush(self, state: _Import, record_type: str):
+        if record_type == "practice_topic":
+            # topics may point at profiles that are still waiting for their insert
+            self._flush(state, "language_profile")
+        pending, state.pending[record_type] = state.pending[record_type], []
+        if not pending:
+            return
+
+        if record_type == "persona":
+            rows = [record.model_dump(exclude={"type"}) for _, record in pending]
+            self.persona_repository.insert_many(rows)
+        elif record_type == "language_profile":
+            rows = [record.model_dump(exclude={"type", "ref"}) for _, record in pending]
+            ids = self.language_profile_repository.insert_many_returning_ids(rows)
+            for (_, record), profile_id in zip(pending, ids):
+                if record.ref is not None:
+                    state.report.language_profile_ids[record.ref] = profile_id
+        else:
+            rows = self._topic_rows(state, pending)
+            self.practice_topic_repository.insert_many(rows)
+        state.report.created[record_type] += len(rows)
+
+    def _topic_rows(self, state: _Import, pending: list[tuple[int, PracticeTopicRecord]]) -> list[dict]:
+        existing = self.language_profile_repository.existing_ids(
+            record.language_profile_id for _, record in pending if record.language_profile_id is not None
+        )
+        rows = []
+        for line_number, record in pending:
+            if record.language_profile_ref is not None:
+                # checked when the line was read, and profiles are flushed first
+                profile_id = state.report.language_profile_ids[record.language_profile_ref]
+            elif record.language_profile_id in existing:
+                profile_id = record.language_profile_id
+            else:
+                state.reject(line_number, f"language profile {record.language_profile_id} does not exist")
+                continue
+            rows.append({"name": record.name, "language_profile_id": profile_id})
+        return rows
+
+    def export_records(self) -> Iterator[str]:
+        """
+        Every persona, profile and topic as JSONL, a batch of lines per chunk. Profiles
+        get their id as ref, so the export imports into another database as it is.
+        """
+        batch_size = get_settings().BULK_BATCH_SIZE
+        yield from self._export_lines(self.persona_repository, batch_size, lambda row: {
+            "type": "persona", "name": row["name"], "prompt": row["prompt"],
+        })
+
+        exported_profiles = set()
+
+        def profile_record(row) -> dict:
+            exported_profiles.add(row["id"])
+            return {
+                "type": "language_profile",
+                "ref": str(row["id"]),
+                "name": row["name"],
+                "target_language": row["target_language"],
+                "feedback_mode": row["feedback_mode"],
+            }
+
+        def topic_record(row) -> dict | None:
+            # a profile created while the export ran is not in it, neither are its topics
+            if row["language_profile_id"] not in exported_profiles:
+                return None
+            return {
+                "type": "practice_topic",
+                "language_profile_ref": str(row["language_profile_id"]),
+                "name": row["name"],
+            }
+
+        yield from self._export_lines(self.language_profile_repository, batch_size, profile_record)
+        yield from self._export_lines(self.practice_topic_repository, batch_size, topic_record)
+
+    @staticmethod
+    def _export_lines(repository, batch_size: int, to_record) -> Iterator[str]:
+        lines = []
+        for row in repository.iter_rows(batch_size=batch_size):
+            record = to_record(row)
+            if record is not None:
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            if len(lines) >= batch_size:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
+
+
+def stream_export() -> Iterator[str]:
+    """
+    The export on a session of its own, since the response is streamed after the
+    request's session is gone.
+    """
+    with Session(get_engine()) as db:
+        service = BulkTransferService(
+            persona_repository=PersonaRepository(db=db),
+            language_profile_repository=LanguageProfileRepository(db=db),
+            practice_topic_repository=PracticeTopicRepository(db=db),
+        )
+        yield from service.export_records()
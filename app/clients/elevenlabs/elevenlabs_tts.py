@@ -1,6 +1,7 @@
 from typing import AsyncGenerator, Optional
 
 from elevenlabs import VoiceSettings
+from websockets.asyncio.client import ClientConnection
 
 from app.clients.elevenlabs.patched_elevenlabs import AsyncRealtimeTextToSpeechClient
 
@@ -28,16 +29,35 @@ class ElevenLabsTTS:
         )
         self.model_id = model_id
         self.output_format = output_format
+        self._warm_socket: Optional[ClientConnection] = None
+
+    async def prewarm(self, inactivity_timeout: int = 60):
+        """Opens the TTS socket ahead of time, the next `stream` call picks it up."""
+        if self._warm_socket is None:
+            self._warm_socket = await self.realtime_client.open_stream_socket(
+                self.voice_id,
+                voice_settings=self.voice_settings,
+                model_id=self.model_id,
+                output_format=self.output_format,
+                inactivity_timeout=inactivity_timeout,
+            )
+
+    async def release(self):
+        socket, self._warm_socket = self._warm_socket, None
+        if socket is not None:
+            await socket.close()
 
     async def stream(
         self, text: AsyncGenerator[str, None]
     ) -> AsyncGenerator[bytes, None]:
+        socket, self._warm_socket = self._warm_socket, None
         audio_stream = self.realtime_client.convert_realtime(
             text=text,
             voice_id=self.voice_id,
             voice_settings=self.voice_settings,
             model_id=self.model_id,
             output_format=self.output_format,
+            socket=socket,
         )
         async for chunk in audio_stream:
             yield chunk
@@ -5,6 +5,8 @@ import typing
 import urllib.parse
 
 import websockets
+from websockets.asyncio.client import ClientConnection
+from websockets.protocol import State
 from elevenlabs.core.api_error import ApiError
 from elevenlabs.core.client_wrapper import AsyncClientWrapper
 from elevenlabs.core.jsonable_encoder import jsonable_encoder
@@ -46,24 +48,27 @@ class AsyncRealtimeTextToSpeechClient(AsyncTextToSpeechClient):
             .geturl()
         )
 
-    async def convert_realtime(
+    async def open_stream_socket(
         self,
         voice_id: str,
         *,
-        text: typing.AsyncIterator[str],
         model_id: typing.Optional[str] = OMIT,
         output_format: typing.Optional[OutputFormat] = "mp3_44100_128",
         voice_settings: typing.Optional[VoiceSettings] = OMIT,
+        inactivity_timeout: typing.Optional[int] = None,
         request_options: typing.Optional[RequestOptions] = None,
-    ) -> typing.AsyncIterator[bytes]:
+    ) -> ClientConnection:
         """
-        Asynchronously converts text into speech using a voice of your choice and returns audio.
-        This is a patched, async-native version of the synchronous `convert_realtime` method.
+        Opens the stream-input websocket and sends the initial message, so it can be
+        done ahead of time (e.g. while the user is still typing) and handed to
+        `convert_realtime` later. The caller owns the returned socket.
         """
         url = urllib.parse.urljoin(
             self._ws_base_url,
             f"v1/text-to-speech/{jsonable_encoder(voice_id)}/stream-input?model_id={model_id}&output_format={output_format}",
         )
+        if inactivity_timeout is not None:
+            url += f"&inactivity_timeout={inactivity_timeout}"
         headers = remove_none_from_dict(
             {
                 **self._client_wrapper.get_headers(),
@@ -75,27 +80,55 @@ class AsyncRealtimeTextToSpeechClient(AsyncTextToSpeechClient):
             }
         )
 
-        async with websockets.connect(
+        socket = await websockets.connect(
             url, additional_headers=jsonable_encoder(headers)
-        ) as socket:
-            try:
-                await socket.send(
-                    json.dumps(
-                        dict(
-                            text=" ",
-                            try_trigger_generation=True,
-                            voice_settings=voice_settings.dict()
-                            if voice_settings
-                            else None,
-                            generation_config=dict(
-                                chunk_length_schedule=[50],
-                            ),
-                        )
+        )
+        try:
+            await socket.send(
+                json.dumps(
+                    dict(
+                        text=" ",
+                        try_trigger_generation=True,
+                        voice_settings=voice_settings.dict()
+                        if voice_settings
+                        else None,
+                        generation_config=dict(
+                            chunk_length_schedule=[50],
+                        ),
                     )
                 )
-            except websockets.exceptions.ConnectionClosedError as ce:
-                raise ApiError(body=ce.reason, status_code=ce.code)
+            )
+        except websockets.exceptions.ConnectionClosedError as ce:
+            await socket.close()
+            raise ApiError(body=ce.reason, status_code=ce.code)
+        return socket
+
+    async def convert_realtime(
+        self,
+        voice_id: str,
+        *,
+        text: typing.AsyncIterator[str],
+        model_id: typing.Optional[str] = OMIT,
+        output_format: typing.Optional[OutputFormat] = "mp3_44100_128",
+        voice_settings: typing.Optional[VoiceSettings] = OMIT,
+        request_options: typing.Optional[RequestOptions] = None,
+        socket: typing.Optional[ClientConnection] = None,
+    ) -> typing.AsyncIterator[bytes]:
+        """
+        Asynchronously converts text into speech using a voice of your choice and returns audio.
+        This is a patched, async-native version of the synchronous `convert_realtime` method.
+        A socket from `open_stream_socket` is used (and closed) if it is still open.
+        """
+        if socket is None or socket.state is not State.OPEN:
+            socket = await self.open_stream_socket(
+                voice_id,
+                model_id=model_id,
+                output_format=output_format,
+                voice_settings=voice_settings,
+                request_options=request_options,
+            )
 
+        async with socket:
             data: dict = {}
             try:
                 async for text_chunk in text_chunker(text):
@@ -120,4 +153,4 @@ class AsyncRealtimeTextToSpeechClient(AsyncTextToSpeechClient):
                 if "message" in data:
                     raise ApiError(body=data, status_code=ce.code)
                 elif ce.code != 1000:
-                    raise ApiError(body=ce.reason, status_code=ce.code)
\ No newline at end of file
+                    raise ApiError(body=ce.reason, status_code=ce.code)
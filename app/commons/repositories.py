@@ -1,6 +1,8 @@
-from typing import Any, Generic, Type, TypeVar
+from dataclasses import dataclass
+from typing import Any, Generic, Iterable, Iterator, Sequence, Type, TypeVar
 
 from pydantic import BaseModel
+from sqlalchemy import RowMapping, insert, select
 from sqlalchemy.orm import Session
 
 from app.core.db import Base
@@ -8,6 +10,13 @@ from app.core.db import Base
 ModelType = TypeVar("ModelType", bound=Base)
 
 
+@dataclass
+class Page(Generic[ModelType]):
+    items: Sequence[ModelType]
+    # `before` of the next page, None on the last one
+    next_cursor: int | None
+
+
 class BaseRepository(Generic[ModelType]):
     model: Type[ModelType]
 
@@ -17,6 +26,62 @@ class BaseRepository(Generic[ModelType]):
     def get(self, pk: Any) -> ModelType | None:
         return self.db.get(self.model, pk)
 
+    def list_page(self, *, before: int | None = None, limit: int) -> Page[ModelType]:
+        """
+        Keyset page of rows, newest first: the `limit` rows with the highest ids below
+        `before`. Unlike an offset, the cost does not grow with how far the user scrolled.
+        """
+        statement = select(self.model).order_by(self.model.id.desc()).limit(limit + 1)
+        if before is not None:
+            statement = statement.where(self.model.id < before)
+        rows = self.db.execute(statement).scalars().all()
+        if len(rows) > limit:
+            return Page(items=rows[:limit], next_cursor=rows[limit - 1].id)
+        return Page(items=rows, next_cursor=None)
+
+    def iter_rows(self, *, batch_size: int) -> Iterator[RowMapping]:
+        """
+        Every row as a mapping of its columns, in id order. Read in keyset batches of
+        plain rows, so neither the result nor the session grows with the table.
+        """
+        columns = self.model.__table__.columns
+        last_id = None
+        while True:
+            statement = select(*columns).order_by(self.model.id).limit(batch_size)
+            if last_id is not None:
+                statement = statement.where(self.model.id > last_id)
+            rows = self.db.execute(statement).mappings().all()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]["id"]
+
+    def existing_ids(self, ids: Iterable[int]) -> set[int]:
+        ids = set(ids)
+        if not ids:
+            return set()
+        return set(self.db.execute(select(self.model.id).where(self.model.id.in_(ids))).scalars())
+
+    def insert_many(self, rows: Sequence[dict]):
+        """
+        Inserts `rows` as one executemany, sent as multi-row INSERT statements where
+        the driver supports it, instead of a flush and a refresh per row. Nothing is
+        loaded into the session.
+        """
+        if rows:
+            self.db.execute(insert(self.model), rows)
+
+    def insert_many_returning_ids(self, rows: Sequence[dict]) -> Sequence[int]:
+        """
+        Like insert_many, and returns the new ids in the order of `rows`. PostgreSQL
+        sends it as multi-row INSERT ... RETURNING; SQLite cannot promise the order of
+        RETURNING rows, so SQLAlchemy sends its rows one at a time.
+        """
+        if not rows:
+            return []
+        statement = insert(self.model).returning(self.model.id, sort_by_parameter_order=True)
+        return self.db.execute(statement, rows).scalars().all()
+
     def create(self, obj_in: BaseModel) -> ModelType:
         db_obj = self.model(**obj_in.model_dump())
         self.db.add(db_obj)
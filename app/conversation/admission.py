@@ -0,0 +1,141 @@
+"""
+Admission control for conversation turns. A process runs at most
+MAX_ACTIVE_TURNS turns at once; further turns wait in a bounded FIFO queue and are
+told roughly how long they will wait. When the queue is full new turns are
+rejected and new websocket connections are shed, so a slow upstream provider
+degrades into "busy" responses instead of memory growing until the process falls
+over. The numbers are exported as metrics and on /load for autoscaling.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+OnQueued = Callable[[int, float], Awaitable[None]]
+
+
+class AdmissionRejected(Exception):
+    pass
+
+
+class AdmissionController:
+    def __init__(self, max_active_turns: int, max_queued_turns: int, initial_turn_seconds: float = 8.0):
+        self.max_active_turns = max_active_turns
+        self.max_queued_turns = max_queued_turns
+        self.active_turns = 0
+        self.connections = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # moving average of how long a turn holds its slot, drives the wait estimate
+        self._avg_turn_seconds = initial_turn_seconds
+
+    @property
+    def queued_turns(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def accepting_connections(self) -> bool:
+        return self.queued_turns < self.max_queued_turns
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until the turn at `position` (1-based) in the queue gets a slot."""
+        if position <= 0:
+            return 0.0
+        return math.ceil(position / self.max_active_turns) * self._avg_turn_seconds
+
+    @asynccontextmanager
+    async def admit(self, on_queued: OnQueued | None = None) -> AsyncIterator[None]:
+        """Holds a turn slot for the block. Raises AdmissionRejected when the queue is full."""
+        enqueued_at = time.monotonic()
+        if self.active_turns >= self.max_active_turns or self._waiters:
+            await self._wait_for_slot(on_queued)
+        else:
+            self.active_turns += 1
+        metrics.observe("admission_wait_seconds", time.monotonic() - enqueued_at)
+        self._update_gauges()
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_turn_seconds = 0.8 * self._avg_turn_seconds + 0.2 * (time.monotonic() - started_at)
+            self._release()
+
+    async def _wait_for_slot(self, on_queued: OnQueued | None):
+        if len(self._waiters) >= self.max_queued_turns:
+            metrics.increment("admission_rejected_total", kind="turn")
+            raise AdmissionRejected("Too many turns waiting.")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        try:
+            if on_queued is not None:
+                position = len(self._waiters)
+                await on_queued(position, self.estimated_wait(position))
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over right before the cancellation
+                self._release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._update_gauges()
+            raise
+
+    def _release(self):
+        # the slot passes straight to the next waiter, active_turns stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.active_turns -= 1
+        self._update_gauges()
+
+    def connection_opened(self):
+        self.connections += 1
+        metrics.set_gauge("admission_connections", self.connections)
+
+    def connection_closed(self):
+        self.connections -= 1
+        metrics.set_gauge("admission_connections", self.connections)
+
+    def reject_connection(self):
+        metrics.increment("admission_rejected_total", kind="connection")
+
+    def _update_gauges(self):
+        snapshot = self.snapshot()
+        for name in ("active_turns", "queued_turns", "estimated_wait_seconds"):
+            metrics.set_gauge(f"admission_{name}", snapshot[name])
+
+    def snapshot(self) -> dict:
+        saturated = self.active_turns >= self.max_active_turns
+        return {
+            "active_turns": self.active_turns,
+            "max_active_turns": self.max_active_turns,
+            "queued_turns": self.queued_turns,
+            "max_queued_turns": self.max_queued_turns,
+            "connections": self.connections,
+            "utilization": (self.active_turns + self.queued_turns) / self.max_active_turns,
+            "estimated_wait_seconds": self.estimated_wait(self.queued_turns + 1) if saturated else 0.0,
+            "accepting_connections": self.accepting_connections,
+        }
+
+
+@lru_cache
+def get_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    return AdmissionController(
+        max_active_turns=settings.MAX_ACTIVE_TURNS,
+        max_queued_turns=settings.MAX_QUEUED_TURNS,
+    )
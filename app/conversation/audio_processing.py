@@ -0,0 +1,211 @@
+"""
+Server-side cleanup of recorded user audio before it is sent for transcription.
+
+The recording is decoded to PCM, downmixed to mono, resampled to 16 kHz, stripped of
+leading and trailing silence and re-encoded. Decoding browser formats (webm/ogg) and
+encoding Opus needs an ffmpeg binary; without it only WAV input can be processed and
+anything else is passed through untouched.
+"""
+import io
+import logging
+import shutil
+import subprocess
+import wave
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+# speech is anything within this many dB of the loudest frame...
+SILENCE_RELATIVE_DB = 35.0
+# ...and louder than this absolute floor (dBFS)
+SILENCE_FLOOR_DB = -50.0
+# keep a little audio around the detected speech so word edges are not clipped
+PADDING_SECONDS = 0.2
+# the anti-aliasing filter applied before downsampling passes up to this fraction
+# of the new Nyquist rate, its transition band fits in the rest
+LOW_PASS_FRACTION = 0.9
+LOW_PASS_TAPS = 101
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+@dataclass
+class PreprocessedAudio:
+    data: bytes
+    mimetype: str
+    original_size: int
+    trimmed_seconds: float = 0.0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_size - len(self.data)
+
+
+def sniff_audio_mimetype(data: bytes) -> str:
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "audio/wav"
+    if data[:4] == b"OggS":
+        return "audio/ogg"
+    if data[:4] == b"\x1a\x45\xdf\xa3":
+        return "audio/webm"
+    if data[:3] == b"ID3" or data[:2] == b"\xff\xfb":
+        return "audio/mpeg"
+    return "application/octet-stream"
+
+
+def _ffmpeg() -> str | None:
+    return shutil.which(get_settings().FFMPEG_BINARY)
+
+
+def _run_ffmpeg(args: list[str], data: bytes) -> bytes:
+    result = subprocess.run(
+        [_ffmpeg(), "-hide_banner", "-loglevel", "error", *args],
+        input=data,
+        capture_output=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise AudioDecodeError(result.stderr.decode(errors="replace").strip())
+    return result.stdout
+
+
+def _decode_wav(data: bytes) -> tuple[np.ndarray, int]:
+    with wave.open(io.BytesIO(data), "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise AudioDecodeError("Only 16-bit PCM WAV can be decoded without ffmpeg.")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def decode_to_mono_pcm(data: bytes) -> np.ndarray:
+    """Returns float32 mono samples in [-1, 1] at TARGET_SAMPLE_RATE."""
+    if sniff_audio_mimetype(data) == "audio/wav":
+        samples, rate = _decode_wav(data)
+        return resample(samples, rate, TARGET_SAMPLE_RATE)
+
+    if not _ffmpeg():
+        raise AudioDecodeError("ffmpeg is not available to decode compressed audio.")
+    pcm = _run_ffmpeg(
+        ["-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "pipe:1"],
+        data,
+    )
+    return np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _low_pass(samples: np.ndarray, cutoff: float) -> np.ndarray:
+    """Windowed-sinc FIR, `cutoff` is in cycles per sample (0.5 is the Nyquist rate)."""
+    offsets = np.arange(LOW_PASS_TAPS) - (LOW_PASS_TAPS - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * offsets) * np.hamming(LOW_PASS_TAPS)
+    taps /= taps.sum()
+    return np.convolve(samples, taps.astype(np.float32), mode="same")
+
+
+def resample(samples: np.ndarray, rate: int, target_rate: int) -> np.ndarray:
+    """
+    Linear interpolation, which aliases whatever is above the new Nyquist rate when
+    downsampling, so that is filtered out first.
+    """
+    if rate == target_rate or samples.size == 0:
+        return samples
+    if target_rate < rate:
+        samples = _low_pass(samples, LOW_PASS_FRACTION * target_rate / 2 / rate)
+    duration = samples.size / rate
+    target_size = int(round(duration * target_rate))
+    source_positions = np.arange(target_size) * (rate / target_rate)
+    return np.interp(source_positions, np.arange(samples.size), samples).astype(np.float32)
+
+
+def trim_silence(samples: np.ndarray, rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """
+    Energy based voice activity detection. Frames are scored by their RMS level in one
+    vectorized pass and everything before the first and after the last voiced frame is
+    dropped.
+    """
+    frame_size = int(rate * FRAME_SECONDS)
+    num_frames = samples.size // frame_size
+    if num_frames == 0:
+        return samples
+
+    frames = samples[: num_frames * frame_size].reshape(num_frames, frame_size)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    level_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    threshold = max(level_db.max() - SILENCE_RELATIVE_DB, SILENCE_FLOOR_DB)
+
+    voiced = np.flatnonzero(level_db > threshold)
+    if voiced.size == 0:
+        # nothing that looks like speech, leave it to the transcriber
+        return samples
+
+    padding = int(rate * PADDING_SECONDS)
+    start = max(voiced[0] * frame_size - padding, 0)
+    end = min((voiced[-1] + 1) * frame_size + padding, samples.size)
+    return samples[start:end]
+
+
+def encode(samples: np.ndarray, rate: int = TARGET_SAMPLE_RATE) -> tuple[bytes, str]:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    if _ffmpeg():
+        encoded = _run_ffmpeg(
+            [
+                "-f", "s16le", "-ar", str(rate), "-ac", "1", "-i", "pipe:0",
+                "-c:a", "libopus", "-b:a", "24k", "-application", "voip",
+                "-f", "ogg", "pipe:1",
+            ],
+            pcm,
+        )
+        return encoded, "audio/ogg"
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return buffer.getvalue(), "audio/wav"
+
+
+def preprocess_audio(data: bytes) -> PreprocessedAudio:
+    """
+    CPU bound, run it in a thread. Falls back to the original recording whenever it
+    cannot be decoded or the processed version would not be smaller.
+    """
+    original = PreprocessedAudio(
+        data=data, mimetype=sniff_audio_mimetype(data), original_size=len(data)
+    )
+    if not get_settings().AUDIO_PREPROCESSING_ENABLED:
+        return original
+
+    try:
+        samples = decode_to_mono_pcm(data)
+    except (AudioDecodeError, wave.Error, EOFError) as e:
+        logger.info("Skipping audio preprocessing, could not decode input: %s", e)
+        return original
+
+    trimmed = trim_silence(samples)
+    try:
+        encoded, mimetype = encode(trimmed)
+    except AudioDecodeError as e:
+        logger.warning("Skipping audio preprocessing, could not encode output: %s", e)
+        return original
+
+    if len(encoded) >= len(data):
+        return original
+    return PreprocessedAudio(
+        data=encoded,
+        mimetype=mimetype,
+        original_size=len(data),
+        trimmed_seconds=(samples.size - trimmed.size) / TARGET_SAMPLE_RATE,
+    )
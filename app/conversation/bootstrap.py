@@ -0,0 +1,103 @@
+"""
+Conversation bootstrap: the language profile with its topics, the persona and the
+settings a conversation needs, fetched in one query and cached per profile. The page
+render and the warm-up of its websocket both go through it, so opening a
+conversation costs at most one round trip.
+
+Entries expire after BOOTSTRAP_CACHE_TTL_SECONDS. They are stored with the data
+versions (see app.core.caching) of the tables they were read from, so a commit that
+touched any of them in this process makes them stale right away; other processes
+catch up when their entries expire.
+"""
+import threading
+import time
+from functools import lru_cache
+
+from app.conversation.repositories import ConversationBootstrapRepository
+from app.conversation.schemas import ConversationContext
+from app.core.caching import get_data_versions
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.language_profiles.models import LanguageProfile, PracticeTopic
+from app.language_profiles.schemas import LanguageProfileRead
+from app.personas.models import Persona
+from app.personas.schemas import PersonaRead
+from app.settings.models import Settings
+from app.settings.schemas import SettingsRead
+
+_CACHED_TABLES = tuple(model.__table__.name for model in (LanguageProfile, PracticeTopic, Persona, Settings))
+
+# (language_profile_id, persona_id), None is the default persona
+CacheKey = tuple[int, int | None]
+
+
+class ConversationBootstrapCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: dict[CacheKey, tuple[float, dict[str, int], ConversationContext]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def versions() -> dict[str, int]:
+        return get_data_versions().snapshot(*_CACHED_TABLES)
+
+    def get(self, key: CacheKey) -> ConversationContext | None:
+        versions = self.versions()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, stored_versions, context = entry
+            if time.monotonic() - stored_at > self.ttl_seconds or stored_versions != versions:
+                del self._entries[key]
+                return None
+            return context
+
+    def set(self, key: CacheKey, context: ConversationContext, versions: dict[str, int]):
+        """`versions` are taken before the rows were read, a commit in between makes the entry stale."""
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            stored = (time.monotonic(), versions, context)
+            self._entries[key] = stored
+            # the page asks for the default persona, its websocket for that persona by id
+            self._entries[(key[0], context.persona.id)] = stored
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+@lru_cache
+def get_bootstrap_cache() -> ConversationBootstrapCache:
+    return ConversationBootstrapCache(ttl_seconds=get_settings().BOOTSTRAP_CACHE_TTL_SECONDS)
+
+
+class ConversationBootstrapService:
+    def __init__(self, repository: ConversationBootstrapRepository, cache: ConversationBootstrapCache):
+        self.repository = repository
+        self.cache = cache
+
+    def get_context(self, language_profile_id: int, persona_id: int | None = None) -> ConversationContext | None:
+        """None when the profile or the persona does not exist."""
+        key = (language_profile_id, persona_id)
+        context = self.cache.get(key)
+        if context is not None:
+            metrics.increment("conversation_bootstrap_total", result="hit")
+            return context
+
+        metrics.increment("conversation_bootstrap_total", result="miss")
+        versions = self.cache.versions()
+        row = self.repository.fetch(language_profile_id, persona_id)
+        if row is None or row[1] is None:
+            return None
+        language_profile, persona, settings = row
+        context = ConversationContext(
+            persona=PersonaRead.model_validate(persona),
+            # a fresh install has no settings row yet, the defaults are what it would get
+            settings=SettingsRead.model_validate(settings) if settings else SettingsRead(),
+            language_profile=LanguageProfileRead.model_validate(language_profile),
+        )
+        self.cache.set(key, context, versions)
+        return context
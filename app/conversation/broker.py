@@ -0,0 +1,260 @@
+"""
+Local job queue between the websocket gateway and the workflow workers.
+
+In queue mode the web process never runs a ConversationWorkflow. Each turn is
+submitted as a `ConversationJob` and the worker streams the already mapped event
+dicts back as `ConversationJobEvent`s, which are fanned out to the waiting turn. A
+turn whose worker dies, or that gets no end in time, fails with an error instead of
+waiting forever.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, AsyncGenerator
+
+from app.conversation.constants import turn_timeout
+from app.conversation.enums import ConversationJobKind
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# turns given up on whose late events are dropped without a warning each
+_MAX_ABANDONED_TURNS = 256
+
+
+@dataclass
+class ConversationJob:
+    kind: ConversationJobKind
+    conversation_id: str
+    turn_id: str | None = None
+    payload: dict[str, Any] = field(default_factory=dict)
+    # the gateway is profiling this turn, the worker profiles its side too
+    profile: bool = False
+
+
+@dataclass
+class ConversationJobEvent:
+    conversation_id: str
+    turn_id: str
+    # None marks the end of the turn.
+    event: dict | None
+    error: str | None = None
+
+
+class ConversationBroker:
+    """
+    Routes jobs to workers and dispatches their events back to the turn that is
+    waiting for them. Subclasses only decide how jobs travel to a worker.
+    """
+
+    def __init__(self):
+        self._turns: dict[str, asyncio.Queue[ConversationJobEvent]] = {}
+        # conversation of every turn still waiting for its end
+        self._turn_conversations: dict[str, str] = {}
+        self._abandoned_turns: OrderedDict[str, None] = OrderedDict()
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def submit(self, job: ConversationJob):
+        raise NotImplementedError
+
+    async def stream_turn(self, job: ConversationJob) -> AsyncGenerator[dict, None]:
+        if job.turn_id is None:
+            raise ValueError("Turn jobs require a turn_id.")
+
+        events: asyncio.Queue[ConversationJobEvent] = asyncio.Queue()
+        self._turns[job.turn_id] = events
+        self._turn_conversations[job.turn_id] = job.conversation_id
+        # the worker stops the turn at turn_timeout(), the margin covers the way back
+        deadline = asyncio.get_running_loop().time() + turn_timeout() + get_settings().CONVERSATION_TURN_MARGIN_SECONDS
+        ended = False
+        try:
+            self.submit(job)
+            while True:
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        message = await events.get()
+                except TimeoutError:
+                    metrics.increment("conversation_turn_timeouts_total")
+                    raise RuntimeError(f"Turn {job.turn_id} did not finish in its worker in time.") from None
+                if message.error:
+                    ended = True
+                    raise RuntimeError(f"Turn {job.turn_id} failed in worker: {message.error}")
+                if message.event is None:
+                    ended = True
+                    return
+                yield message.event
+        finally:
+            self._turns.pop(job.turn_id, None)
+            self._turn_conversations.pop(job.turn_id, None)
+            if not ended:
+                self._abandon(job)
+
+    def _abandon(self, job: ConversationJob):
+        """Stops a turn nobody waits for anymore, its events still on the way are dropped quietly."""
+        self._abandoned_turns[job.turn_id] = None
+        while len(self._abandoned_turns) > _MAX_ABANDONED_TURNS:
+            self._abandoned_turns.popitem(last=False)
+        self.submit(
+            ConversationJob(kind=ConversationJobKind.CANCEL_TURN, conversation_id=job.conversation_id, turn_id=job.turn_id)
+        )
+
+    def _fail_turns(self, turn_ids: list[str], error: str):
+        for turn_id in turn_ids:
+            conversation_id = self._turn_conversations[turn_id]
+            self._dispatch(ConversationJobEvent(conversation_id, turn_id, None, error=error))
+
+    def _dispatch(self, message: ConversationJobEvent):
+        events = self._turns.get(message.turn_id)
+        if events is None:
+            if message.turn_id not in self._abandoned_turns:
+                logger.warning("Dropping event for unknown turn %s.", message.turn_id)
+            return
+        events.put_nowait(message)
+
+
+class LocalConversationBroker(ConversationBroker):
+    """In-process stand-in for the worker pool. Same protocol, no extra processes."""
+
+    def __init__(self):
+        super().__init__()
+        self._jobs: asyncio.Queue[ConversationJob | None] = asyncio.Queue()
+        self._serve_task: asyncio.Task | None = None
+
+    async def start(self):
+        from app.conversation.worker import ConversationWorker
+
+        worker = ConversationWorker()
+        self._serve_task = asyncio.create_task(
+            worker.serve(self._jobs.get, self._dispatch)
+        )
+        logger.info("Local conversation broker started.")
+
+    async def stop(self):
+        if self._serve_task:
+            await self._jobs.put(None)
+            await self._serve_task
+            self._serve_task = None
+
+    def submit(self, job: ConversationJob):
+        self._jobs.put_nowait(job)
+
+
+class ProcessConversationBroker(ConversationBroker):
+    """
+    Forwards jobs to a pool of worker processes over multiprocessing queues.
+    A conversation always lands on the same worker so its history stays there.
+    """
+
+    def __init__(self, num_workers: int):
+        super().__init__()
+        self.num_workers = num_workers
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._job_queues: list[Any] = []
+        self._event_queue: Any = None
+        self._processes: list[Any] = []
+        self._pump_thread: threading.Thread | None = None
+        self._monitor_task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._event_queue = self._mp_context.Queue()
+        for index in range(self.num_workers):
+            job_queue, process = self._start_worker(index)
+            self._job_queues.append(job_queue)
+            self._processes.append(process)
+
+        self._pump_thread = threading.Thread(
+            target=self._pump_events, name="conversation-broker-pump", daemon=True
+        )
+        self._pump_thread.start()
+        self._monitor_task = asyncio.create_task(self._monitor_workers())
+        logger.info("Started %d conversation worker processes.", self.num_workers)
+
+    def _start_worker(self, index: int) -> tuple[Any, Any]:
+        from app.conversation.worker import run_worker_process
+
+        job_queue = self._mp_context.Queue()
+        process = self._mp_context.Process(
+            target=run_worker_process,
+            args=(job_queue, self._event_queue),
+            name=f"conversation-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return job_queue, process
+
+    async def _monitor_workers(self):
+        """Fails the pending turns of a worker that died and starts a new one in its place."""
+        interval = get_settings().CONVERSATION_WORKER_CHECK_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            for index, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                logger.error(
+                    "Conversation worker %s exited with code %s, starting a new one.", process.name, process.exitcode
+                )
+                metrics.increment("conversation_worker_restarts_total")
+                # the conversations of the worker and their history are gone with it
+                lost = [
+                    turn_id
+                    for turn_id, conversation_id in self._turn_conversations.items()
+                    if self._worker_index(conversation_id) == index
+                ]
+                self._fail_turns(lost, f"{process.name} exited")
+                self._job_queues[index], self._processes[index] = self._start_worker(index)
+
+    async def stop(self):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._monitor_task
+            self._monitor_task = None
+        for job_queue in self._job_queues:
+            job_queue.put(None)
+        for process in self._processes:
+            await asyncio.to_thread(process.join, 10)
+            if process.is_alive():
+                process.terminate()
+        if self._event_queue is not None:
+            self._event_queue.put(None)
+        if self._pump_thread:
+            await asyncio.to_thread(self._pump_thread.join, 10)
+        self._job_queues.clear()
+        self._processes.clear()
+        logger.info("Conversation worker processes stopped.")
+
+    def _worker_index(self, conversation_id: str) -> int:
+        return zlib.crc32(conversation_id.encode()) % self.num_workers
+
+    def submit(self, job: ConversationJob):
+        self._job_queues[self._worker_index(job.conversation_id)].put(job)
+
+    def _pump_events(self):
+        """Runs in a background thread, moving worker events onto the event loop."""
+        while True:
+            message = self._event_queue.get()
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._dispatch, message)
+
+
+@lru_cache
+def get_conversation_broker() -> ConversationBroker:
+    settings = get_settings()
+    if settings.CONVERSATION_BROKER == "local":
+        return LocalConversationBroker()
+    return ProcessConversationBroker(num_workers=settings.CONVERSATION_WORKERS)
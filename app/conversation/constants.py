@@ -1 +1,8 @@
+from app.core.config import get_settings
+
 LOADING_TEXT = "Loading your audio message..."
+
+
+def turn_timeout() -> float:
+    # stages degrade on their own deadlines well before this hard stop
+    return get_settings().TURN_BUDGET_SECONDS + 15
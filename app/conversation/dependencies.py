@@ -1,41 +1,81 @@
-from fastapi import Depends
-from typing import cast
-from llama_index.llms.google_genai import GoogleGenAI
-
-from app.clients.elevenlabs.elevenlabs_client import PatchedAsyncElevenLabs
-from app.clients.elevenlabs.elevenlabs_tts import ElevenLabsTTS
-from app.clients.elevenlabs.patched_elevenlabs import AsyncRealtimeTextToSpeechClient
-from app.core.config import settings
-from app.language_profiles.dependencies import get_language_profile_service
+from fastapi import Depends, WebSocketException, status
+from typing import TYPE_CHECKING, cast
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.language_profiles.dependencies import (
+    get_language_profile_repository,
+    get_language_profile_service,
+    get_practice_topic_repository,
+)
 from app.language_profiles.services import LanguageProfileService
-from app.personas.dependencies import get_persona_service
+from app.personas.dependencies import get_persona_repository, get_persona_service
 from app.personas.services import PersonaService
-from app.settings.dependencies import get_settings_service
+from app.settings.dependencies import get_settings_repository, get_settings_service
 from app.settings.services import SettingsService
-from app.conversation.services import ConversationService
-from app.conversation.workflows import ConversationWorkflow
+from app.conversation.admission import AdmissionController, get_admission_controller
+from app.conversation.bootstrap import ConversationBootstrapService, get_bootstrap_cache
+from app.conversation.broker import get_conversation_broker
+from app.conversation.feedback_cache import FeedbackCache, get_feedback_memory_cache
+from app.conversation.repositories import ConversationBootstrapRepository, FeedbackCacheRepository
+from app.core.db import get_engine
+from app.core.dependencies import get_db
+from app.conversation.services import QueuedConversationService
+
+# The provider SDKs (llama_index, google.genai, elevenlabs, workflows) are slow to
+# import, so they are only imported once a conversation is actually wired.
+if TYPE_CHECKING:
+    from llama_index.llms.google_genai import GoogleGenAI
+
+    from app.clients.elevenlabs.elevenlabs_client import PatchedAsyncElevenLabs
+    from app.clients.elevenlabs.elevenlabs_tts import ElevenLabsTTS
+    from app.clients.elevenlabs.patched_elevenlabs import AsyncRealtimeTextToSpeechClient
+    from app.conversation.services import ConversationService
+    from app.conversation.workflows import ConversationWorkflow
+
+
+def require_admission_capacity() -> AdmissionController:
+    """Sheds new websocket connections while the turn queue is full."""
+    admission = get_admission_controller()
+    if not admission.accepting_connections:
+        admission.reject_connection()
+        raise WebSocketException(
+            code=status.WS_1013_TRY_AGAIN_LATER, reason="Server busy, try again later."
+        )
+    return admission
+
+
+def build_gemini_llm(model: str) -> "GoogleGenAI":
+    from llama_index.llms.google_genai import GoogleGenAI
 
+    return GoogleGenAI(model=model, api_key=get_settings().GOOGLE_API_KEY)
 
-def get_gemini_llm() -> GoogleGenAI:
-    return GoogleGenAI(model="gemini-2.5-flash", api_key=settings.GOOGLE_API_KEY)
 
+def get_gemini_llm() -> "GoogleGenAI":
+    """Client for the preferred reply model, other models are built when routed to."""
+    return build_gemini_llm(get_settings().REPLY_MODELS[0])
 
-def get_elevenlabs_async_client() -> PatchedAsyncElevenLabs:
-    return PatchedAsyncElevenLabs(api_key=settings.ELEVENLABS_API_KEY)
+
+def get_elevenlabs_async_client() -> "PatchedAsyncElevenLabs":
+    from app.clients.elevenlabs.elevenlabs_client import PatchedAsyncElevenLabs
+
+    return PatchedAsyncElevenLabs(api_key=get_settings().ELEVENLABS_API_KEY)
 
 
 def get_realtime_tts_client(
-    client: PatchedAsyncElevenLabs = Depends(get_elevenlabs_async_client),
-) -> AsyncRealtimeTextToSpeechClient:
+    client: "PatchedAsyncElevenLabs" = Depends(get_elevenlabs_async_client),
+) -> "AsyncRealtimeTextToSpeechClient":
     return client.realtime_text_to_speech
 
 
 def get_elevenlabs_tts_client(
-    realtime_client: AsyncRealtimeTextToSpeechClient = Depends(
+    realtime_client: "AsyncRealtimeTextToSpeechClient" = Depends(
         get_realtime_tts_client
     ),
     settings_service: SettingsService = Depends(get_settings_service),
-) -> ElevenLabsTTS:
+) -> "ElevenLabsTTS":
+    from app.clients.elevenlabs.elevenlabs_tts import ElevenLabsTTS
+
     app_settings = settings_service.get_settings()
     if not app_settings.voice_id:
         raise ValueError("ElevenLabs Voice ID is not configured in settings.")
@@ -44,25 +84,93 @@ def get_elevenlabs_tts_client(
     )
 
 
+def get_feedback_cache_repository(db: Session = Depends(get_db)) -> FeedbackCacheRepository:
+    return FeedbackCacheRepository(db)
+
+
+def get_feedback_cache(
+    repository: FeedbackCacheRepository = Depends(get_feedback_cache_repository),
+) -> FeedbackCache | None:
+    settings = get_settings()
+    if not settings.FEEDBACK_CACHE_ENABLED:
+        return None
+    return FeedbackCache(
+        memory=get_feedback_memory_cache(),
+        repository=repository if settings.FEEDBACK_CACHE_PERSISTENT else None,
+    )
+
+
+def get_conversation_bootstrap_service(db: Session = Depends(get_db)) -> ConversationBootstrapService:
+    return ConversationBootstrapService(ConversationBootstrapRepository(db), get_bootstrap_cache())
+
+
 def get_conversation_workflow(
     settings_service: SettingsService = Depends(get_settings_service),
     persona_service: PersonaService = Depends(get_persona_service),
     language_profile_service: LanguageProfileService = Depends(
         get_language_profile_service
     ),
-    llm: GoogleGenAI = Depends(get_gemini_llm),
-    elevenlabs_tts: ElevenLabsTTS = Depends(get_elevenlabs_tts_client),
-) -> ConversationWorkflow:
+    llm: "GoogleGenAI" = Depends(get_gemini_llm),
+    elevenlabs_tts: "ElevenLabsTTS" = Depends(get_elevenlabs_tts_client),
+    feedback_cache: FeedbackCache | None = Depends(get_feedback_cache),
+    bootstrap: ConversationBootstrapService = Depends(get_conversation_bootstrap_service),
+) -> "ConversationWorkflow":
+    from app.conversation.workflows import ConversationWorkflow
+
     return ConversationWorkflow(
         settings_service=settings_service,
         persona_service=persona_service,
         language_profile_service=language_profile_service,
         llm=llm,
         elevenlabs_tts=elevenlabs_tts,
+        feedback_cache=feedback_cache,
+        llm_factory=build_gemini_llm,
+        bootstrap=bootstrap,
     )
 
 
-def get_conversation_service(
-    workflow: ConversationWorkflow = Depends(get_conversation_workflow),
-) -> ConversationService:
-    return ConversationService(workflow=workflow)
\ No newline at end of file
+def get_conversation_service() -> "ConversationService":
+    """
+    The conversation of a websocket outlives its request (see sessions.py), so it does
+    not use the request's DB session, which is closed with the socket. It owns one,
+    committed after every turn and closed with the service.
+    """
+    db = Session(get_engine())
+    try:
+        return build_conversation_service(db, owns_db=True)
+    except Exception:
+        db.close()
+        raise
+
+
+def get_queued_conversation_service() -> QueuedConversationService:
+    """
+    Registered as an override of get_conversation_service in queue mode, so the web
+    process only gets a thin proxy to the workers and never builds a workflow.
+    """
+    return QueuedConversationService(broker=get_conversation_broker())
+
+
+def build_conversation_service(db: Session, owns_db: bool = False) -> "ConversationService":
+    """
+    Wires the conversation service outside of a request, e.g. in a workflow worker.
+    With `owns_db` the service commits `db` after every turn and closes it on close.
+    """
+    from app.conversation.services import ConversationService
+
+    settings_service = get_settings_service(get_settings_repository(db))
+    persona_service = get_persona_service(get_persona_repository(db))
+    language_profile_service = get_language_profile_service(
+        get_language_profile_repository(db), get_practice_topic_repository(db)
+    )
+    realtime_client = get_realtime_tts_client(get_elevenlabs_async_client())
+    workflow = get_conversation_workflow(
+        settings_service=settings_service,
+        persona_service=persona_service,
+        language_profile_service=language_profile_service,
+        llm=get_gemini_llm(),
+        elevenlabs_tts=get_elevenlabs_tts_client(realtime_client, settings_service),
+        feedback_cache=get_feedback_cache(get_feedback_cache_repository(db)),
+        bootstrap=get_conversation_bootstrap_service(db),
+    )
+    return ConversationService(workflow=workflow, db=db if owns_db else None)
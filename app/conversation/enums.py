@@ -14,4 +14,33 @@ class ConversationEventType(StrEnum):
     AI_AUDIO_READY = "ai_audio_ready"
     AUDIO_MESSAGE = "audio_message"
     USER_TRANSCRIPTION_CHUNK_GENERATED = "user_transcription_chunk_generated"
-    FEEDBACK_GENERATED = "feedback_generated"
\ No newline at end of file
+    FEEDBACK_GENERATED = "feedback_generated"
+    TURN_DEGRADED = "turn_degraded"
+
+class TurnStage(StrEnum):
+    TRANSCRIPTION = "transcription"
+    REPLY = "reply"
+    SPEECH = "speech"
+    FEEDBACK = "feedback"
+
+
+class TurnFallback(StrEnum):
+    PARTIAL_TRANSCRIPTION = "partial_transcription"
+    NO_TRANSCRIPTION = "no_transcription"
+    PARTIAL_REPLY = "partial_reply"
+    TEXT_ONLY = "text_only"
+    SKIP_FEEDBACK = "skip_feedback"
+
+
+class AudioMode(StrEnum):
+    STREAM = "stream"
+    ON_DEMAND = "on_demand"
+    OFF = "off"
+
+
+class ConversationJobKind(StrEnum):
+    RUN_TURN = "run_turn"
+    WARM_UP = "warm_up"
+    SPECULATE_FEEDBACK = "speculate_feedback"
+    CANCEL_TURN = "cancel_turn"
+    CLOSE = "close"
@@ -1,6 +1,7 @@
 from llama_index.core.llms import ChatMessage
 from workflows.events import Event
 
+from app.conversation.enums import TurnFallback, TurnStage
 from app.conversation.schemas import Feedback
 
 class UserTranscriptionChunkGenerated(Event):
@@ -16,6 +17,13 @@ class AudioInputReceived(Event):
     language_profile_id: int
 
 
+class VoiceTurnReceived(Event):
+    """Indicates an audio message that is transcribed and answered in one fused LLM call."""
+    audio_bytes: bytes
+    persona_id: int
+    language_profile_id: int
+
+
 class UserMessageReady(Event):
     """Indicates the user's message is processed (transcribed if needed) and ready for the LLM."""
     text: str
@@ -39,6 +47,14 @@ class FeedbackGenerated(Event):
     feedback: Feedback
 
 
+class TurnDegraded(Event):
+    """A stage missed its deadline or failed and the turn continues with a fallback."""
+
+    stage: TurnStage
+    fallback: TurnFallback
+    reason: str
+
+
 class AITextChunkGenerated(Event):
     """Event carrying a single token from the LLM's streaming response."""
 
@@ -55,10 +71,22 @@ class FullResponseGenerated(Event):
     language_profile_id: int
 
 
+class FeedbackCompleted(Event):
+    """Feedback for the turn was emitted, served from cache or skipped."""
+
+
+class AudioSaved(Event):
+    """The turn's audio was saved, or there was none to save."""
+
+    audio_url: str | None = None
+
+
 class AIAudioReady(Event):
     """Event carrying the URL to the generated audio file."""
 
     audio_url: str
+    # the URL synthesizes the audio when first requested
+    on_demand: bool = False
 
 
 class AIAudioChunkGenerated(Event):
@@ -0,0 +1,189 @@
+"""
+Batched feedback evaluation. Profiles in batched mode do not get a structured LLM
+call per turn: their messages are collected until FEEDBACK_BATCH_MAX_TURNS are waiting
+or FEEDBACK_BATCH_WINDOW_SECONDS have passed, and are evaluated together in one call.
+Only turns for the same model, persona and evaluation rules share a batch, so every
+turn is judged by the rules and the model it was routed to. Each result is routed back
+to the turn that submitted it; when the turn ids the model returns do not match the
+batch one to one, or the response cannot be parsed, nobody gets a result and every
+turn is evaluated on its own.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from app.conversation.schemas import BatchedFeedbackResponse, Feedback
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.rate_limiting import Priority, estimate_tokens, get_provider_limiter
+
+if TYPE_CHECKING:
+    from llama_index.llms.google_genai import GoogleGenAI
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FeedbackRequest:
+    turn_id: str
+    user_message: str
+    ai_response: str
+    persona_prompt: str
+    evaluation_prompt: str | None
+    target_language: str
+
+
+@dataclass
+class _PendingFeedback:
+    request: FeedbackRequest
+    future: asyncio.Future
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+def build_batch_prompt(requests: list[FeedbackRequest]) -> str:
+    # a batch shares its persona and rules, see BatchKey
+    messages = "\n".join(
+        f"""
+[turn_id: {request.turn_id}]
+Target language: {request.target_language}
+User's message: "{request.user_message}"
+Conversational response given: "{request.ai_response}"
+"""
+        for request in requests
+    )
+    prompt = f"""
+You are an AI language coach. Your task is to provide feedback on several users' messages.
+Each message below comes from a different conversation and is identified by its turn_id.
+Analyze every user's message on its own and provide feedback based on the global feedback rules.
+Do not generate conversational responses. Only generate feedback.
+Return exactly one result per turn_id.
+
+Persona of conversational partner: {requests[0].persona_prompt}
+Global Feedback Rules: {requests[0].evaluation_prompt}
+---
+{messages}
+---
+Now, provide feedback on each user's message.
+"""
+    return prompt.strip()
+
+
+# (model, persona prompt, evaluation prompt)
+BatchKey = tuple[str, str, str | None]
+
+
+@dataclass
+class _Batch:
+    llm: "GoogleGenAI"
+    pending: list[_PendingFeedback] = field(default_factory=list)
+    flush_timer: asyncio.TimerHandle | None = None
+
+
+def _results_match(batch: list[_PendingFeedback], turn_ids: list[str]) -> bool:
+    """Every turn of the batch answered exactly once, and nothing else answered."""
+    expected = {pending.request.turn_id for pending in batch}
+    return len(turn_ids) == len(expected) and set(turn_ids) == expected
+
+
+def _evaluate_one_by_one(batch: list[_PendingFeedback]):
+    """No result for anyone, each caller evaluates its turn on its own."""
+    for pending in batch:
+        if not pending.future.done():
+            pending.future.set_result(None)
+
+
+class FeedbackBatcher:
+    def __init__(self, max_turns: int, window_seconds: float):
+        self.max_turns = max_turns
+        self.window_seconds = window_seconds
+        self._batches: dict[BatchKey, _Batch] = {}
+        self._flushes: set[asyncio.Task] = set()
+
+    async def evaluate(self, request: FeedbackRequest, llm: "GoogleGenAI") -> list[Feedback] | None:
+        """
+        Feedback for `request` from the next batch of its key. None when the batch
+        result could not be matched to its turns, the caller evaluates it on its own.
+        """
+        loop = asyncio.get_running_loop()
+        key = (llm.model, request.persona_prompt, request.evaluation_prompt)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch(llm=llm)
+        pending = _PendingFeedback(request=request, future=loop.create_future())
+        batch.pending.append(pending)
+
+        if len(batch.pending) >= self.max_turns:
+            self._flush(key)
+        elif batch.flush_timer is None:
+            batch.flush_timer = loop.call_later(self.window_seconds, self._flush, key)
+        return await pending.future
+
+    def _flush(self, key: BatchKey):
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        if batch.flush_timer is not None:
+            batch.flush_timer.cancel()
+        task = asyncio.create_task(self._evaluate_batch(batch.pending, batch.llm))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _evaluate_batch(self, batch: list[_PendingFeedback], llm: "GoogleGenAI"):
+        from llama_index.core.llms import ChatMessage, MessageRole
+
+        now = time.monotonic()
+        metrics.observe("feedback_batch_size", len(batch))
+        for pending in batch:
+            metrics.observe("feedback_batch_wait_seconds", now - pending.submitted_at)
+        logger.info("Evaluating feedback for a batch of %d turns.", len(batch))
+
+        prompt = build_batch_prompt([pending.request for pending in batch])
+        messages = [
+            ChatMessage(role=MessageRole.SYSTEM, content=prompt),
+            ChatMessage(role=MessageRole.USER, content="Provide feedback now."),
+        ]
+        limiter = get_provider_limiter("gemini", llm.model)
+        try:
+            structured_llm = llm.as_structured_llm(BatchedFeedbackResponse)
+            async with limiter.limit(
+                priority=Priority.FEEDBACK, connection_id="feedback-batch", tokens=estimate_tokens(prompt)
+            ):
+                chat_response = await structured_llm.achat(messages)
+            response: BatchedFeedbackResponse | None = chat_response.raw
+            turn_ids = None if response is None else [result.turn_id for result in response.results]
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        if turn_ids is None:
+            logger.warning("Batch of %d turns got no parsable result, evaluating them one by one.", len(batch))
+            metrics.increment("feedback_batch_mismatches_total")
+            _evaluate_one_by_one(batch)
+            return
+        if not _results_match(batch, turn_ids):
+            # a swapped or mislabeled id would show one learner another's feedback
+            logger.warning(
+                "Batch of %d turns came back with turn ids %s, evaluating them one by one.", len(batch), turn_ids
+            )
+            metrics.increment("feedback_batch_mismatches_total")
+            _evaluate_one_by_one(batch)
+            return
+
+        results = {result.turn_id: result.feedback for result in response.results}
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_result(results[pending.request.turn_id])
+
+
+@lru_cache
+def get_feedback_batcher() -> FeedbackBatcher:
+    settings = get_settings()
+    return FeedbackBatcher(
+        max_turns=settings.FEEDBACK_BATCH_MAX_TURNS,
+        window_seconds=settings.FEEDBACK_BATCH_WINDOW_SECONDS,
+    )
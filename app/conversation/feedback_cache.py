@@ -0,0 +1,137 @@
+"""
+Cache for structured feedback. Learners repeat a lot of stock phrases (greetings,
+thanks, "how are you"), and the feedback for those only depends on the message and
+the rules it is judged by, so the LLM call can be skipped entirely on a hit.
+
+Two tiers: a bounded in-process LRU with TTL shared by every conversation, and an
+optional table in the database so hits survive restarts and are shared by workers.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+
+from app.conversation.repositories import FeedbackCacheRepository
+from app.conversation.schemas import Feedback
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s']")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_hit_rate_lock = threading.Lock()
+_hit_rate_counts = {"hit": 0, "miss": 0}
+
+
+def normalize_message(text: str) -> str:
+    """Case, punctuation and spacing do not change the feedback a message gets."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _digest(value: str | None) -> str:
+    return hashlib.sha256((value or "").encode()).hexdigest()
+
+
+def feedback_cache_key(
+    *, user_message: str, target_language: str, persona_prompt: str, evaluation_prompt: str | None
+) -> str:
+    parts = (
+        normalize_message(user_message),
+        target_language.casefold(),
+        _digest(persona_prompt),
+        _digest(evaluation_prompt),
+    )
+    return _digest("\x1f".join(parts))
+
+
+class LRUCache:
+    """Thread safe LRU with a per-entry TTL. Workers and the web process each hold one."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, list[Feedback]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> list[Feedback] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: list[Feedback]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@lru_cache
+def get_feedback_memory_cache() -> LRUCache:
+    settings = get_settings()
+    return LRUCache(
+        max_entries=settings.FEEDBACK_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.FEEDBACK_CACHE_TTL_SECONDS,
+    )
+
+
+class FeedbackCache:
+    def __init__(self, memory: LRUCache, repository: FeedbackCacheRepository | None = None):
+        self.memory = memory
+        self.repository = repository
+
+    def get(self, key: str) -> list[Feedback] | None:
+        feedback = self.memory.get(key)
+        if feedback is not None:
+            self._record("hit", "memory")
+            return feedback
+
+        if self.repository is not None:
+            try:
+                row = self.repository.get_fresh(key, max_age_seconds=self.memory.ttl_seconds)
+            except Exception as e:
+                logger.warning("Persistent feedback cache lookup failed: %s", e)
+                row = None
+            if row is not None:
+                feedback = [Feedback.model_validate(item) for item in row.feedback]
+                self.memory.set(key, feedback)
+                self._record("hit", "persistent")
+                return feedback
+
+        self._record("miss", "none")
+        return None
+
+    def set(self, key: str, feedback: list[Feedback]):
+        self.memory.set(key, feedback)
+        metrics.set_gauge("feedback_cache_entries", len(self.memory))
+        if self.repository is not None:
+            try:
+                self.repository.upsert(key, [item.model_dump(mode="json") for item in feedback])
+            except Exception as e:
+                logger.warning("Persistent feedback cache write failed: %s", e)
+
+    @staticmethod
+    def _record(result: str, tier: str):
+        metrics.increment("feedback_cache_requests_total", result=result, tier=tier)
+        with _hit_rate_lock:
+            _hit_rate_counts[result] += 1
+            lookups = _hit_rate_counts["hit"] + _hit_rate_counts["miss"]
+            metrics.set_gauge("feedback_cache_hit_rate", _hit_rate_counts["hit"] / lookups)
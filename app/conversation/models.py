@@ -0,0 +1,12 @@
+from sqlalchemy import JSON, Column, DateTime, String, func
+
+from app.core.db import Base
+
+
+class CachedFeedback(Base):
+    """Persistent tier of the feedback cache, see app.conversation.feedback_cache."""
+    __tablename__ = "feedback_cache"
+
+    key = Column(String(64), primary_key=True)
+    feedback = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
@@ -0,0 +1,118 @@
+"""Incremental parsers for streamed LLM output."""
+
+FUSED_REPLY_SEPARATOR = "---REPLY---"
+
+
+class FusedResponseSplitter:
+    """
+    Splits a fused voice-turn stream into the user's transcription and the persona's
+    reply. The model writes the transcription, then FUSED_REPLY_SEPARATOR, then the
+    reply. Text that could be the start of a separator split across deltas is held
+    back until it can be decided.
+    """
+
+    def __init__(self, separator: str = FUSED_REPLY_SEPARATOR):
+        self.separator = separator
+        self.in_reply = False
+        self._reply_started = False
+        self._buffer = ""
+
+    def feed(self, delta: str) -> tuple[str, str]:
+        """Returns the (transcription, reply) text that can be released for this delta."""
+        if self.in_reply:
+            return "", self._reply(delta)
+
+        self._buffer += delta
+        index = self._buffer.find(self.separator)
+        if index >= 0:
+            transcription = self._buffer[:index]
+            reply = self._buffer[index + len(self.separator):]
+            self._buffer = ""
+            self.in_reply = True
+            return transcription, self._reply(reply)
+
+        held = self._partial_separator_length()
+        released = self._buffer[: len(self._buffer) - held]
+        self._buffer = self._buffer[len(self._buffer) - held:]
+        return released, ""
+
+    def flush(self) -> str:
+        """Whatever transcription is still held back once the stream has ended."""
+        remaining, self._buffer = self._buffer, ""
+        return remaining
+
+    def _reply(self, delta: str) -> str:
+        # drop the line break(s) after the separator, wherever the delta boundary falls
+        if not self._reply_started:
+            delta = delta.lstrip()
+            self._reply_started = bool(delta)
+        return delta
+
+    def _partial_separator_length(self) -> int:
+        for size in range(min(len(self._buffer), len(self.separator) - 1), 0, -1):
+            if self.separator.startswith(self._buffer[-size:]):
+                return size
+        return 0
+
+
+class JSONArrayItemParser:
+    """
+    Pulls the objects out of a JSON array as it streams in, e.g. the items of
+    `{"feedback": [{...}, {...}]}`. An object is released as soon as its closing brace
+    arrives, without waiting for the rest of the document. Only objects that sit
+    directly in an array are released, objects nested inside an item stay part of it.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        # open containers, "{" or "["
+        self._stack: list[str] = []
+        self._item_start: int | None = None
+        self._item_depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._position = 0
+
+    def feed(self, delta: str) -> list[str]:
+        """Returns the raw JSON of the items completed by this delta."""
+        self._buffer += delta
+        items = []
+        while self._position < len(self._buffer):
+            char = self._buffer[self._position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if (
+                    char == "{"
+                    and self._item_start is None
+                    and self._stack
+                    and self._stack[-1] == "["
+                    and self._stack.count("[") == 1
+                ):
+                    self._item_start = self._position
+                    self._item_depth = len(self._stack)
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if self._item_start is not None and len(self._stack) == self._item_depth:
+                    items.append(self._buffer[self._item_start: self._position + 1])
+                    self._item_start = None
+            self._position += 1
+        self._compact()
+        return items
+
+    def _compact(self):
+        # everything before the current item (or all of it, between items) is done with
+        keep_from = self._item_start if self._item_start is not None else self._position
+        self._buffer = self._buffer[keep_from:]
+        self._position -= keep_from
+        if self._item_start is not None:
+            self._item_start = 0
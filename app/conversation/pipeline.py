@@ -0,0 +1,115 @@
+"""
+Direct turn engine, selected with CONVERSATION_ENGINE=direct. It runs the steps of a
+ConversationWorkflow as plain coroutines in a fixed order instead of going through
+Workflow.run, the runtime Context and its event dispatch:
+
+    process_user_input -> transcribe_audio_input | transcribe_and_respond
+    -> construct_prompt -> stream_ai_response -> generate_feedback + save_audio
+
+The steps themselves are the workflow's, so history, speculation and warm state are
+shared and both engines write the same events to the stream. The two tails run
+concurrently in a task group, which is what finish_turn joins in the workflow.
+tests/conversation/test_engine_parity.py and scripts/benchmark_engines.py compare them.
+"""
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Any, AsyncGenerator
+
+from workflows.events import Event, StartEvent, StopEvent
+
+from app.conversation.constants import turn_timeout
+from app.conversation.events import (
+    AudioInputReceived,
+    FullResponseGenerated,
+    UserMessageReady,
+    VoiceTurnReceived,
+)
+from app.conversation.workflows import ConversationWorkflow
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _TurnStore:
+    """The part of the workflow context store the steps use."""
+
+    def __init__(self):
+        self._values: dict[str, Any] = {}
+
+    async def get(self, path: str, default: Any = _MISSING) -> Any:
+        if path in self._values:
+            return self._values[path]
+        if default is _MISSING:
+            raise KeyError(path)
+        return default
+
+    async def set(self, path: str, value: Any):
+        self._values[path] = value
+
+
+class DirectTurnContext:
+    """Stands in for the workflow Context the steps are called with."""
+
+    def __init__(self):
+        self.store = _TurnStore()
+        # None ends the stream
+        self._events: asyncio.Queue[Event | None] = asyncio.Queue()
+
+    def write_event_to_stream(self, ev: Event):
+        self._events.put_nowait(ev)
+
+    def close(self):
+        self._events.put_nowait(None)
+
+    async def next_event(self) -> Event | None:
+        return await self._events.get()
+
+
+async def _run_steps(workflow: ConversationWorkflow, ctx: DirectTurnContext, start_input: dict):
+    ev = await workflow.process_user_input(ctx, StartEvent(input=start_input))
+    if isinstance(ev, AudioInputReceived):
+        ev = await workflow.transcribe_audio_input(ctx, ev)
+    elif isinstance(ev, VoiceTurnReceived):
+        ev = await workflow.transcribe_and_respond(ctx, ev)
+    if isinstance(ev, StopEvent):
+        return
+    if isinstance(ev, UserMessageReady):
+        prompt = await workflow.construct_prompt(ctx, ev)
+        ev = await workflow.stream_ai_response(ctx, prompt)
+
+    response: FullResponseGenerated = ev
+    async with asyncio.TaskGroup() as tails:
+        tails.create_task(workflow.generate_feedback(ctx, response))
+        tails.create_task(workflow.save_audio(ctx, response))
+    logger.info("Turn finished.")
+
+
+async def _run_turn(workflow: ConversationWorkflow, ctx: DirectTurnContext, start_input: dict):
+    # like a failed workflow run, a failed turn ends its stream without raising
+    try:
+        async with asyncio.timeout(turn_timeout()):
+            await _run_steps(workflow, ctx, start_input)
+    except TimeoutError:
+        logger.error("Turn did not finish within %.0fs.", turn_timeout())
+    except Exception as e:
+        logger.error("Turn failed: %s", e, exc_info=True)
+    finally:
+        ctx.close()
+
+
+async def stream_direct_turn(
+    workflow: ConversationWorkflow, start_input: dict
+) -> AsyncGenerator[Event, None]:
+    """Runs one turn and yields the events its steps write to the stream."""
+    ctx = DirectTurnContext()
+    task = asyncio.create_task(_run_turn(workflow, ctx, start_input))
+    try:
+        while (event := await ctx.next_event()) is not None:
+            yield event
+    finally:
+        if not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
@@ -1,16 +1,26 @@
+import asyncio
 import base64
 import logging
-from typing import Any, Callable, Coroutine
+from typing import TYPE_CHECKING, Any, Callable, Coroutine
 import uuid
 
 from fastapi import WebSocketDisconnect
 
 from app.commons.websocket_conn_manager import WebSocketConnectionManager
-from app.conversation.enums import ConversationEventType, FeedbackType
-from app.conversation.services import ConversationService
+from app.conversation.admission import AdmissionController, AdmissionRejected
+from app.conversation.enums import AudioMode, ConversationEventType, FeedbackType
+from app.conversation.sessions import ConversationSession, SessionRegistry
+from app.core.config import get_settings
+from app.core.log import SampledLogger, log_context
+from app.core.metrics import metrics
+from app.core.profiling import get_turn_profiler, mark_stage
 from app.core.templating import templates
 
+if TYPE_CHECKING:
+    from app.conversation.services import ConversationService, QueuedConversationService
+
 logger = logging.getLogger(__name__)
+chunk_logger = SampledLogger(logger, interval=1.0)
 
 Handler = Callable[[Any, str], Coroutine[Any, Any, None]]
 
@@ -18,17 +28,24 @@ Handler = Callable[[Any, str], Coroutine[Any, Any, None]]
 class WebSocketOrchestrator:
     def __init__(
         self,
-        conversation_service: ConversationService,
+        conversation_service: "ConversationService | QueuedConversationService",
         manager: WebSocketConnectionManager,
+        admission: AdmissionController,
+        sessions: SessionRegistry,
     ):
         self.conversation_service = conversation_service
         self.manager = manager
+        self.admission = admission
+        self.sessions = sessions
+        self.session: ConversationSession | None = None
+        self._warm_up_task: asyncio.Task | None = None
         self.event_handlers: dict[ConversationEventType, Handler] = {
             ConversationEventType.AI_TEXT_CHUNK_GENERATED: self._render_ai_text_chunk,
             ConversationEventType.FEEDBACK_GENERATED: self._render_user_message_feedback,
             ConversationEventType.AI_AUDIO_CHUNK_GENERATED: self._send_ai_audio_chunk,
             ConversationEventType.AI_AUDIO_READY: self._render_ai_audio_player,
             ConversationEventType.USER_TRANSCRIPTION_CHUNK_GENERATED: self._render_user_transcription_chunk,
+            ConversationEventType.TURN_DEGRADED: self._render_turn_degraded,
         }
 
     async def _process_and_render_event_chunk(
@@ -42,15 +59,55 @@ class WebSocketOrchestrator:
         await handler(event_data, turn_id)
 
     async def handle_connection(
-        self, language_profile_id: int
+        self,
+        language_profile_id: int,
+        session_id: str,
+        persona_id: int | None = None,
+        audio_mode: AudioMode | None = None,
     ):
         logger.info(
-            f"WebSocket connection established for language_profile_id={language_profile_id}"
+            "WebSocket connection established for language_profile_id=%s", language_profile_id
         )
+        self.session, resumed = self.sessions.open(
+            session_id, self.manager, self.conversation_service
+        )
+        if resumed:
+            # the session keeps the workflow (and its history) of the dropped connection
+            logger.info("Reattaching to session %s.", session_id)
+            await self.conversation_service.close()
+            self.conversation_service = self.session.conversation_service
+        elif persona_id is not None and get_settings().PREWARM_ENABLED:
+            # runs while the user composes the first message
+            self._warm_up_task = asyncio.create_task(
+                self.conversation_service.warm_up(
+                    persona_id=persona_id, language_profile_id=language_profile_id
+                )
+            )
+        self.admission.connection_opened()
         try:
             while True:
                 data = await self.manager.receive_json()
-                logger.info("Received JSON data from client.")
+                logger.debug("Received JSON data from client.")
+
+                if "resume_from" in data:
+                    if not await self.session.resume(self.manager, int(data["resume_from"])):
+                        logger.warning("Could not replay every missed frame to the client.")
+                        await self._render_session_gap()
+                    continue
+
+                if "draft" in data:
+                    await self._speculate_feedback(data["draft"], int(data["persona_id"]), language_profile_id)
+                    continue
+
+                turn_key = data.get("turn_key")
+                if turn_key and (original := self.session.find_turn(turn_key)):
+                    logger.info("Duplicate submission of turn %s, attaching to it.", original.turn_id)
+                    metrics.increment("turn_duplicates_total")
+                    await self.session.attach_to_turn(self.manager, original)
+                    continue
+                if not self.session.is_live(self.manager):
+                    # a client that reconnected without resuming only sees new frames
+                    await self.session.resume(self.manager, self.session.last_seq)
 
                 persona_id = data["persona_id"]
 
@@ -67,38 +124,157 @@ class WebSocketOrchestrator:
                     raise ValueError("Invalid data received from client.")
 
                 turn_id = str(uuid.uuid4())
-                logger.info(f"Initiating turn {turn_id}.")
+                # a turn may override the connection's audio mode, e.g. when the user mutes
+                turn_audio_mode = AudioMode(data.get("audio_mode") or audio_mode or get_settings().DEFAULT_AUDIO_MODE)
+                with log_context(turn_id=turn_id):
+                    logger.info("Initiating turn.")
+                    await self.session.run_turn(
+                        self._run_turn(
+                            turn_id=turn_id,
+                            user_message_data=user_message_data,
+                            persona_id=persona_id,
+                            language_profile_id=language_profile_id,
+                            is_conversational=is_conversational,
+                            audio_mode=turn_audio_mode,
+                        ),
+                        turn_id=turn_id,
+                        turn_key=turn_key,
+                    )
 
-                await self._render_user_bubble_with_loading_state(
-                    user_message_data if isinstance(user_message_data, str) else "",
-                    turn_id,
-                    is_conversational=is_conversational,
-                )
+        except WebSocketDisconnect:
+            logger.info("Client disconnected. Connection handled gracefully.")
+        except Exception as e:
+            logger.error("An error occurred in WebSocket: %s", e, exc_info=True)
+        finally:
+            self.admission.connection_closed()
+            if self._warm_up_task and not self._warm_up_task.done():
+                self._warm_up_task.cancel()
+            self.sessions.release(self.session, self.manager)
+
+    async def _speculate_feedback(self, draft: str, persona_id: int, language_profile_id: int):
+        """Feedback for the text being typed, so it is ready if that text is sent."""
+        settings = get_settings()
+        if not settings.FEEDBACK_SPECULATION_ENABLED or len(draft.strip()) < settings.FEEDBACK_SPECULATION_MIN_CHARS:
+            return
+        try:
+            await self.conversation_service.speculate_feedback(
+                text=draft, persona_id=persona_id, language_profile_id=language_profile_id
+            )
+        except Exception as e:
+            logger.warning("Could not speculate feedback on the draft: %s", e)
+
+    async def _wait_for_warm_up(self):
+        """A turn that arrives mid warm-up waits for it instead of racing it for the same connections."""
+        if self._warm_up_task is None:
+            return
+        try:
+            await self._warm_up_task
+        except Exception as e:
+            logger.warning("Warm-up failed, continuing cold: %s", e)
+        self._warm_up_task = None
+
+    async def _run_turn(
+        self,
+        *,
+        turn_id: str,
+        user_message_data: str | bytes,
+        persona_id: int,
+        language_profile_id: int,
+        is_conversational: bool,
+        audio_mode: AudioMode,
+    ):
+        async with get_turn_profiler().turn(turn_id, session_id=self.session.session_id):
+            await self._admit_and_stream_turn(
+                turn_id=turn_id,
+                user_message_data=user_message_data,
+                persona_id=persona_id,
+                language_profile_id=language_profile_id,
+                is_conversational=is_conversational,
+                audio_mode=audio_mode,
+            )
+
+    async def _admit_and_stream_turn(
+        self,
+        *,
+        turn_id: str,
+        user_message_data: str | bytes,
+        persona_id: int,
+        language_profile_id: int,
+        is_conversational: bool,
+        audio_mode: AudioMode,
+    ):
+        await self._render_user_bubble_with_loading_state(
+            user_message_data if isinstance(user_message_data, str) else "",
+            turn_id,
+            is_conversational=is_conversational,
+        )
 
-                # This is a temporary solution until personas are properly managed.
-                persona_initial = "P"
+        # This is a temporary solution until personas are properly managed.
+        persona_initial = "P"
 
-                await self._render_ai_bubble_place_holder(turn_id, persona_initial)
+        await self._render_ai_bubble_place_holder(turn_id, persona_initial)
 
-                stream = self.conversation_service.run_conversation_turn(
+        queued = False
+
+        async def on_queued(position: int, estimated_wait: float):
+            nonlocal queued
+            queued = True
+            await self._render_turn_status(turn_id, "queued", estimated_wait)
+
+        try:
+            async with self.admission.admit(on_queued=on_queued):
+                mark_stage("admitted")
+                if queued:
+                    await self._render_turn_status(turn_id, None)
+                await self._stream_turn(
+                    turn_id=turn_id,
                     user_message_data=user_message_data,
                     persona_id=persona_id,
                     language_profile_id=language_profile_id,
+                    is_conversational=is_conversational,
+                    audio_mode=audio_mode,
                 )
+        except AdmissionRejected:
+            logger.warning("Turn rejected, too many turns waiting.")
+            await self._render_turn_status(turn_id, "rejected")
+            if is_conversational:
+                await self._render_user_feedback(turn_id, None)
+        finally:
+            await self._render_turn_finished(turn_id)
+
+    async def _stream_turn(
+        self,
+        *,
+        turn_id: str,
+        user_message_data: str | bytes,
+        persona_id: int,
+        language_profile_id: int,
+        is_conversational: bool,
+        audio_mode: AudioMode,
+    ):
+        await self._wait_for_warm_up()
 
-                analysis_complete = False
-                async for chunk in stream:
-                    logger.info(f"Rendering event '{chunk['type']}' for turn_id={turn_id}")
-                    if not analysis_complete and is_conversational:
-                        # For conversational (text) turns, remove the spinner on the first AI response chunk.
-                        await self._render_user_feedback(turn_id, None)
-                        analysis_complete = True
-                    await self._process_and_render_event_chunk(chunk, turn_id)
+        stream = self.conversation_service.run_conversation_turn(
+            user_message_data=user_message_data,
+            persona_id=persona_id,
+            language_profile_id=language_profile_id,
+            turn_id=turn_id,
+            audio_mode=audio_mode,
+        )
 
-        except WebSocketDisconnect:
-            logger.info("Client disconnected. Connection handled gracefully.")
-        except Exception as e:
-            logger.error(f"An error occurred in WebSocket: {e}", exc_info=True)
+        analysis_complete = False
+        first_event = True
+        async for chunk in stream:
+            chunk_logger.debug("Rendering event '%s'", chunk["type"])
+            if first_event:
+                mark_stage("first_event")
+                first_event = False
+            if not analysis_complete and is_conversational:
+                # For conversational (text) turns, remove the spinner on the first AI response chunk.
+                await self._render_user_feedback(turn_id, None)
+                analysis_complete = True
+            await self._process_and_render_event_chunk(chunk, turn_id)
+        mark_stage("last_event")
 
     async def _render_user_bubble_with_loading_state(
         self, message: str, turn_id: str, is_conversational: bool
@@ -108,7 +284,7 @@ class WebSocketOrchestrator:
         ).render(
             {"message": message, "turn_id": turn_id, "is_conversational": is_conversational}
         )
-        await self.manager.send_html(template)
+        await self.session.send_html(template)
 
     async def _render_ai_bubble_place_holder(
         self, turn_id: str, persona_initial: str
@@ -116,7 +292,7 @@ class WebSocketOrchestrator:
         template = templates.get_template(
             "conversation/partials/ai_message_bubble.html"
         ).render({"turn_id": turn_id, "persona_initial": persona_initial})
-        await self.manager.send_html(template)
+        await self.session.send_html(template)
 
     async def _render_user_feedback(
         self, turn_id: str, feedback: dict | None
@@ -135,7 +311,7 @@ class WebSocketOrchestrator:
             "feedback_level": feedback_level,
         }
         template = templates.get_template("conversation/partials/user_message_feedback.html").render(context)
-        await self.manager.send_html(template)
+        await self.session.send_html(template)
 
     async def _render_ai_text_chunk(
         self, data: Any, turn_id: str
@@ -143,7 +319,7 @@ class WebSocketOrchestrator:
         template = templates.get_template(
             "conversation/partials/streaming_token.html"
         ).render({"token": data, "turn_id": turn_id})
-        await self.manager.send_html(template)
+        await self.session.send_html(template)
 
     async def _render_user_message_feedback(
         self, data: Any, turn_id: str
@@ -153,15 +329,17 @@ class WebSocketOrchestrator:
     async def _send_ai_audio_chunk(
         self, data: Any, _turn_id: str
     ):
-        await self.manager.send_bytes(data)
+        await self.session.send_bytes(data)
 
     async def _render_ai_audio_player(
         self, data: Any, turn_id: str
     ):
         template = templates.get_template(
             "conversation/partials/audio_player.html"
-        ).render({"audio_url": data["audio_url"], "turn_id": turn_id})
-        await self.manager.send_html(template)
+        ).render(
+            {"audio_url": data["audio_url"], "on_demand": data.get("on_demand", False), "turn_id": turn_id}
+        )
+        await self.session.send_html(template)
 
     async def _render_user_transcription_chunk(
         self, data: Any, turn_id: str
@@ -169,4 +347,32 @@ class WebSocketOrchestrator:
         template = templates.get_template(
             "conversation/partials/user_message_streaming_token.html"
         ).render({"token": data, "turn_id": turn_id})
-        await self.manager.send_html(template)
\ No newline at end of file
+        await self.session.send_html(template)
+
+    async def _render_turn_degraded(
+        self, data: Any, turn_id: str
+    ):
+        template = templates.get_template(
+            "conversation/partials/turn_degraded_notice.html"
+        ).render({"fallback": data["fallback"], "turn_id": turn_id})
+        await self.session.send_html(template)
+
+    async def _render_turn_status(
+        self, turn_id: str, status: str | None, estimated_wait: float = 0.0
+    ):
+        template = templates.get_template(
+            "conversation/partials/turn_status.html"
+        ).render({"status": status, "estimated_wait": round(estimated_wait), "turn_id": turn_id})
+        await self.session.send_html(template)
+
+    async def _render_session_gap(self):
+        template = templates.get_template(
+            "conversation/partials/session_gap_notice.html"
+        ).render({})
+        await self.session.send_html(template)
+
+    async def _render_turn_finished(self, turn_id: str):
+        template = templates.get_template(
+            "conversation/partials/turn_finished.html"
+        ).render({"turn_id": turn_id})
+        await self.session.send_html(template)
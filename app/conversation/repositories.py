@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import literal, select
+from sqlalchemy.orm import contains_eager
+
+from app.commons.repositories import BaseRepository
+from app.conversation.models import CachedFeedback
+from app.language_profiles.models import LanguageProfile, PracticeTopic
+from app.personas.models import Persona
+from app.settings.models import Settings
+
+
+class FeedbackCacheRepository(BaseRepository[CachedFeedback]):
+    model = CachedFeedback
+
+    def __init__(self, db):
+        super().__init__(db)
+
+    def get_fresh(self, key: str, max_age_seconds: float) -> CachedFeedback | None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+        return self.db.execute(
+            select(self.model).where(self.model.key == key, self.model.created_at >= cutoff)
+        ).scalar_one_or_none()
+
+    def upsert(self, key: str, feedback: list[dict]):
+        # savepoint, a failed cache write must not poison the turn's transaction
+        with self.db.begin_nested():
+            self.db.merge(
+                self.model(key=key, feedback=feedback, created_at=datetime.now(timezone.utc))
+            )
+
+
+class ConversationBootstrapRepository:
+    """Everything the conversation page and its websocket need, in a single query."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def fetch(
+        self, language_profile_id: int, persona_id: int | None = None
+    ) -> tuple[LanguageProfile, Persona | None, Settings | None] | None:
+        """
+        The profile with its topics, the persona (the first one when `persona_id` is
+        None) and the settings row. Topics are joined, so the profile, persona and
+        settings columns repeat on every topic row; profiles only have a handful.
+        """
+        if persona_id is None:
+            persona_id_query = select(Persona.id).order_by(Persona.id).limit(1).scalar_subquery()
+        else:
+            persona_id_query = literal(persona_id)
+        statement = (
+            select(LanguageProfile, Persona, Settings)
+            .outerjoin(LanguageProfile.practice_topics)
+            .outerjoin(Persona, Persona.id == persona_id_query)
+            .outerjoin(Settings, Settings.id == 1)
+            .options(contains_eager(LanguageProfile.practice_topics))
+            .where(LanguageProfile.id == language_profile_id)
+            .order_by(PracticeTopic.id)
+        )
+        # every row has to be read for the topics collection to be complete
+        rows = self.db.execute(statement).unique().all()
+        return tuple(rows[0]) if rows else None
@@ -1,15 +1,28 @@
-from fastapi import APIRouter, Depends, Request, WebSocket
-from fastapi.responses import HTMLResponse
+from typing import TYPE_CHECKING
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, status
+from fastapi.responses import FileResponse, HTMLResponse
 
 from app.commons.websocket_conn_manager import WebSocketConnectionManager
+from app.core.config import get_settings
 from app.core.templating import templates
-from app.language_profiles.dependencies import get_language_profile_service
-from app.language_profiles.services import LanguageProfileService
-from app.personas.dependencies import get_persona_service
-from app.personas.services import PersonaService
-from app.conversation.services import ConversationService
-from app.conversation.dependencies import get_conversation_service
+from app.conversation.admission import AdmissionController
+from app.conversation.bootstrap import ConversationBootstrapService
+from app.conversation.dependencies import (
+    get_conversation_bootstrap_service,
+    get_conversation_service,
+    get_elevenlabs_tts_client,
+    require_admission_capacity,
+)
+from app.conversation.enums import AudioMode
 from app.conversation.presentation import WebSocketOrchestrator
+from app.conversation.sessions import get_session_registry
+from app.conversation.speech import SpeechNotFound, synthesize_deferred_speech
+
+if TYPE_CHECKING:
+    from app.clients.elevenlabs.elevenlabs_tts import ElevenLabsTTS
+    from app.conversation.services import ConversationService, QueuedConversationService
 
 router = APIRouter()
 
@@ -20,19 +33,23 @@ router = APIRouter()
 async def view_conversation_page(
     request: Request,
     language_profile_id: int,
-    language_profile_service: LanguageProfileService = Depends(
-        get_language_profile_service
-    ),
-    persona_service: PersonaService = Depends(get_persona_service),
+    bootstrap: ConversationBootstrapService = Depends(get_conversation_bootstrap_service),
 ):
-    language_profile = language_profile_service.get_language_profile(language_profile_id)
-    # This is a temporary mock to align with the new frontend design.
+    # This is a temporary mock to align with the new frontend design: the first persona.
     # The language_profile should eventually have a direct relationship to a persona.
-    persona = persona_service.list_personas()[0]
+    conversation = bootstrap.get_context(language_profile_id)
+    if conversation is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Language profile or persona not found."
+        )
     context = {
         "request": request,
-        "language_profile": language_profile,
-        "persona": persona,
+        "language_profile": conversation.language_profile,
+        "persona": conversation.persona,
+        # websocket reconnects of this page resume the same conversation session
+        "session_id": str(uuid.uuid4()),
+        "audio_modes": list(AudioMode),
+        "default_audio_mode": get_settings().DEFAULT_AUDIO_MODE,
     }
     return templates.TemplateResponse("conversation/pages/main.html", context)
 
@@ -42,12 +59,39 @@ async def view_conversation_page(
 async def conversation_websocket(
     websocket: WebSocket,
     language_profile_id: int,
-    conversation_service: ConversationService = Depends(get_conversation_service), # todo check db conn
+    persona_id: int | None = None,
+    session_id: str | None = None,
+    audio_mode: AudioMode | None = None,
+    # resolved first, so a busy process refuses before building a workflow
+    admission: AdmissionController = Depends(require_admission_capacity),
+    conversation_service: "ConversationService | QueuedConversationService" = Depends(
+        get_conversation_service
+    ),
 ):
     manager = WebSocketConnectionManager(websocket)
     await manager.connect()
     orchestrator = WebSocketOrchestrator(
         conversation_service=conversation_service,
         manager=manager,
+        admission=admission,
+        sessions=get_session_registry(),
     )
-    await orchestrator.handle_connection(language_profile_id)
+    await orchestrator.handle_connection(
+        language_profile_id,
+        session_id=session_id or str(uuid.uuid4()),
+        persona_id=persona_id,
+        audio_mode=audio_mode,
+    )
+
+
+@router.get("/audio/{speech_id}", name="conversation_audio")
+async def conversation_audio(
+    speech_id: uuid.UUID,
+    elevenlabs_tts: "ElevenLabsTTS" = Depends(get_elevenlabs_tts_client),
+):
+    """Audio of an on-demand reply, synthesized on the first play and cached on disk."""
+    try:
+        wav_path = await synthesize_deferred_speech(str(speech_id), elevenlabs_tts)
+    except SpeechNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audio not found.")
+    return FileResponse(wav_path, media_type="audio/wav")
@@ -3,6 +3,9 @@ from typing import Optional
 from pydantic import BaseModel, Field
 
 from app.conversation.enums import FeedbackType
+from app.language_profiles.schemas import LanguageProfileRead
+from app.personas.schemas import PersonaRead
+from app.settings.schemas import SettingsRead
 
 class Feedback(BaseModel):
     type: FeedbackType = Field(
@@ -16,4 +19,24 @@ class Feedback(BaseModel):
 class FeedbackResponse(BaseModel):
     feedback: list[Feedback] = Field(
         description="A list of feedback items on the user's last message."
-    )
\ No newline at end of file
+    )
+
+
+class MessageFeedback(BaseModel):
+    turn_id: str = Field(description="The turn_id of the message this feedback is about.")
+    feedback: list[Feedback] = Field(
+        description="A list of feedback items on this user's message."
+    )
+
+
+class BatchedFeedbackResponse(BaseModel):
+    results: list[MessageFeedback] = Field(
+        description="One entry per evaluated message, in any order."
+    )
+
+
+class ConversationContext(BaseModel):
+    """Snapshot of everything a turn looks up, resolved once per conversation."""
+    persona: PersonaRead
+    settings: SettingsRead
+    language_profile: LanguageProfileRead
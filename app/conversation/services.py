@@ -1,18 +1,66 @@
+import asyncio
 import logging
-from typing import AsyncGenerator
-
-from app.conversation.enums import ConversationEventType
-from app.conversation.events import (
-    AIAudioChunkGenerated,
-    AIAudioReady,
-    FeedbackGenerated,
-    AITextChunkGenerated,
-    UserTranscriptionChunkGenerated,
-)
-from app.conversation.workflows import ConversationWorkflow
+import uuid
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Callable
+
+from app.conversation.broker import ConversationBroker, ConversationJob
+from app.conversation.enums import AudioMode, ConversationEventType, ConversationJobKind
+from app.core.config import get_settings
+from app.core.profiling import current_profile
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+    from app.conversation.workflows import ConversationWorkflow
 
 logger = logging.getLogger(__name__)
 
+EventMapper = Callable[[Any], dict]
+
+
+@lru_cache
+def _event_mappers() -> dict[type, EventMapper]:
+    """Stream event class -> the event dict it becomes. Both engines go through this."""
+    # the events pull in llama_index, keep them off the gateway's import path
+    from app.conversation.events import (
+        AIAudioChunkGenerated,
+        AIAudioReady,
+        FeedbackGenerated,
+        AITextChunkGenerated,
+        TurnDegraded,
+        UserTranscriptionChunkGenerated,
+    )
+
+    return {
+        AITextChunkGenerated: lambda event: {
+            "type": ConversationEventType.AI_TEXT_CHUNK_GENERATED, "data": event.delta
+        },
+        FeedbackGenerated: lambda event: {
+            "type": ConversationEventType.FEEDBACK_GENERATED, "data": event.feedback.model_dump()
+        },
+        AIAudioChunkGenerated: lambda event: {
+            "type": ConversationEventType.AI_AUDIO_CHUNK_GENERATED, "data": event.chunk
+        },
+        AIAudioReady: lambda event: {
+            "type": ConversationEventType.AI_AUDIO_READY,
+            "data": {"audio_url": event.audio_url, "on_demand": event.on_demand},
+        },
+        UserTranscriptionChunkGenerated: lambda event: {
+            "type": ConversationEventType.USER_TRANSCRIPTION_CHUNK_GENERATED, "data": event.delta
+        },
+        TurnDegraded: lambda event: {
+            "type": ConversationEventType.TURN_DEGRADED,
+            "data": {"stage": event.stage, "fallback": event.fallback, "reason": event.reason},
+        },
+    }
+
+
+def _is_stop_event(event: Any) -> bool:
+    from workflows.events import StopEvent
+
+    return isinstance(event, StopEvent)
+
 
 class ConversationService:
     """
@@ -20,31 +68,155 @@ class ConversationService:
     so we use this service to map the IO and behavior like what events and data is being generated.
     """
 
-    def __init__(self, workflow: ConversationWorkflow):
+    def __init__(self, workflow: "ConversationWorkflow", engine: str | None = None, db: "Session | None" = None):
         self.workflow = workflow
+        self.engine = engine or get_settings().CONVERSATION_ENGINE
+        # a DB session the service owns, committed after every turn and closed with it
+        self.db = db
+        self._idle_release: asyncio.Task | None = None
 
-    async def run_conversation_turn(self, *, user_message_data: str | bytes, persona_id: int,
-            language_profile_id: int) -> AsyncGenerator[dict, None]:
+    async def warm_up(self, *, persona_id: int, language_profile_id: int):
+        try:
+            await self.workflow.warm_up(persona_id=persona_id, language_profile_id=language_profile_id)
+        finally:
+            # the connection goes back to the pool while the user composes
+            self._end_transaction(commit=True)
+        self._schedule_idle_release()
+
+    def _end_transaction(self, *, commit: bool):
+        if self.db is None:
+            return
+        if commit:
+            self.db.commit()
+        else:
+            self.db.rollback()
 
+    def _schedule_idle_release(self):
+        """Warm connections are held open only while the conversation is active."""
+        self._cancel_idle_release()
+        self._idle_release = asyncio.create_task(self._release_when_idle())
+
+    def _cancel_idle_release(self):
+        if self._idle_release and not self._idle_release.done():
+            self._idle_release.cancel()
+        self._idle_release = None
+
+    async def _release_when_idle(self):
+        await asyncio.sleep(get_settings().PREWARM_IDLE_SECONDS)
+        logger.info("Conversation idle, releasing warm resources.")
+        await self.workflow.release_warm_resources()
+
+    async def run_conversation_turn(self, *, user_message_data: str | bytes, persona_id: int,
+            language_profile_id: int, turn_id: str | None = None,
+            audio_mode: AudioMode | None = None) -> AsyncGenerator[dict, None]:
         start_input = {
             "user_message_data": user_message_data,
             "persona_id": persona_id,
-            "language_profile_id": language_profile_id
+            "language_profile_id": language_profile_id,
+            "turn_id": turn_id,
+            "audio_mode": audio_mode,
         }
 
-        logger.info(f"Starting workflow with input keys: {list(start_input.keys())}")
-        handler = self.workflow.run(input=start_input)
-
-        async for event in handler.stream_events():
-            if isinstance(event, AITextChunkGenerated):
-                yield {"type": ConversationEventType.AI_TEXT_CHUNK_GENERATED, "data": event.delta}
-            elif isinstance(event, FeedbackGenerated):
-                yield {"type": ConversationEventType.FEEDBACK_GENERATED, "data": event.feedback.model_dump()}
-            elif isinstance(event, AIAudioChunkGenerated):
-                yield {"type": ConversationEventType.AI_AUDIO_CHUNK_GENERATED, "data": event.chunk}
-            elif isinstance(event, AIAudioReady):
-                yield {"type": ConversationEventType.AI_AUDIO_READY, "data": {"audio_url": event.audio_url}}
-            elif isinstance(event, UserTranscriptionChunkGenerated):
-                yield {"type": ConversationEventType.USER_TRANSCRIPTION_CHUNK_GENERATED, "data": event.delta}
-            else:
-                logger.warning(f"Unknown event type: {event}")
\ No newline at end of file
+        logger.info("Starting workflow with input keys: %s", list(start_input.keys()))
+        self._cancel_idle_release()
+        try:
+            async for event in self._stream_workflow_events(start_input):
+                yield event
+        except BaseException:
+            self._end_transaction(commit=False)
+            raise
+        else:
+            self._end_transaction(commit=True)
+        finally:
+            if self.workflow.warm_context is not None:
+                self._schedule_idle_release()
+
+    async def _stream_workflow_events(self, start_input: dict) -> AsyncGenerator[dict, None]:
+        if self.engine == "direct":
+            # the pipeline pulls in llama_index, keep it off the gateway's import path
+            from app.conversation.pipeline import stream_direct_turn
+
+            events = stream_direct_turn(self.workflow, start_input)
+        else:
+            events = self.workflow.run(input=start_input).stream_events()
+
+        mappers = _event_mappers()
+        async for event in events:
+            mapper = mappers.get(type(event))
+            if mapper is not None:
+                yield mapper(event)
+            elif not _is_stop_event(event):
+                logger.warning("Unknown event type: %s", event)
+
+    async def speculate_feedback(self, *, text: str, persona_id: int, language_profile_id: int) -> bool:
+        return await self.workflow.speculate_feedback(
+            text=text, persona_id=persona_id, language_profile_id=language_profile_id
+        )
+
+    async def close(self):
+        self._cancel_idle_release()
+        self.workflow.cancel_speculation()
+        await self.workflow.release_warm_resources()
+        if self.db is not None:
+            self.db.close()
+
+
+class QueuedConversationService:
+    """
+    Gateway side of the queue mode. Same interface as ConversationService, but turns
+    are executed by a workflow worker and only their events travel back here.
+    """
+
+    def __init__(self, broker: ConversationBroker):
+        self.broker = broker
+        self.conversation_id = str(uuid.uuid4())
+
+    async def run_conversation_turn(self, *, user_message_data: str | bytes, persona_id: int,
+            language_profile_id: int, turn_id: str | None = None,
+            audio_mode: AudioMode | None = None) -> AsyncGenerator[dict, None]:
+        turn_id = turn_id or str(uuid.uuid4())
+        job = ConversationJob(
+            kind=ConversationJobKind.RUN_TURN,
+            conversation_id=self.conversation_id,
+            turn_id=turn_id,
+            payload={
+                "user_message_data": user_message_data,
+                "persona_id": persona_id,
+                "language_profile_id": language_profile_id,
+                "turn_id": turn_id,
+                "audio_mode": audio_mode,
+            },
+            profile=current_profile() is not None,
+        )
+        logger.info("Forwarding turn of conversation %s to a worker.", self.conversation_id)
+        async for event in self.broker.stream_turn(job):
+            yield event
+
+    async def warm_up(self, *, persona_id: int, language_profile_id: int):
+        """Fire and forget, the worker owning this conversation warms its own workflow."""
+        self.broker.submit(
+            ConversationJob(
+                kind=ConversationJobKind.WARM_UP,
+                conversation_id=self.conversation_id,
+                payload={"persona_id": persona_id, "language_profile_id": language_profile_id},
+            )
+        )
+
+    async def speculate_feedback(self, *, text: str, persona_id: int, language_profile_id: int) -> bool:
+        """
+        Fire and forget, a newer draft replaces the speculation on the worker, which
+        also keeps the budget. Returns whether the draft was handed over.
+        """
+        self.broker.submit(
+            ConversationJob(
+                kind=ConversationJobKind.SPECULATE_FEEDBACK,
+                conversation_id=self.conversation_id,
+                payload={"text": text, "persona_id": persona_id, "language_profile_id": language_profile_id},
+            )
+        )
+        return True
+
+    async def close(self):
+        self.broker.submit(
+            ConversationJob(kind=ConversationJobKind.CLOSE, conversation_id=self.conversation_id)
+        )
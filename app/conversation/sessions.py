@@ -0,0 +1,259 @@
+"""
+Resumable conversation sessions. A session outlives its websocket: it owns the
+conversation service (and with it the workflow history), the turn in flight and a
+buffer of the frames sent to the client, each numbered per conversation. The buffer
+is bounded by the total size of its frames, audio frames are much larger than text
+and a frame count alone would let a session hold many seconds of audio per frame.
+
+When the socket drops the session is detached and kept for
+SESSION_RESUME_GRACE_SECONDS. A turn that is running keeps running and its frames
+are buffered. A client reconnecting with the same session id sends the last sequence
+number it received and gets the missed frames replayed before going live again.
+
+Text frames carry their sequence number in an out-of-band element, binary frames in
+a 4 byte big-endian prefix.
+
+Turns submitted with a client turn key are remembered for TURN_DEDUP_WINDOW_SECONDS,
+so a client retrying a submission is attached to the original turn.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Coroutine
+
+from app.commons.websocket_conn_manager import WebSocketConnectionManager
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+if TYPE_CHECKING:
+    from app.conversation.services import ConversationService, QueuedConversationService
+
+logger = logging.getLogger(__name__)
+
+_SEQ_MARKER = '<div id="ws-seq" data-seq="{seq}" hx-swap-oob="true" hidden></div>'
+
+# upper bound on remembered turn keys, whatever the window
+_MAX_TURN_KEYS = 256
+
+
+def _frame_size(frame: str | bytes) -> int:
+    # text frames are sent as utf-8, len() is close enough and avoids encoding each one
+    return len(frame)
+
+
+@dataclass
+class SubmittedTurn:
+    turn_id: str
+    # first frame of the turn, a duplicate on a new connection is replayed from here
+    first_seq: int
+    task: asyncio.Task
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+class ConversationSession:
+    def __init__(
+        self,
+        session_id: str,
+        conversation_service: "ConversationService | QueuedConversationService",
+        replay_bytes: int,
+        dedup_window_seconds: float = 0,
+    ):
+        self.session_id = session_id
+        self.conversation_service = conversation_service
+        self.last_seq = 0
+        self._replay: deque[tuple[int, str | bytes]] = deque()
+        self._replay_bytes = 0
+        self.replay_bytes = replay_bytes
+        self._connection: WebSocketConnectionManager | None = None
+        # frames go straight to the connection only once it has caught up
+        self._live = False
+        self._send_lock = asyncio.Lock()
+        self._turn_lock = asyncio.Lock()
+        self._turn: asyncio.Task | None = None
+        self.dedup_window_seconds = dedup_window_seconds
+        self._turns: OrderedDict[str, SubmittedTurn] = OrderedDict()
+        self._expiry: asyncio.Task | None = None
+
+    async def send_html(self, html: str):
+        await self._send(html)
+
+    async def send_bytes(self, data: bytes):
+        await self._send(data)
+
+    async def _send(self, frame: str | bytes):
+        async with self._send_lock:
+            self.last_seq += 1
+            self._buffer(self.last_seq, frame)
+            if self._live:
+                await self._deliver(self.last_seq, frame)
+
+    def _buffer(self, seq: int, frame: str | bytes):
+        self._replay.append((seq, frame))
+        self._replay_bytes += _frame_size(frame)
+        # the newest frame is kept even when it is larger than the whole buffer
+        while self._replay_bytes > self.replay_bytes and len(self._replay) > 1:
+            _, dropped = self._replay.popleft()
+            self._replay_bytes -= _frame_size(dropped)
+
+    async def _deliver(self, seq: int, frame: str | bytes):
+        connection = self._connection
+        try:
+            if isinstance(frame, bytes):
+                await connection.send_bytes(seq.to_bytes(4, "big") + frame)
+            else:
+                await connection.send_html(frame + _SEQ_MARKER.format(seq=seq))
+        except Exception as e:
+            logger.info("Connection lost while sending, buffering until the client resumes: %s", e)
+            self._connection = None
+            self._live = False
+
+    def attach(self, connection: WebSocketConnectionManager, *, live: bool):
+        """A resuming connection is attached paused, it goes live in `resume`."""
+        self._cancel_expiry()
+        self._connection = connection
+        self._live = live
+
+    def detach(self, connection: WebSocketConnectionManager) -> bool:
+        """Returns False when another connection has already taken over the session."""
+        if self._connection is not None and self._connection is not connection:
+            return False
+        self._connection = None
+        self._live = False
+        return True
+
+    async def resume(self, connection: WebSocketConnectionManager, last_seq: int) -> bool:
+        """
+        Replays the frames after `last_seq` and goes live. Returns False when they are
+        no longer all buffered (or the client saw frames this session never sent), the
+        client is then live again but has a gap.
+        """
+        async with self._send_lock:
+            if connection is not self._connection:
+                return False
+            oldest = self._replay[0][0] if self._replay else self.last_seq + 1
+            complete = last_seq <= self.last_seq and oldest <= last_seq + 1
+            if self._live:
+                # a fresh session, the client has nothing to catch up on
+                return complete
+            missed = [(seq, frame) for seq, frame in self._replay if seq > last_seq]
+            self._live = True
+            for seq, frame in missed:
+                await self._deliver(seq, frame)
+                if not self._live:
+                    return False
+
+        metrics.increment("session_resumes_total", outcome="replayed" if complete else "gap")
+        metrics.increment("session_replayed_frames_total", len(missed))
+        logger.info("Session resumed from seq %s, replayed %d frames.", last_seq, len(missed))
+        return complete
+
+    def is_live(self, connection: WebSocketConnectionManager) -> bool:
+        return self._live and connection is self._connection
+
+    async def run_turn(self, turn: Coroutine, *, turn_id: str, turn_key: str | None = None):
+        """
+        Runs the turn in its own task, so it survives the connection that started it.
+        Turns of a session run one at a time.
+        """
+
+        async def locked_turn():
+            async with self._turn_lock:
+                await turn
+
+        first_seq = self.last_seq + 1
+        self._turn = asyncio.create_task(locked_turn())
+        if turn_key:
+            self._turns[turn_key] = SubmittedTurn(turn_id=turn_id, first_seq=first_seq, task=self._turn)
+            while len(self._turns) > _MAX_TURN_KEYS:
+                self._turns.popitem(last=False)
+        await asyncio.shield(self._turn)
+
+    def find_turn(self, turn_key: str) -> SubmittedTurn | None:
+        """The turn submitted with `turn_key` within the dedup window, if any."""
+        now = time.monotonic()
+        while self._turns:
+            oldest = next(iter(self._turns.values()))
+            if now - oldest.submitted_at <= self.dedup_window_seconds:
+                break
+            self._turns.popitem(last=False)
+        return self._turns.get(turn_key)
+
+    async def attach_to_turn(self, connection: WebSocketConnectionManager, turn: SubmittedTurn):
+        """
+        Serves a duplicate submission from the original turn. A live connection already
+        receives its frames, one that never resumed gets them replayed from the start.
+        """
+        if not self.is_live(connection):
+            await self.resume(connection, turn.first_seq - 1)
+        await asyncio.shield(turn.task)
+
+    def schedule_expiry(self, grace_seconds: float, on_expired):
+        self._cancel_expiry()
+        self._expiry = asyncio.create_task(self._expire_after(grace_seconds, on_expired))
+
+    def _cancel_expiry(self):
+        if self._expiry and not self._expiry.done():
+            self._expiry.cancel()
+        self._expiry = None
+
+    async def _expire_after(self, grace_seconds: float, on_expired):
+        await asyncio.sleep(grace_seconds)
+        logger.info("Session %s was not resumed, closing it.", self.session_id)
+        on_expired(self)
+        await self.close()
+
+    async def close(self):
+        if self._turn and not self._turn.done():
+            self._turn.cancel()
+        await self.conversation_service.close()
+
+
+class SessionRegistry:
+    def __init__(self, grace_seconds: float, replay_bytes: int, dedup_window_seconds: float):
+        self.grace_seconds = grace_seconds
+        self.replay_bytes = replay_bytes
+        self.dedup_window_seconds = dedup_window_seconds
+        self._sessions: dict[str, ConversationSession] = {}
+
+    def open(
+        self,
+        session_id: str,
+        connection: WebSocketConnectionManager,
+        conversation_service: "ConversationService | QueuedConversationService",
+    ) -> tuple[ConversationSession, bool]:
+        """Returns the session for `session_id` and whether an existing one was resumed."""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.attach(connection, live=False)
+            return session, True
+
+        session = ConversationSession(
+            session_id, conversation_service, self.replay_bytes, self.dedup_window_seconds
+        )
+        session.attach(connection, live=True)
+        self._sessions[session_id] = session
+        metrics.set_gauge("conversation_sessions", len(self._sessions))
+        return session, False
+
+    def release(self, session: ConversationSession, connection: WebSocketConnectionManager):
+        """Called when a connection ends, the session waits for a resume for a while."""
+        if session.detach(connection):
+            session.schedule_expiry(self.grace_seconds, self._forget)
+
+    def _forget(self, session: ConversationSession):
+        if self._sessions.get(session.session_id) is session:
+            del self._sessions[session.session_id]
+        metrics.set_gauge("conversation_sessions", len(self._sessions))
+
+
+@lru_cache
+def get_session_registry() -> SessionRegistry:
+    settings = get_settings()
+    return SessionRegistry(
+        grace_seconds=settings.SESSION_RESUME_GRACE_SECONDS,
+        replay_bytes=settings.SESSION_REPLAY_BUFFER_BYTES,
+        dedup_window_seconds=settings.TURN_DEDUP_WINDOW_SECONDS,
+    )
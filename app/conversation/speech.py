@@ -0,0 +1,135 @@
+"""
+Reply audio on disk. Streamed replies are written as WAV files once the turn is done.
+On-demand replies only get their text written next to where the WAV will be; the
+audio endpoint synthesizes it the first time the player asks for it and serves the
+cached file afterwards. Both live in AUDIO_OUTPUT_DIR, which web process and workers
+already share. The text of replies nobody plays is swept after
+ON_DEMAND_SPEECH_TTL_SECONDS.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+import wave
+from contextlib import suppress
+from typing import TYPE_CHECKING
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.rate_limiting import Priority, get_provider_limiter
+
+if TYPE_CHECKING:
+    from app.clients.elevenlabs.elevenlabs_tts import ElevenLabsTTS
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000
+
+
+class _SynthesisLock:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # requests holding or waiting for the lock
+        self.users = 0
+
+
+# one synthesis per speech id, concurrent plays of the same reply wait for it
+_synthesis_locks: dict[str, _SynthesisLock] = {}
+
+
+class SpeechNotFound(Exception):
+    pass
+
+
+def _path(file_name: str) -> str:
+    return os.path.join(get_settings().AUDIO_OUTPUT_DIR, file_name)
+
+
+def write_wav(audio_bytes: bytes, speech_id: str | None = None) -> str:
+    """Writes 16-bit mono PCM as a WAV file and returns its URL."""
+    speech_id = speech_id or str(uuid.uuid4())
+    os.makedirs(get_settings().AUDIO_OUTPUT_DIR, exist_ok=True)
+    file_path = _path(f"{speech_id}.wav")
+    with wave.open(file_path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 16-bit PCM
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(audio_bytes)
+    logger.info("Audio saved to %s.", file_path)
+    return f"/static/audio/{speech_id}.wav"
+
+
+def defer_speech(text: str) -> str:
+    """Stores the reply text for later synthesis and returns the URL that produces its audio."""
+    speech_id = str(uuid.uuid4())
+    os.makedirs(get_settings().AUDIO_OUTPUT_DIR, exist_ok=True)
+    with open(_path(f"{speech_id}.txt"), "w", encoding="utf-8") as f:
+        f.write(text)
+    return f"/conversation/audio/{speech_id}"
+
+
+async def synthesize_deferred_speech(speech_id: str, tts: "ElevenLabsTTS") -> str:
+    """Returns the WAV path for `speech_id`, synthesizing it on the first request."""
+    wav_path = _path(f"{speech_id}.wav")
+    text_path = _path(f"{speech_id}.txt")
+    synthesis = _synthesis_locks.setdefault(speech_id, _SynthesisLock())
+    synthesis.users += 1
+    try:
+        async with synthesis.lock:
+            if os.path.exists(wav_path):
+                metrics.increment("tts_on_demand_total", result="cached")
+                return wav_path
+            if not os.path.exists(text_path):
+                raise SpeechNotFound(speech_id)
+            with open(text_path, encoding="utf-8") as f:
+                text = f.read()
+
+            async def text_stream():
+                yield text
+
+            audio_bytes = b""
+            # the user is waiting on the play button
+            limiter = get_provider_limiter("elevenlabs", tts.model_id)
+            async with limiter.limit(priority=Priority.INTERACTIVE, connection_id=speech_id):
+                async for chunk in tts.stream(text_stream()):
+                    audio_bytes += chunk
+            await asyncio.to_thread(write_wav, audio_bytes, speech_id)
+            with suppress(FileNotFoundError):
+                # swept meanwhile
+                os.remove(text_path)
+            metrics.increment("tts_on_demand_total", result="synthesized")
+            return wav_path
+    finally:
+        # a request still waiting keeps the lock, or a new one could start a second synthesis
+        synthesis.users -= 1
+        if synthesis.users == 0:
+            _synthesis_locks.pop(speech_id, None)
+
+
+def remove_unplayed_speech(max_age: float) -> int:
+    """Deletes the text of on-demand replies not played within `max_age` seconds."""
+    cutoff = time.time() - max_age
+    removed = 0
+    with os.scandir(get_settings().AUDIO_OUTPUT_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".txt") and entry.stat().st_mtime < cutoff:
+                with suppress(FileNotFoundError):
+                    os.remove(entry.path)
+                    removed += 1
+    return removed
+
+
+async def sweep_unplayed_speech():
+    """Runs remove_unplayed_speech every ON_DEMAND_SPEECH_SWEEP_SECONDS, until cancelled."""
+    settings = get_settings()
+    while True:
+        await asyncio.sleep(settings.ON_DEMAND_SPEECH_SWEEP_SECONDS)
+        try:
+            removed = await asyncio.to_thread(remove_unplayed_speech, settings.ON_DEMAND_SPEECH_TTL_SECONDS)
+        except OSError as e:
+            logger.warning("Could not sweep unplayed speech: %s", e)
+            continue
+        if removed:
+            metrics.increment("tts_on_demand_total", removed, result="expired")
+            logger.info("Removed the text of %d replies that were never played.", removed)
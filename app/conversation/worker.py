@@ -0,0 +1,174 @@
+"""
+Workflow worker. Executes conversation jobs coming from the gateway and streams
+the resulting event dicts back through the broker.
+"""
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Awaitable, Callable
+
+from sqlalchemy.orm import Session
+
+from app.conversation.broker import ConversationJob, ConversationJobEvent
+from app.conversation.enums import ConversationJobKind
+from app.core.db import get_engine
+from app.core.config import get_settings
+from app.core.log import LOG_FORMAT, log_context, setup_logging
+from app.core.loop_watchdog import get_loop_watchdog
+from app.core.profiling import get_turn_profiler
+
+logger = logging.getLogger(__name__)
+
+Emit = Callable[[ConversationJobEvent], None]
+
+
+class _WorkerConversation:
+    """The DB session and service (with its workflow history) of one conversation."""
+
+    def __init__(self):
+        from app.conversation.dependencies import build_conversation_service
+
+        self.db = Session(get_engine())
+        self.service = build_conversation_service(self.db)
+        # turns of a conversation must not interleave, they share the history
+        self.lock = asyncio.Lock()
+
+    def close(self):
+        self.db.close()
+
+
+class ConversationWorker:
+    def __init__(self):
+        # set up off the event loop, a conversation is here from its first job on
+        self._conversations: dict[str, asyncio.Future[_WorkerConversation]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._running_turns: dict[str, asyncio.Task] = {}
+
+    async def serve(
+        self, get_job: Callable[[], Awaitable[ConversationJob | None]], emit: Emit
+    ):
+        # stalls of a worker loop only show up in its logs
+        watchdog_enabled = get_settings().LOOP_WATCHDOG_ENABLED
+        if watchdog_enabled:
+            get_loop_watchdog().start()
+        while True:
+            job = await get_job()
+            if job is None:
+                break
+            task = asyncio.create_task(self.handle(job, emit))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for starting in self._conversations.values():
+            with suppress(Exception):
+                (await starting).close()
+        self._conversations.clear()
+        if watchdog_enabled:
+            await get_loop_watchdog().stop()
+
+    async def handle(self, job: ConversationJob, emit: Emit):
+        if job.kind == ConversationJobKind.CLOSE:
+            starting = self._conversations.pop(job.conversation_id, None)
+            if starting is None:
+                return
+            try:
+                conversation = await starting
+            except Exception:
+                return
+            async with conversation.lock:
+                await conversation.service.close()
+                conversation.close()
+            return
+
+        if job.kind == ConversationJobKind.CANCEL_TURN:
+            task = self._running_turns.get(job.turn_id)
+            if task is not None:
+                task.cancel()
+            return
+
+        if job.kind == ConversationJobKind.WARM_UP:
+            await self._warm_up(job)
+            return
+
+        if job.kind == ConversationJobKind.SPECULATE_FEEDBACK:
+            await self._speculate_feedback(job)
+            return
+
+        if job.kind == ConversationJobKind.RUN_TURN:
+            await self._run_turn(job, emit)
+            return
+
+        logger.error("Unknown conversation job kind: %s", job.kind)
+
+    async def _get_conversation(self, conversation_id: str) -> _WorkerConversation:
+        starting = self._conversations.get(conversation_id)
+        if starting is None:
+            # the service builds its provider clients with blocking calls
+            starting = asyncio.ensure_future(asyncio.to_thread(_WorkerConversation))
+            self._conversations[conversation_id] = starting
+        try:
+            # shielded, a cancelled job must not cancel the setup other jobs wait for
+            return await asyncio.shield(starting)
+        except Exception:
+            if self._conversations.get(conversation_id) is starting:
+                del self._conversations[conversation_id]
+            raise
+
+    async def _speculate_feedback(self, job: ConversationJob):
+        # no lock, it only starts a task and may overlap the turn that is running
+        try:
+            conversation = await self._get_conversation(job.conversation_id)
+            await conversation.service.speculate_feedback(**job.payload)
+        except Exception as e:
+            logger.warning("Could not speculate feedback for %s: %s", job.conversation_id, e)
+
+    async def _warm_up(self, job: ConversationJob):
+        try:
+            conversation = await self._get_conversation(job.conversation_id)
+            # holding the lock makes an early first turn wait for the warm connections
+            async with conversation.lock:
+                await conversation.service.warm_up(**job.payload)
+        except Exception as e:
+            logger.warning("Could not warm up conversation %s: %s", job.conversation_id, e)
+
+    async def _run_turn(self, job: ConversationJob, emit: Emit):
+        try:
+            conversation = await self._get_conversation(job.conversation_id)
+        except Exception as e:
+            logger.error("Could not set up conversation %s: %s", job.conversation_id, e, exc_info=True)
+            emit(ConversationJobEvent(job.conversation_id, job.turn_id, None, error=str(e)))
+            return
+
+        self._running_turns[job.turn_id] = asyncio.current_task()
+        try:
+            with log_context(turn_id=job.turn_id):
+                async with conversation.lock, get_turn_profiler().turn(job.turn_id, selected=job.profile):
+                    try:
+                        stream = conversation.service.run_conversation_turn(**job.payload)
+                        async for event in stream:
+                            emit(ConversationJobEvent(job.conversation_id, job.turn_id, event))
+                        conversation.db.commit()
+                    except asyncio.CancelledError:
+                        # the gateway gave up on the turn, nobody reads its events
+                        logger.info("Turn %s cancelled by the gateway.", job.turn_id)
+                        conversation.db.rollback()
+                        return
+                    except Exception as e:
+                        logger.error("Turn %s failed: %s", job.turn_id, e, exc_info=True)
+                        conversation.db.rollback()
+                        emit(ConversationJobEvent(job.conversation_id, job.turn_id, None, error=str(e)))
+                        return
+        finally:
+            self._running_turns.pop(job.turn_id, None)
+        emit(ConversationJobEvent(job.conversation_id, job.turn_id, None))
+
+
+def run_worker_process(job_queue, event_queue):
+    """Entry point of a spawned worker process."""
+    setup_logging(fmt=f"%(processName)s - {LOG_FORMAT}")
+    worker = ConversationWorker()
+    asyncio.run(
+        worker.serve(lambda: asyncio.to_thread(job_queue.get), event_queue.put)
+    )
@@ -1,8 +1,10 @@
-import os
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import aclosing, suppress
 import uuid
-import tempfile
-import wave
 import logging
+from typing import AsyncGenerator, AsyncIterator, Callable
 
 from llama_index.core.llms import ChatMessage, DocumentBlock, MessageRole, TextBlock
 from llama_index.llms.google_genai import GoogleGenAI
@@ -10,11 +12,22 @@ from workflows import Workflow, Context, step
 from workflows.events import StartEvent, StopEvent
 
 from app.clients.elevenlabs.elevenlabs_tts import ElevenLabsTTS
-from app.core.config import settings
+from app.core.config import get_settings
+from app.core.hedging import get_hedge_policy, hedged_stream
+from app.core.log import set_step
+from app.core.metrics import metrics
+from app.core.model_routing import ModelStep, get_model_router
+from app.core.rate_limiting import Priority, estimate_tokens, get_provider_limiter
 from app.language_profiles.services import LanguageProfileService
 from app.personas.services import PersonaService
 from app.settings.services import SettingsService
 
+from app.conversation.audio_processing import PreprocessedAudio, preprocess_audio
+from app.conversation.bootstrap import ConversationBootstrapService
+from app.conversation.constants import turn_timeout
+from app.conversation.feedback_batching import FeedbackRequest, get_feedback_batcher
+from app.conversation.feedback_cache import FeedbackCache, feedback_cache_key
+from app.conversation.enums import AudioMode, TurnFallback, TurnStage
 from app.conversation.events import (
     AIAudioChunkGenerated,
     FeedbackGenerated,
@@ -25,11 +38,29 @@ from app.conversation.events import (
     UserMessageReady,
     AudioInputReceived,
     UserTranscriptionChunkGenerated,
+    VoiceTurnReceived,
+    TurnDegraded,
+    FeedbackCompleted,
+    AudioSaved,
 )
-from app.conversation.schemas import FeedbackResponse
+from app.conversation.parsing import FUSED_REPLY_SEPARATOR, FusedResponseSplitter, JSONArrayItemParser
+from app.conversation.schemas import ConversationContext, Feedback, FeedbackResponse
+from app.conversation.speech import defer_speech, write_wav
+from app.language_profiles.enums import FeedbackMode
+from app.language_profiles.schemas import LanguageProfileRead
+from app.personas.schemas import PersonaRead
+from app.settings.schemas import SettingsRead
 
 logger = logging.getLogger(__name__)
 
+# models seen failing to stream structured feedback, they go straight to the single call
+_models_without_feedback_streaming: set[str] = set()
+# how the LLM classes reject a generation_config they do not support
+_REJECTED_ARGUMENT_ERRORS = (TypeError, ValueError, NotImplementedError)
+
+# speculative results kept per conversation, the user only submits one of the drafts
+_MAX_SPECULATIONS_KEPT = 8
+
 
 class ConversationWorkflow(Workflow):
     def __init__(
@@ -39,28 +70,338 @@ class ConversationWorkflow(Workflow):
         language_profile_service: LanguageProfileService,
         llm: GoogleGenAI,
         elevenlabs_tts: ElevenLabsTTS,
+        feedback_cache: FeedbackCache | None = None,
+        llm_factory: Callable[[str], GoogleGenAI] | None = None,
+        bootstrap: ConversationBootstrapService | None = None,
     ):
-        super().__init__()
+        super().__init__(timeout=turn_timeout())
         self.settings_service = settings_service
         self.persona_service = persona_service
         self.language_profile_service = language_profile_service
         self.llm = llm
+        # builds clients for the other candidate models of the steps, on first use
+        self.llm_factory = llm_factory
+        self._llms: dict[str, GoogleGenAI] = {llm.model: llm} if llm is not None else {}
         self.elevenlabs_tts = elevenlabs_tts
+        self.feedback_cache = feedback_cache
+        self.bootstrap = bootstrap
+        # identifies this conversation for fair queueing in the provider limiters
+        self.conversation_id = str(uuid.uuid4())
         self.history: list[ChatMessage] = []
+        # set by warm_up, lets the first turn skip the lookups
+        self.warm_context: ConversationContext | None = None
+        # feedback computed on draft text before it is submitted, by feedback cache key
+        self._speculative_feedback: OrderedDict[str, list[Feedback]] = OrderedDict()
+        self._speculation: asyncio.Task | None = None
+        self._speculation_key: str | None = None
+        # charged per speculative call started, not per draft received
+        self._speculations_left = get_settings().FEEDBACK_SPECULATION_BUDGET
+
+    async def warm_up(self, *, persona_id: int, language_profile_id: int):
+        """
+        Resolves the conversation context and opens the TTS socket and the LLM HTTP
+        connection before the first turn, while the user is still typing or speaking.
+        """
+        if self.bootstrap is not None:
+            # usually cached already, the page was just rendered from it
+            context = self.bootstrap.get_context(language_profile_id, persona_id)
+        else:
+            context = self._lookup_context(persona_id, language_profile_id)
+        if context is None:
+            logger.warning("Nothing to warm up, persona or language profile not found.")
+            return
+        self.warm_context = context
+
+        # ElevenLabs caps the socket inactivity timeout at 180s
+        inactivity_timeout = min(get_settings().PREWARM_IDLE_SECONDS, 180)
+        results = await asyncio.gather(
+            self.elevenlabs_tts.prewarm(inactivity_timeout=inactivity_timeout),
+            self._warm_llm_connection(),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("Warming up a provider connection failed: %s", result)
+        logger.info("Conversation warmed up.")
+
+    def _lookup_context(self, persona_id: int, language_profile_id: int) -> ConversationContext | None:
+        persona = self.persona_service.get_persona(persona_id)
+        language_profile = self.language_profile_service.get_language_profile(language_profile_id)
+        if not persona or not language_profile:
+            return None
+        return ConversationContext(
+            persona=PersonaRead.model_validate(persona),
+            settings=SettingsRead.model_validate(self.settings_service.get_settings()),
+            language_profile=LanguageProfileRead.model_validate(language_profile),
+        )
+
+    async def release_warm_resources(self):
+        self.warm_context = None
+        await self.elevenlabs_tts.release()
+
+    async def speculate_feedback(self, *, text: str, persona_id: int, language_profile_id: int) -> bool:
+        """
+        Starts feedback for the draft the user is typing, replacing a speculation still
+        running for an older draft. A turn submitted with the same text picks it up.
+        Returns whether a call was started, only those are charged to the budget.
+        """
+        persona = self._get_persona(persona_id)
+        language_profile = self._get_language_profile(language_profile_id)
+        if not persona or not language_profile or language_profile.feedback_mode == FeedbackMode.BATCHED:
+            # batched profiles trade latency for cost, no extra calls for them
+            self.cancel_speculation()
+            return False
+        app_settings = self._get_app_settings()
+        key = self._feedback_key(persona, app_settings, language_profile.target_language, text)
+        if key in self._speculative_feedback or key == self._speculation_key:
+            # already there, or still running for the same text
+            return False
+        self.cancel_speculation()
+        if self._speculations_left <= 0:
+            metrics.increment("feedback_speculation_total", outcome="budget_exhausted")
+            return False
+        self._speculations_left -= 1
+        self._speculation_key = key
+        self._speculation = asyncio.create_task(self._speculate(key, persona, app_settings, text))
+        metrics.increment("feedback_speculation_total", outcome="started")
+        return True
+
+    def cancel_speculation(self):
+        if self._speculation and not self._speculation.done():
+            self._speculation.cancel()
+            metrics.increment("feedback_speculation_total", outcome="cancelled")
+        self._speculation = None
+        self._speculation_key = None
+
+    async def _speculate(self, key: str, persona, app_settings, text: str):
+        messages = self._feedback_messages(persona, app_settings, text)
+        try:
+            llm = await self._route_llm(ModelStep.FEEDBACK)
+            feedback = await self._structured_feedback(llm, messages)
+        except Exception as e:
+            logger.warning("Speculative feedback failed: %s", e)
+            return
+        self._speculative_feedback[key] = feedback
+        while len(self._speculative_feedback) > _MAX_SPECULATIONS_KEPT:
+            self._speculative_feedback.popitem(last=False)
+        metrics.increment("feedback_speculation_total", outcome="completed")
+
+    async def _take_speculation(self, key: str) -> list[Feedback] | None:
+        """The speculative feedback for `key`, waiting for it if it is still running."""
+        if self._speculation_key == key and self._speculation and not self._speculation.done():
+            with suppress(asyncio.CancelledError):
+                await asyncio.shield(self._speculation)
+        else:
+            self.cancel_speculation()
+        feedback = self._speculative_feedback.pop(key, None)
+        if feedback is not None:
+            metrics.increment("feedback_speculation_total", outcome="hit")
+        return feedback
+
+    async def _warm_llm_connection(self):
+        """
+        Any cheap authenticated call leaves an open connection in the client's pool. A
+        completion would cost tokens and a limiter slot, and llama-index has nothing
+        cheaper, so this goes to the google-genai client it wraps. That is a private
+        attribute, pyproject.toml pins the versions that have it.
+        """
+        client = getattr(self.llm, "_client", None)
+        models = getattr(getattr(client, "aio", None), "models", None)
+        if models is None:
+            logger.warning("No async google-genai client on %s, not warming its connection.", type(self.llm).__name__)
+            return
+        await models.get(model=self.llm.model)
+
+    def _get_persona(self, persona_id: int):
+        if self.warm_context and self.warm_context.persona.id == persona_id:
+            return self.warm_context.persona
+        return self.persona_service.get_persona(persona_id)
+
+    def _get_language_profile(self, language_profile_id: int):
+        if self.warm_context and self.warm_context.language_profile.id == language_profile_id:
+            return self.warm_context.language_profile
+        return self.language_profile_service.get_language_profile(language_profile_id)
+
+    def _get_app_settings(self):
+        if self.warm_context:
+            return self.warm_context.settings
+        return self.settings_service.get_settings()
+
+    async def _route_llm(self, step: ModelStep) -> GoogleGenAI:
+        """The client of the model the router picks for `step`."""
+        model = get_model_router(step).choose()
+        llm = self._llms.get(model)
+        if llm is None:
+            if self.llm_factory is None:
+                return self.llm
+            # the client constructor does blocking network I/O
+            llm = await asyncio.to_thread(self.llm_factory, model)
+            self._llms[model] = llm
+        return llm
+
+    def _llm_limit(self, priority: Priority, messages: list[ChatMessage], llm: GoogleGenAI):
+        """Every LLM call runs inside this, streams included."""
+        prompt = "".join(message.content or "" for message in messages)
+        return get_provider_limiter("gemini", llm.model).limit(
+            priority=priority, connection_id=self.conversation_id, tokens=estimate_tokens(prompt)
+        )
+
+    async def _stream_llm(
+        self, step: ModelStep, priority: Priority, messages: list[ChatMessage], policy: str
+    ) -> AsyncIterator:
+        """
+        Streaming chat on the routed model, through the provider limiter and hedged when
+        the first token is late. Time to first token, from the moment the request left
+        the limiter, feeds the router; a stream that fails before its first token counts
+        as an error. Cancellations are not the model's fault: stage deadlines, closed
+        connections and streams closed early are not recorded.
+        """
+        router = get_model_router(step)
+        llm = await self._route_llm(step)
+        started_at = time.monotonic()
+        first_token = False
+
+        def record_first_token(seconds: float):
+            nonlocal first_token
+            first_token = True
+            router.record(llm.model, seconds, ok=True)
+
+        stream = hedged_stream(
+            lambda: llm.astream_chat(messages),
+            get_hedge_policy(policy),
+            limit=lambda: self._llm_limit(priority, messages, llm),
+            on_first_item=record_first_token,
+        )
+        try:
+            async with aclosing(stream):
+                async for item in stream:
+                    yield item
+        except Exception:
+            if not first_token:
+                router.record(llm.model, time.monotonic() - started_at, ok=False)
+            raise
+
+    def _tts_limit(self):
+        return get_provider_limiter("elevenlabs", self.elevenlabs_tts.model_id).limit(
+            priority=Priority.INTERACTIVE, connection_id=self.conversation_id
+        )
+
+    @staticmethod
+    def _build_system_prompt(persona, app_settings) -> str:
+        system_prompt = f"""
+Persona: {persona.prompt}
+Global Feedback Rules: {app_settings.evaluation_prompt}
+---
+You are acting as the persona.
+"""
+        return system_prompt.strip()
+
+    async def _preprocess_audio(self, audio_bytes: bytes) -> PreprocessedAudio:
+        audio = await asyncio.to_thread(preprocess_audio, audio_bytes)
+        logger.info(
+            "Audio preprocessed: %d -> %d bytes (%d saved, %.2fs of silence trimmed).",
+            audio.original_size, len(audio.data), audio.bytes_saved, audio.trimmed_seconds,
+        )
+        metrics.increment("audio_preprocessing_bytes_saved_total", audio.bytes_saved)
+        metrics.observe("audio_preprocessing_bytes_saved", audio.bytes_saved)
+        return audio
+
+    async def _stage_deadline(self, ctx: Context, stage_seconds: float) -> float:
+        """The stage's own deadline, cut down to what is left of the turn budget."""
+        started_at = await ctx.store.get("turn_started_at", default=time.monotonic())
+        remaining = get_settings().TURN_BUDGET_SECONDS - (time.monotonic() - started_at)
+        return max(min(stage_seconds, remaining), 0.0)
+
+    @staticmethod
+    def _degrade(ctx: Context, stage: TurnStage, fallback: TurnFallback, reason: str):
+        logger.warning("Turn degraded at %s (%s): %s", stage, fallback, reason)
+        metrics.increment("turn_degraded_total", stage=stage, fallback=fallback)
+        ctx.write_event_to_stream(TurnDegraded(stage=stage, fallback=fallback, reason=reason))
+
+    async def _stream_speech(self, ctx: Context, text: AsyncGenerator[str, None]) -> bytes:
+        """
+        It is a bit weird, but the only way to handle audio from text chunks is passing
+        the generator to the audio generator. Returns all audio bytes once done.
+
+        The text is pumped by its own task through a queue, so when speech misses its
+        deadline or fails the TTS can be dropped without cutting the text stream. The
+        pump closes the text when it ends, which releases the LLM's limiter slot while
+        the TTS may still wait for its own.
+        Outside the stream audio mode the text is only drained and nothing is synthesized.
+        """
+        audio_mode = await ctx.store.get("audio_mode", default=AudioMode.STREAM)
+        if audio_mode != AudioMode.STREAM:
+            metrics.increment("tts_skipped_total", mode=audio_mode)
+            async for _ in text:
+                pass
+            return b""
+
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+        async def pump():
+            try:
+                async with aclosing(text):
+                    async for delta in text:
+                        queue.put_nowait(delta)
+            finally:
+                queue.put_nowait(None)
+
+        async def queued_text():
+            while (delta := await queue.get()) is not None:
+                yield delta
+
+        all_audio_bytes = b""
+        deadline = await self._stage_deadline(ctx, get_settings().SPEECH_DEADLINE_SECONDS)
+        pump_task = asyncio.create_task(pump())
+        logger.info("Consuming audio stream from TTS client...")
+        try:
+            try:
+                async with asyncio.timeout(deadline), self._tts_limit():
+                    audio_stream = self.elevenlabs_tts.stream(queued_text())
+                    async for chunk in audio_stream:
+                        all_audio_bytes += chunk
+                        ctx.write_event_to_stream(AIAudioChunkGenerated(chunk=chunk))
+            except TimeoutError:
+                all_audio_bytes = b""
+                self._degrade(ctx, TurnStage.SPEECH, TurnFallback.TEXT_ONLY, f"no speech within {deadline:.1f}s")
+            except Exception as e:
+                logger.error(
+                    "Error during ElevenLabs WebSocket streaming: %s", e, exc_info=True
+                )
+                all_audio_bytes = b""
+                self._degrade(ctx, TurnStage.SPEECH, TurnFallback.TEXT_ONLY, "speech synthesis failed")
+            # keep the text flowing to the UI even though speech may have stopped
+            await pump_task
+        finally:
+            if not pump_task.done():
+                pump_task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await pump_task
+
+        logger.info("Finished streaming audio from TTS client.")
+        return all_audio_bytes
 
     @step
     async def process_user_input(
             self, ctx: Context, ev: StartEvent
-    ) -> UserMessageReady | AudioInputReceived:
+    ) -> UserMessageReady | AudioInputReceived | VoiceTurnReceived:
         """
         Acts as a branching step.
         - For text input, it passes the message to the conversational workflow.
-        - For audio input, it passes the bytes to the direct transcription-to-speech workflow.
+        - For audio input, it passes the bytes to the direct transcription-to-speech workflow,
+          or to the fused transcribe-and-reply step when FUSED_VOICE_TURNS is on.
         """
+        set_step("process_user_input")
         logger.info("Step: process_user_input - Starting.")
         user_input: str | bytes = ev.input["user_message_data"]
         persona_id: int = ev.input["persona_id"]
         language_profile_id: int = ev.input["language_profile_id"]
+        # batched feedback routes results back by turn
+        await ctx.store.set("turn_id", ev.input.get("turn_id") or str(uuid.uuid4()))
+        await ctx.store.set("turn_started_at", time.monotonic())
+        await ctx.store.set(
+            "audio_mode", AudioMode(ev.input.get("audio_mode") or get_settings().DEFAULT_AUDIO_MODE)
+        )
 
         if isinstance(user_input, str):
             return UserMessageReady(
@@ -68,6 +409,13 @@ class ConversationWorkflow(Workflow):
                 persona_id=persona_id,
                 language_profile_id=language_profile_id,
             )
+        elif isinstance(user_input, bytes) and get_settings().FUSED_VOICE_TURNS:
+            logger.info("Input is audio. Emitting VoiceTurnReceived.")
+            return VoiceTurnReceived(
+                audio_bytes=user_input,
+                persona_id=persona_id,
+                language_profile_id=language_profile_id,
+            )
         elif isinstance(user_input, bytes):
             logger.info("Input is audio. Emitting AudioInputReceived.")
             return AudioInputReceived(
@@ -81,29 +429,37 @@ class ConversationWorkflow(Workflow):
             raise ValueError(err_msg)
 
     @step
-    async def transcribe_audio_input(self, ctx: Context, ev: AudioInputReceived) -> UserMessageReady:
+    async def transcribe_audio_input(self, ctx: Context, ev: AudioInputReceived) -> UserMessageReady | StopEvent:
         """Transcribes the user's audio and passes the text to the conversational workflow."""
+        set_step("transcribe_audio_input")
         logger.info("Step: transcribe_audio_input - Starting.")
-        with tempfile.NamedTemporaryFile(
-                delete=True, suffix=".wav"
-        ) as temp_audio_file:
-            temp_audio_file.write(ev.audio_bytes)
-            temp_audio_file.flush()
-
-            messages = [
-                ChatMessage(role=MessageRole.USER, blocks=[
-                    DocumentBlock(path=temp_audio_file.name, document_mimetype="audio/wav"),
-                    TextBlock(text="Transcribe this audio.")
-                ])
-            ]
-            response_stream = await self.llm.astream_chat(messages)
-
-            # first we get transcription and the chunks of transcription we send to user
-            full_transcription = ""
-            async for r in response_stream:
-                full_transcription += r.delta
-                ctx.write_event_to_stream(UserTranscriptionChunkGenerated(delta=r.delta))
-            logger.info("Finished transcription stream from LLM.")
+        audio = await self._preprocess_audio(ev.audio_bytes)
+
+        messages = [
+            ChatMessage(role=MessageRole.USER, blocks=[
+                DocumentBlock(data=audio.data, document_mimetype=audio.mimetype),
+                TextBlock(text="Transcribe this audio.")
+            ])
+        ]
+        # first we get transcription and the chunks of transcription we send to user
+        full_transcription = ""
+        deadline = await self._stage_deadline(ctx, get_settings().TRANSCRIPTION_DEADLINE_SECONDS)
+        try:
+            async with asyncio.timeout(deadline):
+                stream = self._stream_llm(
+                    ModelStep.TRANSCRIPTION, Priority.TRANSCRIPTION, messages, policy="transcription"
+                )
+                async with aclosing(stream) as response_stream:
+                    async for r in response_stream:
+                        full_transcription += r.delta
+                        ctx.write_event_to_stream(UserTranscriptionChunkGenerated(delta=r.delta))
+        except TimeoutError:
+            reason = f"transcription not finished within {deadline:.1f}s"
+            if not full_transcription.strip():
+                self._degrade(ctx, TurnStage.TRANSCRIPTION, TurnFallback.NO_TRANSCRIPTION, reason)
+                return StopEvent()
+            self._degrade(ctx, TurnStage.TRANSCRIPTION, TurnFallback.PARTIAL_TRANSCRIPTION, reason)
+        logger.info("Finished transcription stream from LLM.")
 
         # the full transcription follows in the workflow to be sent to llm
         return UserMessageReady(
@@ -112,26 +468,107 @@ class ConversationWorkflow(Workflow):
             language_profile_id=ev.language_profile_id,
         )
 
+    @step
+    async def transcribe_and_respond(
+            self, ctx: Context, ev: VoiceTurnReceived
+    ) -> FullResponseGenerated | UserMessageReady | StopEvent:
+        """
+        Fused voice turn: one multimodal call gets the audio plus the history and returns
+        the transcription followed by the persona's reply. Transcription tokens are
+        streamed first, then the reply is streamed to the UI and to ElevenLabs.
+        """
+        set_step("transcribe_and_respond")
+        logger.info("Step: transcribe_and_respond - Starting.")
+        audio = await self._preprocess_audio(ev.audio_bytes)
+
+        persona = self._get_persona(ev.persona_id)
+        app_settings = self._get_app_settings()
+
+        instruction = f"""
+The user answered with the attached audio.
+First write an exact transcription of what the user said, in the language it was spoken.
+Then write {FUSED_REPLY_SEPARATOR} on its own line.
+Then reply to the user as the persona.
+"""
+        messages = [
+            ChatMessage(role=MessageRole.SYSTEM, content=self._build_system_prompt(persona, app_settings)),
+            *self.history,
+            ChatMessage(role=MessageRole.USER, blocks=[
+                DocumentBlock(data=audio.data, document_mimetype=audio.mimetype),
+                TextBlock(text=instruction.strip()),
+            ]),
+        ]
+        splitter = FusedResponseSplitter()
+        transcription = ""
+        full_response_text = ""
+
+        async def reply_generator():
+            nonlocal transcription, full_response_text
+            async with aclosing(response_stream):
+                async for r in response_stream:
+                    transcription_delta, reply_delta = splitter.feed(r.delta or "")
+                    if transcription_delta:
+                        transcription += transcription_delta
+                        ctx.write_event_to_stream(UserTranscriptionChunkGenerated(delta=transcription_delta))
+                    if reply_delta:
+                        full_response_text += reply_delta
+                        ctx.write_event_to_stream(AITextChunkGenerated(delta=reply_delta))
+                        yield reply_delta
+            if remaining := splitter.flush():
+                transcription += remaining
+                ctx.write_event_to_stream(UserTranscriptionChunkGenerated(delta=remaining))
+
+        deadline = await self._stage_deadline(ctx, get_settings().REPLY_DEADLINE_SECONDS)
+        try:
+            async with asyncio.timeout(deadline):
+                stream = self._stream_llm(ModelStep.REPLY, Priority.INTERACTIVE, messages, policy="voice_reply")
+                async with aclosing(stream) as response_stream:
+                    all_audio_bytes = await self._stream_speech(ctx, reply_generator())
+        except TimeoutError:
+            all_audio_bytes = b""
+            reason = f"voice reply not finished within {deadline:.1f}s"
+            if not splitter.in_reply:
+                fallback = TurnFallback.PARTIAL_TRANSCRIPTION if transcription.strip() else TurnFallback.NO_TRANSCRIPTION
+                self._degrade(ctx, TurnStage.TRANSCRIPTION, fallback, reason)
+                return StopEvent()
+            self._degrade(ctx, TurnStage.REPLY, TurnFallback.PARTIAL_REPLY, reason)
+        transcription = transcription.strip()
+
+        if not splitter.in_reply:
+            # the model never got to the reply, answer the transcription the regular way
+            logger.warning("Fused response had no reply part, falling back to a separate reply call.")
+            return UserMessageReady(
+                text=transcription,
+                persona_id=ev.persona_id,
+                language_profile_id=ev.language_profile_id,
+            )
+
+        self.history.append(ChatMessage(role=MessageRole.USER, content=transcription))
+        self.history.append(ChatMessage(role=MessageRole.ASSISTANT, content=full_response_text))
+        logger.info("History updated with: '%.50s...'", full_response_text)
+
+        return FullResponseGenerated(
+            ai_response_text=full_response_text,
+            user_message_text=transcription,
+            audio_bytes=all_audio_bytes,
+            persona_id=ev.persona_id,
+            language_profile_id=ev.language_profile_id,
+        )
+
     @step
     async def construct_prompt(self, ctx: Context, ev: UserMessageReady) -> PromptReady:
         """
         Gathers all data and builds the final prompt for the LLM based on the processed user text.
         """
-        logger.info(f"Step: construct_prompt - Starting for user message: '{ev.text[:50]}...'")
+        set_step("construct_prompt")
+        logger.info("Step: construct_prompt - Starting for user message: '%.50s...'", ev.text)
         self.history.append(ChatMessage(role=MessageRole.USER, content=ev.text))
 
-        persona = self.persona_service.get_persona(ev.persona_id)
-        app_settings = self.settings_service.get_settings()
-
-        system_prompt = f"""
-Persona: {persona.prompt}
-Global Feedback Rules: {app_settings.evaluation_prompt}
----
-You are acting as the persona.
-"""
+        persona = self._get_persona(ev.persona_id)
+        app_settings = self._get_app_settings()
 
         messages = [
-            ChatMessage(role=MessageRole.SYSTEM, content=system_prompt.strip())
+            ChatMessage(role=MessageRole.SYSTEM, content=self._build_system_prompt(persona, app_settings))
         ] + self.history
 
         logger.info("Prompt constructed. Emitting PromptReady.")
@@ -150,42 +587,36 @@ You are acting as the persona.
         to ElevenLabs to generate audio in real-time. Also emits the full audio bytes
         when done, and returns the full response text for feedback generation.
         """
+        set_step("stream_ai_response")
         logger.info("Step: stream_ai_response - Starting.")
 
-        response_stream = await self.llm.astream_chat(ev.messages)
-
         full_response_text = ""
 
-        # it is a bit weird, but the only way to handle audio from text
-        # chunks is passing the generator to the audio generator
         async def text_generator():
             nonlocal full_response_text
-            async for r in response_stream:
-                delta = r.delta or ""
-                full_response_text += delta
-                if delta:
-                    ctx.write_event_to_stream(AITextChunkGenerated(delta=delta))
-                    yield delta
-
-        all_audio_bytes = b""
-        logger.info("Consuming audio stream from TTS client...")
+            async with aclosing(response_stream):
+                async for r in response_stream:
+                    delta = r.delta or ""
+                    full_response_text += delta
+                    if delta:
+                        ctx.write_event_to_stream(AITextChunkGenerated(delta=delta))
+                        yield delta
+
+        deadline = await self._stage_deadline(ctx, get_settings().REPLY_DEADLINE_SECONDS)
         try:
-            audio_stream = self.elevenlabs_tts.stream(text_generator())
-            async for chunk in audio_stream:
-                all_audio_bytes += chunk
-                ctx.write_event_to_stream(AIAudioChunkGenerated(chunk=chunk))
-        except Exception as e:
-            logger.error(
-                f"Error during ElevenLabs WebSocket streaming: {e}", exc_info=True
-            )
+            async with asyncio.timeout(deadline):
+                stream = self._stream_llm(ModelStep.REPLY, Priority.INTERACTIVE, ev.messages, policy="reply")
+                async with aclosing(stream) as response_stream:
+                    all_audio_bytes = await self._stream_speech(ctx, text_generator())
+        except TimeoutError:
+            # whatever was streamed so far stays, the user has already seen it
             all_audio_bytes = b""
-
-        logger.info("Finished streaming audio from TTS client.")
+            self._degrade(ctx, TurnStage.REPLY, TurnFallback.PARTIAL_REPLY, f"reply not finished within {deadline:.1f}s")
 
         self.history.append(
             ChatMessage(role=MessageRole.ASSISTANT, content=full_response_text)
         )
-        logger.info(f"History updated with: '{full_response_text[:50]}...'")
+        logger.info("History updated with: '%.50s...'", full_response_text)
 
         return FullResponseGenerated(
             ai_response_text=full_response_text,
@@ -196,68 +627,230 @@ You are acting as the persona.
         )
 
     @step
-    async def generate_feedback(self, ctx: Context, ev: FullResponseGenerated) -> StopEvent:
+    async def generate_feedback(self, ctx: Context, ev: FullResponseGenerated) -> FeedbackCompleted:
         """Generates feedback for the user's message."""
+        set_step("generate_feedback")
         logger.info("Step: generate_feedback - Starting.")
 
-        persona = self.persona_service.get_persona(ev.persona_id)
-        app_settings = self.settings_service.get_settings()
+        deadline = await self._stage_deadline(ctx, get_settings().FEEDBACK_DEADLINE_SECONDS)
+        if deadline <= 0:
+            self._degrade(ctx, TurnStage.FEEDBACK, TurnFallback.SKIP_FEEDBACK, "turn budget spent")
+            return FeedbackCompleted()
+        try:
+            async with asyncio.timeout(deadline):
+                await self._generate_feedback(ctx, ev)
+        except TimeoutError:
+            self._degrade(ctx, TurnStage.FEEDBACK, TurnFallback.SKIP_FEEDBACK, f"no feedback within {deadline:.1f}s")
+
+        logger.info("Step: generate_feedback - Finished.")
+        return FeedbackCompleted()
+
+    async def _generate_feedback(self, ctx: Context, ev: FullResponseGenerated):
+        persona = self._get_persona(ev.persona_id)
+        app_settings = self._get_app_settings()
+        language_profile = self._get_language_profile(ev.language_profile_id)
+        target_language = language_profile.target_language if language_profile else ""
+
+        key = self._feedback_key(persona, app_settings, target_language, ev.user_message_text)
+        cache_key = key if self.feedback_cache is not None else None
+
+        speculative_feedback = await self._take_speculation(key)
+        if speculative_feedback is not None:
+            logger.info("Feedback served from the speculation on the draft.")
+            self._emit_feedback(ctx, speculative_feedback, cache_key)
+            return
+
+        if self.feedback_cache is not None:
+            cached_feedback = self.feedback_cache.get(cache_key)
+            if cached_feedback is not None:
+                logger.info("Feedback served from cache.")
+                for item in cached_feedback:
+                    ctx.write_event_to_stream(FeedbackGenerated(feedback=item))
+                return
+
+        if language_profile and language_profile.feedback_mode == FeedbackMode.BATCHED:
+            request = FeedbackRequest(
+                turn_id=await ctx.store.get("turn_id"),
+                user_message=ev.user_message_text,
+                ai_response=ev.ai_response_text,
+                persona_prompt=persona.prompt,
+                evaluation_prompt=app_settings.evaluation_prompt,
+                target_language=target_language,
+            )
+            try:
+                llm = await self._route_llm(ModelStep.FEEDBACK)
+                feedback = await get_feedback_batcher().evaluate(request, llm)
+            except Exception as e:
+                logger.error("Failed to generate batched feedback: %s", e, exc_info=True)
+                self._degrade(ctx, TurnStage.FEEDBACK, TurnFallback.SKIP_FEEDBACK, "feedback failed")
+                return
+            if feedback is not None:
+                self._emit_feedback(ctx, feedback, cache_key)
+                return
+            # the batch result did not match its turns, this turn gets a call of its own
+
+        messages = self._feedback_messages(
+            persona, app_settings, ev.user_message_text, ai_response=ev.ai_response_text
+        )
+
+        try:
+            llm = await self._route_llm(ModelStep.FEEDBACK)
+            if get_settings().FEEDBACK_STREAMING and llm.model not in _models_without_feedback_streaming:
+                if await self._stream_feedback(ctx, llm, messages, cache_key):
+                    return
 
+            self._emit_feedback(ctx, await self._structured_feedback(llm, messages), cache_key)
+        except Exception as e:
+            logger.error("Failed to generate feedback: %s", e, exc_info=True)
+            self._degrade(ctx, TurnStage.FEEDBACK, TurnFallback.SKIP_FEEDBACK, "feedback failed")
+
+    @staticmethod
+    def _feedback_key(persona, app_settings, target_language: str, user_message: str) -> str:
+        return feedback_cache_key(
+            user_message=user_message,
+            target_language=target_language,
+            persona_prompt=persona.prompt,
+            evaluation_prompt=app_settings.evaluation_prompt,
+        )
+
+    @staticmethod
+    def _feedback_messages(
+        persona, app_settings, user_message: str, ai_response: str | None = None
+    ) -> list[ChatMessage]:
+        """Drafts are judged before there is a response to them, `ai_response` is then None."""
+        provided = "the user's message"
+        response_line = ""
+        if ai_response is not None:
+            provided += " and the conversational response that was given"
+            response_line = f'Conversational response given: "{ai_response}"\n'
         feedback_system_prompt = f"""
 You are an AI language coach. Your task is to provide feedback on a user's message.
 The user is practicing a language.
-You have been provided with the user's message and the conversational response that was given.
+You have been provided with {provided}.
 Analyze the user's message and provide feedback based on the global feedback rules.
 Do not generate a conversational response. Only generate feedback.
 
 Persona of conversational partner: {persona.prompt}
 Global Feedback Rules: {app_settings.evaluation_prompt}
 ---
-User's message: "{ev.user_message_text}"
-Conversational response given: "{ev.ai_response_text}"
----
+User's message: "{user_message}"
+{response_line}---
 Now, provide feedback on the user's message.
 """
-        messages = [
+        return [
             ChatMessage(role=MessageRole.SYSTEM, content=feedback_system_prompt.strip()),
             ChatMessage(role=MessageRole.USER, content="Provide feedback now."),
         ]
 
+    async def _structured_feedback(self, llm: GoogleGenAI, messages: list[ChatMessage]) -> list[Feedback]:
+        structured_llm = llm.as_structured_llm(FeedbackResponse)
+        async with self._llm_limit(Priority.FEEDBACK, messages, llm):
+            async with get_model_router(ModelStep.FEEDBACK).observe(llm.model):
+                chat_response = await structured_llm.achat(messages)
+        # the structured llm returns a ChatResponse, the parsed model is in `raw`
+        feedback_response: FeedbackResponse | None = chat_response.raw
+        if feedback_response is None:
+            # unlike an empty list, this is not an answer and must not be cached
+            raise ValueError(f"Model {llm.model} returned no structured feedback.")
+        return feedback_response.feedback
+
+    async def _stream_feedback(
+        self, ctx: Context, llm: GoogleGenAI, messages: list[ChatMessage], cache_key: str | None
+    ) -> bool:
+        """
+        Streams the feedback as JSON constrained to FeedbackResponse and emits every item
+        as soon as its object is closed. Returns False, with nothing emitted, when the
+        caller should fall back to the single structured call.
+        """
+        parser = JSONArrayItemParser()
+        feedback: list[Feedback] = []
+        text = ""
+        json_output = {"response_mime_type": "application/json", "response_schema": FeedbackResponse}
         try:
-            structured_llm = self.llm.as_structured_llm(FeedbackResponse)
-            feedback_response = await structured_llm.achat(messages)
-
-            if feedback_response and feedback_response.feedback:
-                logger.info(f"Generated feedback: {feedback_response.feedback}")
-                for item in feedback_response.feedback:
-                    ctx.write_event_to_stream(FeedbackGenerated(feedback=item))
+            async with self._llm_limit(Priority.FEEDBACK, messages, llm):
+                # a model rejecting the arguments is not failing, the fallback call is what
+                # gets recorded for it
+                router = get_model_router(ModelStep.FEEDBACK)
+                async with router.observe(llm.model, ignore=_REJECTED_ARGUMENT_ERRORS):
+                    stream = await llm.astream_chat(messages, generation_config=json_output)
+                    async with aclosing(stream):
+                        async for r in stream:
+                            text += r.delta or ""
+                            for raw_item in parser.feed(r.delta or ""):
+                                try:
+                                    item = Feedback.model_validate_json(raw_item)
+                                except ValueError as e:
+                                    logger.warning("Dropping invalid streamed feedback item: %s", e)
+                                    continue
+                                feedback.append(item)
+                                ctx.write_event_to_stream(FeedbackGenerated(feedback=item))
         except Exception as e:
-            logger.error(f"Failed to generate feedback: {e}", exc_info=True)
-
-        logger.info("Step: generate_feedback - Finished.")
-        return StopEvent()
+            if feedback:
+                # the user already has part of it, a second call would repeat it
+                logger.error("Feedback stream failed midway: %s", e, exc_info=True)
+                return True
+            if isinstance(e, _REJECTED_ARGUMENT_ERRORS):
+                _models_without_feedback_streaming.add(llm.model)
+            logger.warning("Streaming feedback failed, falling back to a single call: %s", e)
+            return False
+
+        if not feedback:
+            try:
+                # an empty list is a valid answer, anything else means no JSON came back
+                FeedbackResponse.model_validate_json(text)
+            except ValueError:
+                logger.warning("Model %s did not stream structured feedback, falling back.", llm.model)
+                _models_without_feedback_streaming.add(llm.model)
+                return False
+            if cache_key is not None:
+                self.feedback_cache.set(cache_key, [])
+            return True
+
+        logger.info("Generated feedback: %s", feedback)
+        metrics.increment("feedback_streamed_total")
+        if cache_key is not None:
+            self.feedback_cache.set(cache_key, feedback)
+        return True
+
+    def _emit_feedback(self, ctx: Context, feedback: list[Feedback], cache_key: str | None):
+        """Nothing to correct is an answer too, an empty list is cached like any other."""
+        logger.info("Generated feedback: %s", feedback)
+        for item in feedback:
+            ctx.write_event_to_stream(FeedbackGenerated(feedback=item))
+        if cache_key is not None:
+            self.feedback_cache.set(cache_key, feedback)
 
     @step
-    async def save_audio(self, ctx: Context, ev: FullResponseGenerated) -> StopEvent:
-        """Saves the complete audio bytes to a file and dispatches the URL."""
+    async def save_audio(self, ctx: Context, ev: FullResponseGenerated) -> AudioSaved:
+        """
+        Saves the complete audio bytes to a file and dispatches the URL. In on-demand
+        audio mode the reply text is stored instead and the URL synthesizes it when played.
+        """
+        set_step("save_audio")
         logger.info("Step: save_audio - Starting.")
+        audio_mode = await ctx.store.get("audio_mode", default=AudioMode.STREAM)
+        if audio_mode == AudioMode.ON_DEMAND and ev.ai_response_text.strip():
+            audio_url = defer_speech(ev.ai_response_text)
+            logger.info("Speech deferred until played. URL: %s", audio_url)
+            ctx.write_event_to_stream(AIAudioReady(audio_url=audio_url, on_demand=True))
+            return AudioSaved(audio_url=audio_url)
         if not ev.audio_bytes:
-            logger.info("No audio bytes to save. Stopping workflow.")
-            return StopEvent()
-
-        output_dir = settings.AUDIO_OUTPUT_DIR
-        os.makedirs(output_dir, exist_ok=True)
-        file_name = f"{uuid.uuid4()}.wav"
-        file_path = os.path.join(output_dir, file_name)
-
-        with wave.open(file_path, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 16-bit PCM
-            wf.setframerate(24000)
-            wf.writeframes(ev.audio_bytes)
-        audio_url = f"/static/audio/{file_name}"
-        logger.info(f"Audio saved to {file_path}. URL: {audio_url}")
+            logger.info("No audio bytes to save.")
+            return AudioSaved()
+
+        audio_url = write_wav(ev.audio_bytes)
+        logger.info("Audio URL: %s", audio_url)
 
         ctx.write_event_to_stream(AIAudioReady(audio_url=audio_url))
-        logger.info("Audio saved. Stopping workflow for this turn.")
+        return AudioSaved(audio_url=audio_url)
+
+    @step
+    async def finish_turn(self, ctx: Context, ev: FeedbackCompleted | AudioSaved) -> StopEvent | None:
+        """
+        Joins the two tails of the turn. Returning StopEvent from either of them would
+        end the run and cancel the other one, usually the slower feedback call.
+        """
+        if ctx.collect_events(ev, [FeedbackCompleted, AudioSaved]) is None:
+            return None
+        logger.info("Turn finished. Stopping workflow for this turn.")
         return StopEvent()
\ No newline at end of file
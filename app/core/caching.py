@@ -0,0 +1,190 @@
+"""
+Conditional GET and fragment caching for the HTMX pages.
+
+Every table has a data version, bumped when a commit that wrote to it lands. Pages and
+partials declare the tables they read and get an ETag from their versions, so a
+browser revalidating an unchanged page gets a 304 before any query runs or any
+template renders. List items are rendered through a bounded LRU keyed by the same
+versions, so a list whose table did not change renders none of its items again. The
+conversation bootstrap cache checks its entries against the same versions.
+
+Versions live in the process that commits, so this assumes a single web process that
+both serves these pages and commits their writes. Workers and other web processes
+are not seen: to bound how stale that makes a page, ETags and cached fragments also
+change every CONDITIONAL_MAX_AGE_SECONDS. Versions start over with the process; ETags
+carry a per-process token so tags handed out before a restart never match.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import lru_cache, wraps
+from typing import Hashable
+
+from fastapi import Request, Response
+from jinja2 import pass_context
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+_PROCESS_TOKEN = secrets.token_hex(4)
+
+
+class DataVersions:
+    def __init__(self):
+        self._versions: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def bump(self, *tables: str):
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+
+    def snapshot(self, *tables: str) -> dict[str, int]:
+        with self._lock:
+            return {table: self._versions[table] for table in tables}
+
+
+@lru_cache
+def get_data_versions() -> DataVersions:
+    return DataVersions()
+
+
+@event.listens_for(Session, "after_flush")
+def _note_changed_tables(session: Session, flush_context):
+    changed = (*session.new, *session.dirty, *session.deleted)
+    session.info.setdefault("changed_tables", set()).update(obj.__tablename__ for obj in changed)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_bulk_changes(orm_execute_state):
+    # INSERT, UPDATE and DELETE statements run by hand do not go through the flush
+    state = orm_execute_state
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        state.session.info.setdefault("changed_tables", set()).add(state.bind_mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_changed_tables(session: Session):
+    # bumped on commit, not on flush, so no page is tagged with data that is not there yet
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        get_data_versions().bump(*changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_tables(session: Session):
+    session.info.pop("changed_tables", None)
+
+
+class FragmentCache:
+    """Rendered HTML, least recently used entries evicted past max_entries."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, Markup] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Markup | None:
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+            return html
+
+    def set(self, key: Hashable, html: Markup):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+@lru_cache
+def get_fragment_cache() -> FragmentCache:
+    return FragmentCache(max_entries=get_settings().FRAGMENT_CACHE_MAX_ENTRIES)
+
+
+@pass_context
+def cached_fragment(context, template_name: str, table: str, key: Hashable, **variables) -> Markup:
+    """
+    Template global rendering `template_name` with `variables`, cached under the
+    version of `table` the response was tagged with. Responses that are not
+    conditional render it every time.
+    """
+    request = context["request"]
+    versions = getattr(request.state, "data_versions", {})
+    template = context.environment.get_template(template_name)
+    if table not in versions:
+        return Markup(template.render(request=request, **variables))
+
+    # rendered urls are absolute, fragments of one host are no good for another
+    cache_key = (template_name, request.state.data_epoch, versions[table], key, str(request.base_url))
+    cache = get_fragment_cache()
+    html = cache.get(cache_key)
+    if html is not None:
+        metrics.increment("fragment_cache_total", result="hit")
+        return html
+    metrics.increment("fragment_cache_total", result="miss")
+    html = Markup(template.render(request=request, **variables))
+    cache.set(cache_key, html)
+    return html
+
+
+def _data_epoch() -> int:
+    """Changes every CONDITIONAL_MAX_AGE_SECONDS, for the commits other processes make."""
+    return int(time.time() // get_settings().CONDITIONAL_MAX_AGE_SECONDS)
+
+
+def _etag(request: Request, versions: dict[str, int], epoch: int) -> str:
+    # the url and the HX-Request header pick the template and its variables
+    variant = f"{request.url}|{request.headers.get('HX-Request', '')}|{sorted(versions.items())}|{epoch}"
+    return f'W/"{_PROCESS_TOKEN}-{hashlib.blake2b(variant.encode(), digest_size=8).hexdigest()}"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+
+def conditional(*tables: str):
+    """
+    Tags the responses of a GET route with an ETag from the versions of the tables it
+    reads, and answers 304 without calling the route when the client's tag still
+    matches. Goes above @htmx, the route must take `request`.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, request: Request, **kwargs):
+            versions = get_data_versions().snapshot(*tables)
+            # taken before the route reads anything, a commit in between leaves the response
+            # newer than its tag, never older
+            request.state.data_versions = versions
+            request.state.data_epoch = _data_epoch()
+            headers = {
+                "ETag": _etag(request, versions, request.state.data_epoch),
+                "Cache-Control": "no-cache",
+                "Vary": "HX-Request",
+            }
+            if _matches(request.headers.get("If-None-Match"), headers["ETag"]):
+                metrics.increment("conditional_get_total", result="not_modified")
+                return Response(status_code=304, headers=headers)
+
+            metrics.increment("conditional_get_total", result="modified")
+            response = await func(*args, request=request, **kwargs)
+            response.headers.update(headers)
+            return response
+
+        return wrapper
+
+    return decorator
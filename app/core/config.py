@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Any, Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,6 +14,157 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str
     ELEVENLABS_API_KEY: str
     AUDIO_OUTPUT_DIR: str = "static/audio"
+    # Decode, downmix, resample and silence-trim recordings before transcription.
+    AUDIO_PREPROCESSING_ENABLED: bool = True
+    FFMPEG_BINARY: str = "ffmpeg"
+    # Transcribe and answer a voice turn with a single multimodal LLM call.
+    FUSED_VOICE_TURNS: bool = False
+
+    # Candidate models per step, in order of preference. Each call goes to the first one
+    # that is healthy and not much slower than the fastest, judged on recent calls.
+    TRANSCRIPTION_MODELS: list[str] = ["gemini-2.5-flash"]
+    REPLY_MODELS: list[str] = ["gemini-2.5-flash"]
+    FEEDBACK_MODELS: list[str] = ["gemini-2.5-flash"]
+    MODEL_ROUTING_WINDOW_SECONDS: int = 300
+    MODEL_ROUTING_MAX_ERROR_RATE: float = 0.25
+    MODEL_ROUTING_LATENCY_SLACK: float = 2.0
+
+    # Audio for replies: "stream" synthesizes while the reply streams, "on_demand" only
+    # when the user presses play, "off" never. Clients can override it per connection or turn.
+    DEFAULT_AUDIO_MODE: Literal["stream", "on_demand", "off"] = "stream"
+    # The text of on-demand replies not played within the TTL is deleted, checked this often.
+    ON_DEMAND_SPEECH_TTL_SECONDS: float = 24 * 3600
+    ON_DEMAND_SPEECH_SWEEP_SECONDS: float = 3600
+
+    # "workflow" runs turns through the llama-index Workflow runtime, "direct" calls the
+    # same steps as plain coroutines (see app/conversation/pipeline.py).
+    CONVERSATION_ENGINE: Literal["workflow", "direct"] = "workflow"
+
+    # "inline" runs the conversation workflow inside the web process.
+    # "queue" only terminates websockets here and forwards turns to workflow workers.
+    CONVERSATION_EXECUTION_MODE: Literal["inline", "queue"] = "inline"
+    # "process" spawns worker processes, "local" is an in-process stand-in for dev.
+    CONVERSATION_BROKER: Literal["process", "local"] = "process"
+    CONVERSATION_WORKERS: int = 2
+    # A queued turn fails when its worker process dies, checked this often, and when the
+    # worker sends no end within the turn's hard timeout plus this margin.
+    CONVERSATION_WORKER_CHECK_SECONDS: float = 1.0
+    CONVERSATION_TURN_MARGIN_SECONDS: float = 10.0
+
+    # Resolve the conversation context and open the TTS/LLM connections as soon as the
+    # websocket connects. Warm resources are dropped after this many idle seconds.
+    PREWARM_ENABLED: bool = True
+    PREWARM_IDLE_SECONDS: int = 60
+
+    # Rows per page of the persona and language profile lists, more load on scroll.
+    LIST_PAGE_SIZE: int = 30
+
+    # Profile, topics, persona and settings of a conversation, cached per profile for the
+    # page and its websocket. Commits in this process clear it right away.
+    BOOTSTRAP_CACHE_TTL_SECONDS: int = 60
+
+    # Rendered list items of the persona and language profile pages, kept until the
+    # table they show changes or they are the least recently used past this many.
+    FRAGMENT_CACHE_MAX_ENTRIES: int = 2048
+    # Data versions only see commits of this process. With more than one web process,
+    # ETags and cached fragments still change this often, so a commit elsewhere shows up
+    # at most this late.
+    CONDITIONAL_MAX_AGE_SECONDS: int = 60
+
+    # JSONL import and export of personas, profiles and topics: rows per INSERT and per
+    # export read, the longest line accepted and how many rejected lines are listed.
+    BULK_BATCH_SIZE: int = 500
+    BULK_MAX_LINE_BYTES: int = 1024 * 1024
+    BULK_MAX_REPORTED_ERRORS: int = 1000
+
+    # Feedback for repeated learner messages is served from a cache instead of the LLM.
+    # The persistent tier keeps entries in the database across restarts and workers.
+    FEEDBACK_CACHE_ENABLED: bool = True
+    FEEDBACK_CACHE_MAX_ENTRIES: int = 2048
+    FEEDBACK_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    FEEDBACK_CACHE_PERSISTENT: bool = False
+    # Stream feedback as JSON and show each item as soon as it is complete, models that
+    # cannot stream structured output fall back to a single structured call.
+    FEEDBACK_STREAMING: bool = True
+    # Feedback is run ahead on the debounced draft the user is typing, at most this many
+    # calls per conversation, for drafts of at least FEEDBACK_SPECULATION_MIN_CHARS.
+    FEEDBACK_SPECULATION_ENABLED: bool = True
+    FEEDBACK_SPECULATION_BUDGET: int = 20
+    FEEDBACK_SPECULATION_MIN_CHARS: int = 6
+
+    # Profiles in batched feedback mode are evaluated together, per model, persona and
+    # evaluation rules, once this many turns are waiting or the window has passed,
+    # whichever comes first.
+    FEEDBACK_BATCH_MAX_TURNS: int = 8
+    FEEDBACK_BATCH_WINDOW_SECONDS: float = 2.0
+
+    # Process-wide provider limits. A per-minute limit of 0 disables that bucket.
+    GEMINI_MAX_CONCURRENCY: int = 16
+    GEMINI_REQUESTS_PER_MINUTE: int = 1000
+    GEMINI_TOKENS_PER_MINUTE: int = 1_000_000
+    ELEVENLABS_MAX_CONCURRENCY: int = 5
+    ELEVENLABS_REQUESTS_PER_MINUTE: int = 0
+
+    # Opt-in hedging of streaming LLM calls: when the first token is later than this
+    # percentile of recent TTFTs (clamped to min/max), a second identical request is
+    # raced against the first. At most HEDGE_BUDGET_RATIO of requests get a hedge.
+    HEDGING_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_MIN_DELAY_SECONDS: float = 0.5
+    HEDGE_MAX_DELAY_SECONDS: float = 4.0
+    HEDGE_BUDGET_RATIO: float = 0.1
+
+    # Latency budget of a whole turn and deadlines of its stages, in seconds. A stage
+    # gets whatever is smaller: its own deadline or what is left of the turn budget.
+    TURN_BUDGET_SECONDS: float = 40.0
+    TRANSCRIPTION_DEADLINE_SECONDS: float = 15.0
+    REPLY_DEADLINE_SECONDS: float = 25.0
+    SPEECH_DEADLINE_SECONDS: float = 25.0
+    FEEDBACK_DEADLINE_SECONDS: float = 10.0
+
+    # Admission control per process: turns beyond MAX_ACTIVE_TURNS wait in a queue of
+    # MAX_QUEUED_TURNS; once that is full, new turns and new connections are refused.
+    MAX_ACTIVE_TURNS: int = 32
+    MAX_QUEUED_TURNS: int = 64
+
+    # A dropped websocket can resume its conversation within this many seconds. The
+    # latest outbound frames, up to SESSION_REPLAY_BUFFER_BYTES in total, are kept to
+    # replay on resume.
+    SESSION_RESUME_GRACE_SECONDS: int = 60
+    SESSION_REPLAY_BUFFER_BYTES: int = 4 * 1024 * 1024
+
+    # A turn resubmitted with the same client turn key within this window attaches to
+    # the original turn instead of running the pipeline again.
+    TURN_DEDUP_WINDOW_SECONDS: int = 300
+
+    # The /debug routes (loop stalls, turn profiling) change and expose process internals
+    # and are not authenticated, they answer 404 unless this is on.
+    DEBUG_ROUTES_ENABLED: bool = False
+
+    # Watch the event loop for calls that block it longer than the threshold and record
+    # where they come from, see /debug/loop-stalls.
+    LOOP_WATCHDOG_ENABLED: bool = True
+    LOOP_WATCHDOG_INTERVAL_SECONDS: float = 0.1
+    LOOP_WATCHDOG_THRESHOLD_SECONDS: float = 0.1
+
+    # Turn profiles requested through /debug/profiling are written here. A fraction of
+    # all turns can be profiled from the start with PROFILE_SAMPLE_RATE.
+    PROFILE_OUTPUT_DIR: str = "profiles"
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_MAX_KEPT: int = 200
+
+    # Compiled templates are cached here so restarts skip Jinja's compile step.
+    TEMPLATES_BYTECODE_CACHE_DIR: str = ".jinja_cache"
+    TEMPLATES_AUTO_RELOAD: bool = True
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()  # type: ignore
 
 
-settings = Settings()  # type: ignore
+def __getattr__(name: str) -> Any:
+    # `settings` used to be built at import time; keep the name working, but lazily.
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
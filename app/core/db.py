@@ -1,9 +1,22 @@
-from sqlalchemy import create_engine
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy import Engine, create_engine
 from sqlalchemy.orm import DeclarativeBase
-from app.core.config import settings
+
+from app.core.config import get_settings
+
+
+@lru_cache
+def get_engine() -> Engine:
+    return create_engine(get_settings().DATABASE_URL)
 
 
-engine = create_engine(settings.DATABASE_URL)
+def __getattr__(name: str) -> Any:
+    # The engine is created on first use instead of at import time.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Base(DeclarativeBase):
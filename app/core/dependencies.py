@@ -1,8 +1,8 @@
 from sqlalchemy.orm import Session
-from app.core.db import engine
+from app.core.db import get_engine
 
 def get_db():
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         try:
             yield session
             session.commit()
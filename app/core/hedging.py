@@ -0,0 +1,214 @@
+"""
+Hedged streaming requests. Time to first token has a long tail, so when the first
+token of a stream is late (later than a percentile of recently observed TTFTs) an
+identical second request is started and whichever produces a token first is kept,
+the other one is cancelled. Hedges are capped to a fraction of all requests.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import AsyncExitStack, suppress
+from functools import lru_cache
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, TypeVar
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# the end of a stream
+_END = object()
+
+
+class HedgePolicy:
+    def __init__(
+        self,
+        name: str,
+        *,
+        enabled: bool,
+        percentile: float,
+        min_delay: float,
+        max_delay: float,
+        budget_ratio: float,
+        min_samples: int = 20,
+        window: int = 500,
+    ):
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+        self._requests = 0
+        self._hedges = 0
+
+    def threshold(self) -> float | None:
+        """Seconds to wait for the first token before hedging, None to never hedge."""
+        if not self.enabled:
+            return None
+        if len(self._samples) < self.min_samples:
+            # not enough history yet, only hedge the really slow ones
+            return self.max_delay
+        ordered = sorted(self._samples)
+        index = min(int(len(ordered) * self.percentile / 100), len(ordered) - 1)
+        return min(max(ordered[index], self.min_delay), self.max_delay)
+
+    def record_request(self):
+        self._requests += 1
+
+    def try_hedge(self) -> bool:
+        if self._hedges + 1 > self._requests * self.budget_ratio:
+            metrics.increment("hedge_budget_exhausted_total", policy=self.name)
+            return False
+        self._hedges += 1
+        return True
+
+    def record_ttft(self, seconds: float):
+        self._samples.append(seconds)
+        metrics.observe("llm_time_to_first_token_seconds", seconds, policy=self.name)
+
+
+@lru_cache(maxsize=None)
+def get_hedge_policy(name: str) -> HedgePolicy:
+    settings = get_settings()
+    return HedgePolicy(
+        name,
+        enabled=settings.HEDGING_ENABLED,
+        percentile=settings.HEDGE_PERCENTILE,
+        min_delay=settings.HEDGE_MIN_DELAY_SECONDS,
+        max_delay=settings.HEDGE_MAX_DELAY_SECONDS,
+        budget_ratio=settings.HEDGE_BUDGET_RATIO,
+    )
+
+
+class _Failed:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class _Attempt:
+    """
+    One request, run start to end by its own task: the limiter slot and the stream are
+    entered and left there, which the cancel scopes of the HTTP clients require.
+    Items are handed over through a queue.
+    """
+
+    def __init__(
+        self,
+        open_stream: Callable[[], Awaitable[AsyncIterator[T]]],
+        limit: Callable[[], AsyncContextManager] | None,
+    ):
+        # when the request left the limiter, None while it waits for a slot
+        self.dispatched_at: float | None = None
+        self.dispatched = asyncio.Event()
+        self.first_item_at: float | None = None
+        self._items: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(open_stream, limit))
+
+    async def _run(self, open_stream, limit):
+        try:
+            async with AsyncExitStack() as stack:
+                if limit is not None:
+                    await stack.enter_async_context(limit())
+                self.dispatched_at = time.monotonic()
+                self.dispatched.set()
+                stream = await open_stream()
+                if hasattr(stream, "aclose"):
+                    stack.push_async_callback(stream.aclose)
+                async for item in stream:
+                    if self.first_item_at is None:
+                        self.first_item_at = time.monotonic()
+                    self._items.put_nowait(item)
+        except Exception as e:
+            self._items.put_nowait(_Failed(e))
+        else:
+            self._items.put_nowait(_END)
+
+    async def next(self):
+        """The next item, _END after the last one. Raises what the request raised."""
+        item = await self._items.get()
+        if isinstance(item, _Failed):
+            raise item.error
+        return item
+
+    async def close(self):
+        if not self.task.done():
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
+
+
+async def _wait_for_dispatch(attempt: _Attempt, first_item: asyncio.Future):
+    """Until the request has left the limiter, or already has a result."""
+    dispatched = asyncio.ensure_future(attempt.dispatched.wait())
+    try:
+        await asyncio.wait([dispatched, first_item], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        dispatched.cancel()
+
+
+async def hedged_stream(
+    open_stream: Callable[[], Awaitable[AsyncIterator[T]]],
+    policy: HedgePolicy,
+    *,
+    limit: Callable[[], AsyncContextManager] | None = None,
+    on_first_item: Callable[[float], None] | None = None,
+) -> AsyncIterator[T]:
+    """
+    Yields the items of `open_stream()`, hedged according to `policy`. `limit` is
+    entered around each request, so a hedge takes its own limiter slot. Time to first
+    item is counted from when a request left the limiter: a request still queued
+    locally is never hedged, and `on_first_item` gets the kept request's TTFT.
+    """
+    policy.record_request()
+    attempts = [_Attempt(open_stream, limit)]
+    first_items = {asyncio.ensure_future(attempts[0].next()): attempts[0]}
+    try:
+        threshold = policy.threshold()
+        if threshold is not None:
+            first_item = next(iter(first_items))
+            await _wait_for_dispatch(attempts[0], first_item)
+            done, _ = await asyncio.wait([first_item], timeout=threshold)
+            if not done and policy.try_hedge():
+                logger.info("No first token %.2fs after dispatch, hedging the request.", threshold)
+                attempts.append(_Attempt(open_stream, limit))
+                first_items[asyncio.ensure_future(attempts[1].next())] = attempts[1]
+
+        winner, first, error = None, _END, None
+        while first_items and winner is None:
+            done, _ = await asyncio.wait(first_items, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                attempt = first_items.pop(task)
+                if task.exception() is not None:
+                    error = task.exception()
+                elif winner is None:
+                    winner, first = attempt, task.result()
+        if winner is None:
+            raise error
+
+        if len(attempts) > 1:
+            outcome = "won" if winner is attempts[1] else "lost"
+            metrics.increment("llm_hedges_total", policy=policy.name, outcome=outcome)
+        for attempt in attempts:
+            if attempt is not winner:
+                await attempt.close()
+
+        if first is _END:
+            return
+        ttft = winner.first_item_at - winner.dispatched_at
+        policy.record_ttft(ttft)
+        if on_first_item is not None:
+            on_first_item(ttft)
+        yield first
+        while (item := await winner.next()) is not _END:
+            yield item
+    finally:
+        for task in first_items:
+            task.cancel()
+        for attempt in attempts:
+            await attempt.close()
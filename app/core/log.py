@@ -0,0 +1,104 @@
+"""
+Logging setup. Records are handed to a queue on the calling thread and written by a
+background listener thread, so the event loop never blocks on log I/O.
+"""
+import atexit
+import logging
+import queue
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Iterator
+
+from app.core.profiling import mark_stage
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [turn=%(turn_id)s step=%(step)s] %(message)s"
+
+turn_id_var: ContextVar[str] = ContextVar("turn_id", default="-")
+step_var: ContextVar[str] = ContextVar("step", default="-")
+
+_listener: QueueListener | None = None
+
+
+class TurnContextFilter(logging.Filter):
+    """Stamps the per-turn context onto records while still on the emitting task."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.turn_id = turn_id_var.get()
+        record.step = step_var.get()
+        return True
+
+
+def setup_logging(level: int = logging.INFO, fmt: str = LOG_FORMAT):
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(fmt))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(TurnContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+@contextmanager
+def log_context(*, turn_id: str | None = None, step: str | None = None) -> Iterator[None]:
+    tokens = []
+    if turn_id is not None:
+        tokens.append((turn_id_var, turn_id_var.set(turn_id)))
+    if step is not None:
+        tokens.append((step_var, step_var.set(step)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def set_step(step: str):
+    """Marks the workflow step the current task is running. Steps run in their own tasks."""
+    step_var.set(step)
+    mark_stage(step)
+
+
+class SampledLogger:
+    """
+    Rate limits a hot log call site (e.g. once per streamed token) to one record per
+    interval. Suppressed records are counted and reported on the next emitted one.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = 1.0):
+        self.logger = logger
+        self.interval = interval
+        self._last_emit = 0.0
+        self._suppressed = 0
+
+    def log(self, level: int, msg: str, *args: Any):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        if now - self._last_emit < self.interval:
+            self._suppressed += 1
+            return
+        if self._suppressed:
+            msg = f"{msg} (+%d similar suppressed)"
+            args = (*args, self._suppressed)
+        self._last_emit = now
+        self._suppressed = 0
+        self.logger.log(level, msg, *args)
+
+    def debug(self, msg: str, *args: Any):
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg: str, *args: Any):
+        self.log(logging.INFO, msg, *args)
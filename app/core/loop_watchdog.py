@@ -0,0 +1,156 @@
+"""
+Event loop lag watchdog. A task on the loop beats every LOOP_WATCHDOG_INTERVAL_SECONDS
+and records how late it woke up. A thread watches the beat: when the loop has not
+come back for LOOP_WATCHDOG_THRESHOLD_SECONDS, it grabs the loop thread's stack,
+which is the code blocking every conversation on the process right now.
+
+Stalls are aggregated by call site, the innermost frame in our own code, so a
+synchronous query in a step or a template render per token shows up as one line
+with its count and time. The aggregate is on /debug/loop-stalls and in the metrics.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# keeps the call site labels of the metrics bounded
+_MAX_CALL_SITES = 100
+_STACK_DEPTH = 20
+
+
+@dataclass
+class StallSite:
+    call_site: str
+    blocked_in: str
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    stack: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "call_site": self.call_site,
+            "blocked_in": self.blocked_in,
+            "count": self.count,
+            "total_seconds": round(self.total_seconds, 3),
+            "max_seconds": round(self.max_seconds, 3),
+            "stack": self.stack,
+        }
+
+
+def _describe(frame: traceback.FrameSummary) -> str:
+    return f"{os.path.relpath(frame.filename)}:{frame.lineno} in {frame.name}"
+
+
+class LoopWatchdog:
+    def __init__(self, *, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._sites: dict[str, StallSite] = {}
+        self._lock = threading.Lock()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._beat_task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._beat_task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._beat_task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Event loop watchdog started, threshold %.0fms.", self.threshold * 1000)
+
+    async def stop(self):
+        self._stop.set()
+        if self._beat_task is not None:
+            self._beat_task.cancel()
+            self._beat_task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    async def _beat(self):
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - self._heartbeat - self.interval
+            metrics.observe("event_loop_lag_seconds", max(lag, 0.0))
+
+    def _watch(self):
+        stalled_since: float | None = None
+        site: StallSite | None = None
+        while not self._stop.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            if stalled_since is not None and heartbeat != stalled_since:
+                # the loop is back, the stall lasted until its next beat
+                self._finish_stall(site, heartbeat - stalled_since - self.interval)
+                stalled_since, site = None, None
+            if stalled_since is None and time.monotonic() - heartbeat - self.interval > self.threshold:
+                site = self._capture()
+                stalled_since = heartbeat
+
+    def _capture(self) -> StallSite | None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)[-_STACK_DEPTH:]
+        ours = [
+            summary for summary in stack
+            if summary.filename.startswith(_APP_DIR) and summary.filename != __file__
+        ]
+        call_site = _describe(ours[-1] if ours else stack[-1])
+        with self._lock:
+            site = self._sites.get(call_site)
+            if site is None:
+                if len(self._sites) >= _MAX_CALL_SITES:
+                    call_site = "other"
+                site = self._sites.setdefault(
+                    call_site, StallSite(call_site=call_site, blocked_in=_describe(stack[-1]))
+                )
+            site.stack = [_describe(summary) for summary in stack]
+        return site
+
+    def _finish_stall(self, site: StallSite | None, seconds: float):
+        seconds = max(seconds, self.threshold)
+        metrics.observe("event_loop_stall_seconds", seconds)
+        if site is None:
+            return
+        with self._lock:
+            site.count += 1
+            site.total_seconds += seconds
+            site.max_seconds = max(site.max_seconds, seconds)
+        metrics.increment("event_loop_stalls_total", call_site=site.call_site)
+        logger.warning("Event loop blocked for %.0fms at %s.", seconds * 1000, site.call_site)
+
+    def report(self) -> dict:
+        with self._lock:
+            sites = sorted(self._sites.values(), key=lambda site: site.total_seconds, reverse=True)
+            return {
+                "threshold_seconds": self.threshold,
+                "call_sites": [site.as_dict() for site in sites],
+            }
+
+
+@lru_cache
+def get_loop_watchdog() -> LoopWatchdog:
+    settings = get_settings()
+    return LoopWatchdog(
+        interval=settings.LOOP_WATCHDOG_INTERVAL_SECONDS,
+        threshold=settings.LOOP_WATCHDOG_THRESHOLD_SECONDS,
+    )
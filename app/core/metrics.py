@@ -0,0 +1,77 @@
+"""
+Minimal in-process metrics. Counters, gauges and summaries keyed by name and labels,
+exported as JSON on /metrics. Good enough for dashboards and autoscaling probes
+without pulling in a metrics client.
+"""
+import threading
+from dataclasses import dataclass
+
+
+@dataclass
+class Summary:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+def _key(name: str, labels: dict[str, str]) -> tuple[str, tuple[tuple[str, str], ...]]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._gauges: dict[tuple, float] = {}
+        self._summaries: dict[tuple, Summary] = {}
+
+    def increment(self, name: str, value: float = 1.0, **labels: str):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary()
+            summary.observe(value)
+
+    def snapshot(self) -> dict:
+        def export(values: dict) -> list[dict]:
+            return [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "value": value.as_dict() if isinstance(value, Summary) else value,
+                }
+                for (name, labels), value in sorted(values.items())
+            ]
+
+        with self._lock:
+            return {
+                "counters": export(self._counters),
+                "gauges": export(self._gauges),
+                "summaries": export(self._summaries),
+            }
+
+
+metrics = MetricsRegistry()
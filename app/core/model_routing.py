@@ -0,0 +1,145 @@
+"""
+Per-step model routing. Transcription, replies and feedback each have an ordered list
+of candidate models in the settings. For every call the router takes the first
+candidate that is healthy (error rate under MODEL_ROUTING_MAX_ERROR_RATE) and not much
+slower (MODEL_ROUTING_LATENCY_SLACK times) than the fastest healthy one, judged on the
+calls of the last MODEL_ROUTING_WINDOW_SECONDS. Old samples expire, so a model that
+was routed around is tried again once its bad window has passed.
+"""
+import logging
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import StrEnum
+from functools import lru_cache
+from typing import AsyncIterator
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# below this many samples a model's error rate is not trusted
+MIN_SAMPLES = 5
+
+
+class ModelStep(StrEnum):
+    TRANSCRIPTION = "transcription"
+    REPLY = "reply"
+    FEEDBACK = "feedback"
+
+
+class ModelStats:
+    def __init__(self, window_seconds: float, max_samples: int = 200):
+        self.window_seconds = window_seconds
+        # (recorded_at, latency, ok)
+        self._samples: deque[tuple[float, float, bool]] = deque(maxlen=max_samples)
+
+    def record(self, latency: float, ok: bool):
+        self._samples.append((time.monotonic(), latency, ok))
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+
+    def error_rate(self) -> float:
+        self._prune()
+        if len(self._samples) < MIN_SAMPLES:
+            return 0.0
+        return sum(1 for _, _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency(self) -> float | None:
+        """Median latency of the successful calls, None without any."""
+        self._prune()
+        latencies = [latency for _, latency, ok in self._samples if ok]
+        return statistics.median(latencies) if latencies else None
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        step: ModelStep,
+        candidates: list[str],
+        *,
+        window_seconds: float,
+        max_error_rate: float,
+        latency_slack: float,
+    ):
+        if not candidates:
+            raise ValueError(f"No models configured for {step}.")
+        self.step = step
+        self.candidates = candidates
+        self.max_error_rate = max_error_rate
+        self.latency_slack = latency_slack
+        self.window_seconds = window_seconds
+        self._stats = {model: ModelStats(window_seconds) for model in candidates}
+
+    def choose(self) -> str:
+        healthy = [
+            model for model in self.candidates
+            if self._stats[model].error_rate() <= self.max_error_rate
+        ]
+        if not healthy:
+            # everything is failing, go with the least bad
+            model = min(self.candidates, key=lambda model: self._stats[model].error_rate())
+        else:
+            latencies = {model: self._stats[model].latency() for model in healthy}
+            known = [latency for latency in latencies.values() if latency is not None]
+            fastest = min(known) if known else None
+            model = next(
+                model for model in healthy
+                if latencies[model] is None or fastest is None
+                or latencies[model] <= fastest * self.latency_slack
+            )
+        if model != self.candidates[0]:
+            logger.info("Routing %s to %s instead of %s.", self.step, model, self.candidates[0])
+        metrics.increment("model_routed_total", step=self.step, model=model)
+        return model
+
+    def record(self, model: str, latency: float, ok: bool):
+        # the injected primary client may be for a model that is not a candidate
+        stats = self._stats.setdefault(model, ModelStats(self.window_seconds))
+        stats.record(latency, ok)
+        metrics.increment(
+            "model_requests_total", step=self.step, model=model, outcome="ok" if ok else "error"
+        )
+        if ok:
+            metrics.observe("model_latency_seconds", latency, step=self.step, model=model)
+        metrics.set_gauge("model_error_rate", stats.error_rate(), step=self.step, model=model)
+
+    @asynccontextmanager
+    async def observe(
+        self, model: str, *, ignore: tuple[type[Exception], ...] = ()
+    ) -> AsyncIterator[None]:
+        """
+        Records the latency and outcome of the call made in the block. Errors of the
+        `ignore` types say nothing about the model, nothing is recorded for them.
+        """
+        started_at = time.monotonic()
+        try:
+            yield
+        except ignore:
+            raise
+        except Exception:
+            self.record(model, time.monotonic() - started_at, ok=False)
+            raise
+        self.record(model, time.monotonic() - started_at, ok=True)
+
+
+@lru_cache(maxsize=None)
+def get_model_router(step: ModelStep) -> ModelRouter:
+    settings = get_settings()
+    candidates = {
+        ModelStep.TRANSCRIPTION: settings.TRANSCRIPTION_MODELS,
+        ModelStep.REPLY: settings.REPLY_MODELS,
+        ModelStep.FEEDBACK: settings.FEEDBACK_MODELS,
+    }[step]
+    return ModelRouter(
+        step,
+        candidates,
+        window_seconds=settings.MODEL_ROUTING_WINDOW_SECONDS,
+        max_error_rate=settings.MODEL_ROUTING_MAX_ERROR_RATE,
+        latency_slack=settings.MODEL_ROUTING_LATENCY_SLACK,
+    )
@@ -0,0 +1,182 @@
+"""
+On-demand turn profiling. An admin arms the next N turns of a session, or sets a
+fraction of all turns to sample, through the /debug/profiling routes (only served with
+DEBUG_ROUTES_ENABLED). A selected turn runs under cProfile from the moment the
+orchestrator picks it up until its last frame is sent; in queue mode the worker
+profiles its side of the same turn.
+
+Every profile is written to PROFILE_OUTPUT_DIR as `<turn_id>.<process>.prof` (load it
+with pstats or snakeviz) next to a `.json` with the turn id and the stage timeline:
+when the turn was admitted, when each workflow step started and when the first and
+last events came out.
+
+cProfile hooks the whole thread, so one turn is profiled at a time per process and
+the profile also shows whatever else ran on the loop meanwhile. Turns selected while
+another is being profiled are skipped, an armed session keeps its count for later.
+"""
+import asyncio
+import cProfile
+import json
+import logging
+import multiprocessing
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import AsyncIterator
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_current_profile: ContextVar["TurnProfile | None"] = ContextVar("turn_profile", default=None)
+
+
+@dataclass
+class TurnProfile:
+    turn_id: str
+    session_id: str | None
+    started_at: float = field(default_factory=time.monotonic)
+    started_at_wall: float = field(default_factory=time.time)
+    # (stage, seconds since the turn started), in the order they happened
+    stages: list[tuple[str, float]] = field(default_factory=list)
+
+    def mark(self, stage: str):
+        self.stages.append((stage, time.monotonic() - self.started_at))
+
+    def as_dict(self, total_seconds: float) -> dict:
+        return {
+            "turn_id": self.turn_id,
+            "session_id": self.session_id,
+            "process": multiprocessing.current_process().name,
+            "started_at": self.started_at_wall,
+            "total_seconds": round(total_seconds, 4),
+            "stages": [{"stage": stage, "at_seconds": round(at, 4)} for stage, at in self.stages],
+        }
+
+
+def current_profile() -> TurnProfile | None:
+    return _current_profile.get()
+
+
+def mark_stage(stage: str):
+    """Adds `stage` to the timeline of the turn being profiled, if this is one."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.mark(stage)
+
+
+class TurnProfiler:
+    def __init__(self, output_dir: str, sample_rate: float = 0.0, max_kept: int = 200):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.max_kept = max_kept
+        # session id -> turns left to profile
+        self._armed: dict[str, int] = {}
+        self._active: TurnProfile | None = None
+
+    def arm(self, session_id: str, turns: int):
+        if turns <= 0:
+            self._armed.pop(session_id, None)
+        else:
+            self._armed[session_id] = turns
+        logger.info("Profiling the next %d turns of session %s.", turns, session_id)
+
+    def set_sample_rate(self, rate: float):
+        self.sample_rate = min(max(rate, 0.0), 1.0)
+        logger.info("Profiling %.1f%% of turns.", self.sample_rate * 100)
+
+    def _select(self, session_id: str | None) -> bool:
+        armed = self._armed.get(session_id, 0) if session_id else 0
+        if not armed and not (self.sample_rate and random.random() < self.sample_rate):
+            return False
+        if self._active is not None:
+            metrics.increment("turn_profiles_total", outcome="skipped_busy")
+            return False
+        if armed:
+            if armed == 1:
+                del self._armed[session_id]
+            else:
+                self._armed[session_id] = armed - 1
+        return True
+
+    @asynccontextmanager
+    async def turn(
+        self, turn_id: str, *, session_id: str | None = None, selected: bool | None = None
+    ) -> AsyncIterator[TurnProfile | None]:
+        """
+        Profiles the block when the turn is selected. `selected` overrides the decision,
+        the worker uses it to follow what the gateway chose.
+        """
+        if selected is None:
+            selected = self._select(session_id)
+        elif selected and self._active is not None:
+            metrics.increment("turn_profiles_total", outcome="skipped_busy")
+            selected = False
+        if not selected:
+            yield None
+            return
+
+        profile = TurnProfile(turn_id=turn_id, session_id=session_id)
+        profiler = cProfile.Profile()
+        self._active = profile
+        token = _current_profile.set(profile)
+        profiler.enable()
+        try:
+            yield profile
+        finally:
+            profiler.disable()
+            total_seconds = time.monotonic() - profile.started_at
+            _current_profile.reset(token)
+            self._active = None
+            metrics.increment("turn_profiles_total", outcome="written")
+            try:
+                await asyncio.to_thread(self._write, profile, profiler, total_seconds)
+            except OSError as e:
+                logger.warning("Could not write the profile of turn %s: %s", turn_id, e)
+
+    def _write(self, profile: TurnProfile, profiler: cProfile.Profile, total_seconds: float):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(
+            self.output_dir, f"{profile.turn_id}.{multiprocessing.current_process().name}"
+        )
+        profiler.dump_stats(f"{base}.prof")
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(profile.as_dict(total_seconds), f, indent=2)
+        logger.info("Profile of turn %s written to %s.prof.", profile.turn_id, base)
+        self._prune()
+
+    def _prune(self):
+        paths = [
+            os.path.join(self.output_dir, name)
+            for name in os.listdir(self.output_dir)
+            if name.endswith((".prof", ".json"))
+        ]
+        # a profile is two files
+        excess = len(paths) - 2 * self.max_kept
+        if excess <= 0:
+            return
+        for path in sorted(paths, key=os.path.getmtime)[:excess]:
+            os.remove(path)
+
+    def status(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "armed_sessions": dict(self._armed),
+            "profiling_turn": self._active.turn_id if self._active else None,
+            "output_dir": os.path.abspath(self.output_dir),
+        }
+
+
+@lru_cache
+def get_turn_profiler() -> TurnProfiler:
+    settings = get_settings()
+    return TurnProfiler(
+        output_dir=settings.PROFILE_OUTPUT_DIR,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        max_kept=settings.PROFILE_MAX_KEPT,
+    )
@@ -0,0 +1,218 @@
+"""
+Process-wide limits for the calls we make to upstream providers (Gemini, ElevenLabs).
+
+Each provider/model pair gets one `ProviderLimiter` combining a concurrency cap with
+token buckets for requests and tokens per minute. Callers wait in a queue ordered by
+priority (interactive replies before transcription before feedback) and, within a
+priority, served round-robin per connection so one busy conversation cannot starve
+the others. Waiting time is exported as metrics.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import lru_cache
+from typing import AsyncIterator
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    TRANSCRIPTION = 1
+    FEEDBACK = 2
+
+
+class TokenBucket:
+    """Classic token bucket. A rate of 0 disables it."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available, 0 if they are now."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        # a single call bigger than the whole bucket only has to wait for a full one
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if self.rate > 0:
+            self.tokens -= min(amount, self.capacity)
+
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future
+    priority: Priority
+    connection_id: str
+    tokens: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class ProviderLimiter:
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_concurrency: int,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        # priority -> connection -> its waiters, connections rotate for round-robin
+        self._queues: dict[Priority, OrderedDict[str, deque[_Waiter]]] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self._retry_timer: asyncio.TimerHandle | None = None
+
+    @asynccontextmanager
+    async def limit(
+        self, *, priority: Priority, connection_id: str = "-", tokens: int = 0
+    ) -> AsyncIterator[None]:
+        """Holds a slot for the whole block, so wrap the full stream, not just its creation."""
+        await self._acquire(priority, connection_id, tokens)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @property
+    def queued(self) -> int:
+        return sum(
+            len(waiters) for queue in self._queues.values() for waiters in queue.values()
+        )
+
+    async def _acquire(self, priority: Priority, connection_id: str, tokens: int):
+        waiter = _Waiter(
+            future=asyncio.get_running_loop().create_future(),
+            priority=priority,
+            connection_id=connection_id,
+            tokens=tokens,
+        )
+        self._queues[priority].setdefault(connection_id, deque()).append(waiter)
+        self._grant()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # granted right before the cancellation landed
+                self._release()
+            else:
+                self._remove(waiter)
+            raise
+
+    def _release(self):
+        self.in_flight -= 1
+        self._grant()
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues[waiter.priority]
+        waiters = queue.get(waiter.connection_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del queue[waiter.connection_id]
+        self._update_gauges()
+
+    def _next_waiter(self) -> _Waiter | None:
+        for priority in Priority:
+            queue = self._queues[priority]
+            if queue:
+                return next(iter(queue.values()))[0]
+        return None
+
+    def _pop(self, waiter: _Waiter):
+        queue = self._queues[waiter.priority]
+        waiters = queue.pop(waiter.connection_id)
+        waiters.popleft()
+        if waiters:
+            # back of the line, the next connection of this priority goes first
+            queue[waiter.connection_id] = waiters
+
+    def _grant(self):
+        while self.in_flight < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            if waiter.future.done():
+                # cancelled, its task has not resumed to dequeue itself yet
+                self._pop(waiter)
+                continue
+            delay = max(self.requests.delay(1), self.tokens.delay(waiter.tokens))
+            if delay > 0:
+                self._retry_later(delay)
+                break
+
+            self._pop(waiter)
+            self.requests.consume(1)
+            self.tokens.consume(waiter.tokens)
+            self.in_flight += 1
+            waiter.future.set_result(None)
+            metrics.observe(
+                "provider_limiter_wait_seconds",
+                time.monotonic() - waiter.enqueued_at,
+                provider=self.name,
+                priority=waiter.priority.name.lower(),
+            )
+        self._update_gauges()
+
+    def _retry_later(self, delay: float):
+        if self._retry_timer is not None:
+            return
+
+        def retry():
+            self._retry_timer = None
+            self._grant()
+
+        self._retry_timer = asyncio.get_running_loop().call_later(delay, retry)
+
+    def _update_gauges(self):
+        metrics.set_gauge("provider_limiter_in_flight", self.in_flight, provider=self.name)
+        metrics.set_gauge("provider_limiter_queued", self.queued, provider=self.name)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size, ~4 characters per token is close enough for rate limiting."""
+    return len(text) // 4 + 1
+
+
+@lru_cache(maxsize=None)
+def get_provider_limiter(provider: str, model: str) -> ProviderLimiter:
+    settings = get_settings()
+    if provider == "gemini":
+        return ProviderLimiter(
+            f"{provider}:{model}",
+            max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+            requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE,
+        )
+    if provider == "elevenlabs":
+        return ProviderLimiter(
+            f"{provider}:{model}",
+            max_concurrency=settings.ELEVENLABS_MAX_CONCURRENCY,
+            requests_per_minute=settings.ELEVENLABS_REQUESTS_PER_MINUTE,
+        )
+    raise ValueError(f"No limits configured for provider {provider!r}.")
@@ -1,3 +1,40 @@
+import logging
+import os
+
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app.core.caching import cached_fragment
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+templates = Jinja2Templates(
+    env=Environment(
+        loader=FileSystemLoader("app/templates"),
+        autoescape=True,
+        # every partial is rendered per streamed token, keep all of them compiled
+        cache_size=-1,
+    )
+)
+templates.env.globals["cached_fragment"] = cached_fragment
+
+
+def precompile_templates():
+    """
+    Compiles every template up front so no request pays for it. Compiled code is also
+    written to a bytecode cache, so the next process start only has to load it.
+    """
+    settings = get_settings()
+    os.makedirs(settings.TEMPLATES_BYTECODE_CACHE_DIR, exist_ok=True)
+    templates.env.bytecode_cache = FileSystemBytecodeCache(settings.TEMPLATES_BYTECODE_CACHE_DIR)
+    templates.env.auto_reload = settings.TEMPLATES_AUTO_RELOAD
+
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    logger.info("Precompiled %d templates.", len(names))
+
 
-templates = Jinja2Templates(directory="app/templates")
\ No newline at end of file
+if __name__ == "__main__":
+    precompile_templates()
@@ -0,0 +1,6 @@
+from enum import StrEnum
+
+
+class FeedbackMode(StrEnum):
+    IMMEDIATE = "immediate"
+    BATCHED = "batched"
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import Column, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.core.db import Base
+from app.language_profiles.enums import FeedbackMode
 
 
 class LanguageProfile(Base):
@@ -10,6 +11,9 @@ class LanguageProfile(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
     target_language = Column(String, nullable=False)
+    feedback_mode = Column(
+        String, nullable=False, default=FeedbackMode.IMMEDIATE, server_default=FeedbackMode.IMMEDIATE
+    )
 
     practice_topics = relationship(
         "PracticeTopic",
@@ -20,6 +24,10 @@ class LanguageProfile(Base):
 
 class PracticeTopic(Base):
     __tablename__ = "practice_topics"
+    # topics are always read per profile, in id order
+    __table_args__ = (
+        Index("ix_practice_topics_language_profile_id_id", "language_profile_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -1,7 +1,6 @@
 from typing import Sequence
 
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 
 from app.commons.repositories import BaseRepository
 from app.language_profiles.models import LanguageProfile, PracticeTopic
@@ -14,24 +13,24 @@ class LanguageProfileRepository(BaseRepository[LanguageProfile]):
     def __init__(self, db):
         super().__init__(db)
 
-    def list(self) -> Sequence[LanguageProfile]:
+
+class PracticeTopicRepository(BaseRepository[PracticeTopic]):
+    model = PracticeTopic
+
+    def __init__(self, db):
+        super().__init__(db)
+
+    def list_for_profile(self, profile_id: int) -> Sequence[PracticeTopic]:
         return (
             self.db.execute(
                 select(self.model)
-                .options(selectinload(self.model.practice_topics))
+                .where(self.model.language_profile_id == profile_id)
                 .order_by(self.model.id)
             )
             .scalars()
             .all()
         )
 
-
-class PracticeTopicRepository(BaseRepository[PracticeTopic]):
-    model = PracticeTopic
-
-    def __init__(self, db):
-        super().__init__(db)
-
     def create_for_profile(
         self, *, profile_id: int, obj_in: PracticeTopicCreate
     ) -> PracticeTopic:
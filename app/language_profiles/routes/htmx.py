@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, Form, Request, Response
 from fastapi.responses import HTMLResponse
 from fastapi_htmx import htmx
 
+from app.core.caching import conditional
 from app.core.templating import templates
 from app.language_profiles.dependencies import (
     get_language_profile_page_service,
@@ -23,6 +24,7 @@ router = APIRouter()
 
 
 @router.get("/", response_class=HTMLResponse, name="view_language_profiles")
+@conditional("language_profiles")
 async def view_language_profiles(
     request: Request,
     service: LanguageProfilePageService = Depends(get_language_profile_page_service),
@@ -33,6 +35,18 @@ async def view_language_profiles(
     )
 
 
+@router.get("/page", name="list_language_profiles_page")
+@conditional("language_profiles")
+@htmx("language_profiles/partials/language_profile_page")
+async def list_language_profiles_page(
+    request: Request,
+    before: int | None = None,
+    service: LanguageProfilePageService = Depends(get_language_profile_page_service),
+):
+    """The next page of the list, requested when its end scrolls into view."""
+    return service.get_language_profiles_page_data(before=before)
+
+
 @router.post("/", name="create_language_profile")
 @htmx("language_profiles/partials/language_profile_item")
 async def create_language_profile(
@@ -54,6 +68,7 @@ async def delete_language_profile(
 
 
 @router.get("/{profile_id}/edit", name="view_edit_language_profile_form")
+@conditional("language_profiles")
 @htmx("language_profiles/partials/edit_language_profile_form")
 async def view_edit_language_profile_form(
     request: Request,
@@ -79,6 +94,7 @@ async def update_language_profile(
 
 
 @router.get("/{profile_id}", name="get_language_profile")
+@conditional("language_profiles")
 @htmx("language_profiles/partials/language_profile_item")
 async def get_language_profile(
     request: Request,
@@ -89,6 +105,18 @@ async def get_language_profile(
     return {"language_profile": profile}
 
 
+@router.get("/{profile_id}/topics", name="list_practice_topics")
+@conditional("practice_topics")
+@htmx("language_profiles/partials/practice_topic_list")
+async def list_practice_topics(
+    request: Request,
+    profile_id: int,
+    service: LanguageProfileService = Depends(get_language_profile_service),
+):
+    """Topics of a profile, loaded the first time it is expanded."""
+    return {"topics": service.list_topics(profile_id=profile_id)}
+
+
 @router.post("/{profile_id}/topics", name="add_practice_topic")
 @htmx("language_profiles/partials/practice_topic_item")
 async def add_practice_topic(
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, ConfigDict
 
+from app.language_profiles.enums import FeedbackMode
+
 
 # Practice Topic Schemas
 class PracticeTopicBase(BaseModel):
@@ -19,6 +21,7 @@ class PracticeTopicRead(PracticeTopicBase):
 class LanguageProfileBase(BaseModel):
     name: str
     target_language: str
+    feedback_mode: FeedbackMode = FeedbackMode.IMMEDIATE
 
 
 class LanguageProfileCreate(LanguageProfileBase):
@@ -1,5 +1,7 @@
 from typing import Sequence
 
+from app.commons.repositories import Page
+from app.core.config import get_settings
 from app.language_profiles.models import LanguageProfile, PracticeTopic
 from app.language_profiles.repositories import (
     LanguageProfileRepository,
@@ -24,8 +26,14 @@ class LanguageProfileService:
     def get_language_profile(self, profile_id: int) -> LanguageProfile | None:
         return self.language_profile_repository.get(pk=profile_id)
 
-    def list_language_profiles(self) -> Sequence[LanguageProfile]:
-        return self.language_profile_repository.list()
+    def list_language_profiles_page(self, *, before: int | None = None) -> Page[LanguageProfile]:
+        """Without their topics, those are loaded when a profile is expanded."""
+        return self.language_profile_repository.list_page(
+            before=before, limit=get_settings().LIST_PAGE_SIZE
+        )
+
+    def list_topics(self, *, profile_id: int) -> Sequence[PracticeTopic]:
+        return self.practice_topic_repository.list_for_profile(profile_id)
 
     def create_language_profile(
         self, *, profile_in: LanguageProfileCreate
@@ -58,7 +66,6 @@ class LanguageProfilePageService:
     def __init__(self, language_profile_service: LanguageProfileService):
         self.language_profile_service = language_profile_service
 
-    def get_language_profiles_page_data(self) -> dict:
-        return {
-            "language_profiles": self.language_profile_service.list_language_profiles()
-        }
+    def get_language_profiles_page_data(self, before: int | None = None) -> dict:
+        page = self.language_profile_service.list_language_profiles_page(before=before)
+        return {"language_profiles": page.items, "next_cursor": page.next_cursor}
@@ -1,23 +1,55 @@
-import logging
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, status
 from fastapi.requests import Request
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi_htmx import htmx_init
 
-from app.core.templating import templates
+from app.core.config import get_settings
+from app.core.log import setup_logging
+from app.core.loop_watchdog import get_loop_watchdog
+from app.core.metrics import metrics
+from app.core.profiling import get_turn_profiler
+from app.core.templating import precompile_templates, templates
+from app.bulk.routes.api import router as bulk_router
+from app.conversation.admission import get_admission_controller
+from app.conversation.broker import get_conversation_broker
+from app.conversation.dependencies import (
+    get_conversation_service,
+    get_queued_conversation_service,
+)
 from app.conversation.routes.htmx import router as conversation_htmx_router
+from app.conversation.speech import sweep_unplayed_speech
 from app.language_profiles.routes.htmx import router as language_profiles_router
 from app.personas.routes.htmx import router as personas_router
 from app.settings.routes.htmx import router as settings_router
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+setup_logging()
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    if settings.LOOP_WATCHDOG_ENABLED:
+        get_loop_watchdog().start()
+    queue_mode = settings.CONVERSATION_EXECUTION_MODE == "queue"
+    if queue_mode:
+        app.dependency_overrides[get_conversation_service] = get_queued_conversation_service
+        await get_conversation_broker().start()
+    await asyncio.to_thread(precompile_templates)
+    # workers write to the same AUDIO_OUTPUT_DIR, the web process sweeps it for all
+    sweep_task = asyncio.create_task(sweep_unplayed_speech())
+    yield
+    sweep_task.cancel()
+    if queue_mode:
+        await get_conversation_broker().stop()
+    if settings.LOOP_WATCHDOG_ENABLED:
+        await get_loop_watchdog().stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -28,8 +60,59 @@ app.include_router(personas_router, prefix="/personas", tags=["personas_htmx"])
 app.include_router(language_profiles_router, prefix="/language-profiles", tags=["language_profiles_htmx"])
 app.include_router(settings_router, prefix="/settings", tags=["settings_htmx"])
 app.include_router(conversation_htmx_router, prefix="/conversation", tags=["conversation_htmx"])
+
+# Bulk JSONL import and export
+app.include_router(bulk_router, prefix="/bulk", tags=["bulk"])
 # ---
 
 @app.get("/", include_in_schema=False)
 async def root(request: Request):
-    return RedirectResponse(request.url_for("view_personas"))
\ No newline at end of file
+    return RedirectResponse(request.url_for("view_personas"))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return metrics.snapshot()
+
+
+@app.get("/load", include_in_schema=False)
+async def get_load():
+    """Turn capacity of this process, for load balancers and autoscalers."""
+    return get_admission_controller().snapshot()
+
+
+def require_debug_routes():
+    # checked per request, reading the settings at import would need them to import the app
+    if not get_settings().DEBUG_ROUTES_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+
+debug_router = APIRouter(include_in_schema=False, dependencies=[Depends(require_debug_routes)])
+
+
+@debug_router.get("/loop-stalls")
+async def get_loop_stalls():
+    """Where the event loop of this process was blocked, worst call sites first."""
+    return get_loop_watchdog().report()
+
+
+@debug_router.get("/profiling")
+async def get_profiling_status():
+    return get_turn_profiler().status()
+
+
+@debug_router.post("/profiling/sessions/{session_id}")
+async def profile_session_turns(session_id: str, turns: int = Query(1, ge=0, le=100)):
+    """Profiles the next `turns` turns of a conversation session, 0 disarms it."""
+    get_turn_profiler().arm(session_id, turns)
+    return get_turn_profiler().status()
+
+
+@debug_router.post("/profiling/sample")
+async def set_profiling_sample_rate(rate: float = Query(ge=0.0, le=1.0)):
+    """Profiles this fraction of all turns."""
+    get_turn_profiler().set_sample_rate(rate)
+    return get_turn_profiler().status()
+
+
+app.include_router(debug_router, prefix="/debug", tags=["debug"])
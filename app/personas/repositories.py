@@ -1,7 +1,3 @@
-from typing import Sequence
-
-from sqlalchemy import select
-
 from app.commons.repositories import BaseRepository
 from app.personas.models import Persona
 
@@ -11,6 +7,3 @@ class PersonaRepository(BaseRepository[Persona]):
 
     def __init__(self, db):
         super().__init__(db)
-
-    def list(self) -> Sequence[Persona]:
-        return self.db.execute(select(self.model).order_by(self.model.id)).scalars().all()
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, Form, Request, Response
 from fastapi.responses import HTMLResponse
 from fastapi_htmx import htmx
 
+from app.core.caching import conditional
 from app.core.templating import templates
 from app.personas.dependencies import get_persona_page_service, get_persona_service
 from app.personas.schemas import PersonaCreate, PersonaUpdate
@@ -13,6 +14,7 @@ router = APIRouter()
 
 
 @router.get("/", response_class=HTMLResponse, name="view_personas")
+@conditional("personas")
 async def view_personas(
     request: Request,
     service: PersonaPageService = Depends(get_persona_page_service),
@@ -23,6 +25,18 @@ async def view_personas(
     )
 
 
+@router.get("/page", name="list_personas_page")
+@conditional("personas")
+@htmx("personas/partials/persona_page")
+async def list_personas_page(
+    request: Request,
+    before: int | None = None,
+    service: PersonaPageService = Depends(get_persona_page_service),
+):
+    """The next page of the list, requested when its end scrolls into view."""
+    return service.get_personas_page_data(before=before)
+
+
 @router.post("/", name="create_persona")
 @htmx("personas/partials/persona_item")
 async def create_persona(
@@ -44,6 +58,7 @@ async def delete_persona(
 
 
 @router.get("/{persona_id}/edit", name="view_edit_persona_form")
+@conditional("personas")
 @htmx("personas/partials/edit_persona_form")
 async def view_edit_persona_form(
     request: Request,
@@ -69,6 +84,7 @@ async def update_persona(
 
 
 @router.get("/{persona_id}", name="get_persona")
+@conditional("personas")
 @htmx("personas/partials/persona_item")
 async def get_persona(
     request: Request,
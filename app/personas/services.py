@@ -1,5 +1,5 @@
-from typing import Sequence
-
+from app.commons.repositories import Page
+from app.core.config import get_settings
 from app.personas.models import Persona
 from app.personas.repositories import PersonaRepository
 from app.personas.schemas import PersonaCreate, PersonaUpdate
@@ -12,8 +12,8 @@ class PersonaService:
     def get_persona(self, persona_id: int) -> Persona | None:
         return self.persona_repository.get(pk=persona_id)
 
-    def list_personas(self) -> Sequence[Persona]:
-        return self.persona_repository.list()
+    def list_personas_page(self, *, before: int | None = None) -> Page[Persona]:
+        return self.persona_repository.list_page(before=before, limit=get_settings().LIST_PAGE_SIZE)
 
     def create_persona(self, *, persona_in: PersonaCreate) -> Persona:
         return self.persona_repository.create(obj_in=persona_in)
@@ -32,5 +32,6 @@ class PersonaPageService:
     def __init__(self, persona_service: PersonaService):
         self.persona_service = persona_service
 
-    def get_personas_page_data(self) -> dict:
-        return {"personas": self.persona_service.list_personas()}
+    def get_personas_page_data(self, before: int | None = None) -> dict:
+        page = self.persona_service.list_personas_page(before=before)
+        return {"personas": page.items, "next_cursor": page.next_cursor}
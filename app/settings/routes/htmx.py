@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, Form, Request
 from fastapi.responses import HTMLResponse
 from fastapi_htmx import htmx
 
+from app.core.caching import conditional
 from app.core.templating import templates
 from app.settings.dependencies import get_settings_page_service, get_settings_service
 from app.settings.schemas import SettingsUpdate
@@ -13,6 +14,7 @@ router = APIRouter()
 
 
 @router.get("/", response_class=HTMLResponse, name="view_settings")
+@conditional("settings")
 async def view_settings(
     request: Request, service: SettingsPageService = Depends(get_settings_page_service)
 ):
@@ -0,0 +1,78 @@
+"""
+Per-turn overhead of the two conversation engines.
+
+Runs text turns through ConversationService on the llama-index Workflow and on the
+direct pipeline, with in-memory providers that answer instantly, so what is measured
+is the engine itself: dispatch, context, event streaming and mapping. Engines take
+turns in rounds to even out warm-up and GC effects.
+
+Usage: python scripts/benchmark_engines.py [turns] [audio_mode]
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# running a turn must not need real credentials or a database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("GOOGLE_API_KEY", "unused")
+os.environ.setdefault("ELEVENLABS_API_KEY", "unused")
+
+from app.conversation.services import ConversationService  # noqa: E402
+from tests.conversation.fakes import build_workflow, configure_for_fakes, run_turn  # noqa: E402
+
+ENGINES = ("workflow", "direct")
+ROUNDS = 5
+
+
+async def time_turns(engine: str, turns: int, audio_mode: str) -> tuple[list[float], float]:
+    """Wall time of each turn and CPU time of them all, on a fresh conversation."""
+    service = ConversationService(build_workflow(), engine=engine)
+    wall = []
+    cpu_started_at = time.process_time()
+    for i in range(turns):
+        started_at = time.perf_counter()
+        await run_turn(service, f"mensaje {i}", audio_mode=audio_mode)
+        wall.append(time.perf_counter() - started_at)
+        # the history grows every turn, keep the prompts the same size
+        service.workflow.history.clear()
+    return wall, time.process_time() - cpu_started_at
+
+
+async def benchmark(turns: int, audio_mode: str) -> dict[str, tuple[list[float], float]]:
+    results = {engine: ([], 0.0) for engine in ENGINES}
+    for engine in ENGINES:
+        # first turns pay for imports and lazy setup
+        await time_turns(engine, 5, audio_mode)
+    for _ in range(ROUNDS):
+        for engine in ENGINES:
+            wall, cpu = await time_turns(engine, turns // ROUNDS, audio_mode)
+            results[engine] = (results[engine][0] + wall, results[engine][1] + cpu)
+    return results
+
+
+def main() -> int:
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    audio_mode = sys.argv[2] if len(sys.argv) > 2 else "stream"
+    logging.basicConfig(level=logging.CRITICAL)
+    configure_for_fakes()
+
+    results = asyncio.run(benchmark(turns, audio_mode))
+    summary = {}
+    for engine, (wall, cpu) in results.items():
+        wall_ms = sorted(seconds * 1000 for seconds in wall)
+        summary[engine] = statistics.median(wall_ms)
+        sys.stdout.write(
+            f"{engine:>8}: {len(wall_ms)} turns, median {summary[engine]:.2f}ms, "
+            f"p95 {wall_ms[int(len(wall_ms) * 0.95) - 1]:.2f}ms, cpu {cpu * 1000 / len(wall_ms):.2f}ms/turn\n"
+        )
+    saved = summary["workflow"] - summary["direct"]
+    sys.stdout.write(f"direct saves {saved:.2f}ms per turn ({saved / summary['workflow']:.0%} of the median)\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Import-time budget for the web app.
+
+Imports app.main in a fresh interpreter with none of the required settings in the
+environment, and fails if that import fails or builds Settings, if any provider SDK
+is loaded eagerly, or if it takes longer than the budget. Settings and the SDKs must
+stay lazy, see app/core/config.py and app/conversation/dependencies.py.
+
+The budget is relative to importing the web framework alone in another fresh
+interpreter on the same machine, so slow machines are not failed for being slow.
+An absolute budget in milliseconds can be given instead.
+
+Usage: python scripts/check_import_time.py [budget_ms]
+"""
+import os
+import subprocess
+import sys
+
+# app.main may take this many times as long as the framework it is built on
+DEFAULT_BUDGET_RATIO = 3.0
+LAZY_MODULES = ("llama_index", "google.genai", "elevenlabs", "workflows")
+# the app can not be configured without these, importing it must not need them
+REQUIRED_SETTINGS = ("DATABASE_URL", "GOOGLE_API_KEY", "ELEVENLABS_API_KEY")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import app.main
+elapsed_ms = (time.perf_counter() - start) * 1000
+from app.core.config import get_settings
+eager = [m for m in {lazy!r} if m in sys.modules]
+print(f"{{elapsed_ms:.0f}}|{{','.join(eager)}}|{{get_settings.cache_info().currsize}}")
+"""
+
+BASELINE = """
+import time
+start = time.perf_counter()
+import fastapi, jinja2, pydantic_settings, sqlalchemy.orm, starlette.staticfiles
+print(f"{(time.perf_counter() - start) * 1000:.0f}")
+"""
+
+
+def run(code: str, env: dict[str, str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+
+
+def main() -> int:
+    env = {name: value for name, value in os.environ.items() if name not in REQUIRED_SETTINGS}
+
+    result = run(PROBE.format(lazy=LAZY_MODULES), env)
+    if result.returncode != 0:
+        sys.exit(f"importing app.main without {', '.join(REQUIRED_SETTINGS)} failed:\n{result.stderr}")
+    elapsed, eager, settings_built = result.stdout.strip().splitlines()[-1].split("|")
+
+    if len(sys.argv) > 1:
+        budget_ms = int(sys.argv[1])
+        budget = f"{budget_ms}ms"
+    else:
+        baseline_ms = int(run(BASELINE, env).stdout.strip())
+        budget_ms = int(baseline_ms * DEFAULT_BUDGET_RATIO)
+        budget = f"{budget_ms}ms, {DEFAULT_BUDGET_RATIO:g}x the {baseline_ms}ms of the framework alone"
+
+    errors = []
+    if int(settings_built):
+        errors.append("Settings were built while importing app.main")
+    if eager:
+        errors.append(f"provider SDKs imported eagerly: {eager}")
+    if int(elapsed) > budget_ms:
+        errors.append(f"import of app.main took {elapsed}ms, budget is {budget}")
+    if errors:
+        sys.exit("; ".join(errors))
+    sys.stdout.write(f"import of app.main took {elapsed}ms (budget {budget})\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,3 +11,6 @@ alembic upgrade head
 
 # Create initial data in DB
 python app/initial_data.py
+
+# Compile templates into the bytecode cache
+python -m app.core.templating
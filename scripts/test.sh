@@ -6,3 +6,4 @@ set -x
 coverage run -m pytest tests/
 coverage report
 coverage html --title "${@-coverage}"
+python scripts/check_import_time.py
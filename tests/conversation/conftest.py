@@ -0,0 +1,34 @@
+from collections.abc import Callable
+
+import pytest
+
+from app.conversation.services import ConversationService
+from app.core.config import get_settings
+from tests.conversation.fakes import FakeLLM, FakeTTS, build_workflow, fake_settings
+
+
+@pytest.fixture(autouse=True)
+def fake_provider_settings(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    for name, value in fake_settings(str(tmp_path)).items():
+        monkeypatch.setattr(get_settings(), name, value)
+
+
+@pytest.fixture
+def fake_llm() -> Callable[..., FakeLLM]:
+    return lambda **options: FakeLLM(get_settings().REPLY_MODELS[0], **options)
+
+
+@pytest.fixture
+def fake_tts() -> Callable[..., FakeTTS]:
+    return lambda **options: FakeTTS(**options)
+
+
+@pytest.fixture
+def make_service(fake_llm, fake_tts) -> Callable[..., ConversationService]:
+    """A conversation on the fake providers, run by `engine`."""
+
+    def make(engine: str, llm_options: dict | None = None, tts_options: dict | None = None) -> ConversationService:
+        workflow = build_workflow(fake_llm(**(llm_options or {})), fake_tts(**(tts_options or {})))
+        return ConversationService(workflow, engine=engine)
+
+    return make
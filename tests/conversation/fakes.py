@@ -0,0 +1,120 @@
+"""
+In-memory providers and services for running conversation turns without network or
+database, shared by the engine parity tests and scripts/benchmark_engines.py.
+"""
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+from app.conversation.parsing import FUSED_REPLY_SEPARATOR
+from app.conversation.schemas import Feedback, FeedbackResponse
+from app.core.config import get_settings
+
+TRANSCRIPTION = "hola que tal estas"
+REPLY = "Muy bien, gracias. Y tu, que tal el dia?"
+FEEDBACK = FeedbackResponse(feedback=[Feedback(type="tip", reasoning="Mind the accents.")])
+
+
+class FakeLLM:
+    """Answers transcription, fused and reply prompts, and feedback as structured JSON."""
+
+    def __init__(self, model: str, token_delay: float = 0.0, fail: bool = False):
+        self.model = model
+        self.token_delay = token_delay
+        self.fail = fail
+
+    @staticmethod
+    def _answer(messages) -> str:
+        last = messages[-1].content or ""
+        if "Transcribe this audio." in last:
+            return TRANSCRIPTION
+        if FUSED_REPLY_SEPARATOR in last:
+            return f"{TRANSCRIPTION}\n{FUSED_REPLY_SEPARATOR}\n{REPLY}"
+        return REPLY
+
+    async def astream_chat(self, messages, generation_config: dict | None = None):
+        if self.fail:
+            raise ConnectionError("provider unavailable")
+        text = FEEDBACK.model_dump_json() if generation_config else self._answer(messages)
+
+        async def deltas():
+            for i in range(0, len(text), 8):
+                if self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+                else:
+                    await asyncio.sleep(0)
+                yield SimpleNamespace(delta=text[i:i + 8])
+
+        return deltas()
+
+    def as_structured_llm(self, output_cls):
+        async def achat(messages):
+            return SimpleNamespace(raw=FEEDBACK)
+
+        return SimpleNamespace(achat=achat)
+
+
+class FakeTTS:
+    model_id = "fake-tts"
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+
+    async def prewarm(self, inactivity_timeout: int = 60):
+        pass
+
+    async def release(self):
+        pass
+
+    async def stream(self, text):
+        async for delta in text:
+            if self.fail:
+                raise ConnectionError("tts unavailable")
+            yield b"\x00\x01" * len(delta)
+
+
+def build_workflow(llm: FakeLLM | None = None, tts: FakeTTS | None = None):
+    from app.conversation.workflows import ConversationWorkflow
+
+    app_settings = SimpleNamespace(evaluation_prompt="Correct grammar.", voice_id="voice")
+    return ConversationWorkflow(
+        settings_service=SimpleNamespace(get_settings=lambda: app_settings),
+        persona_service=SimpleNamespace(
+            get_persona=lambda persona_id: SimpleNamespace(id=persona_id, prompt="A friendly barista.")
+        ),
+        language_profile_service=SimpleNamespace(
+            get_language_profile=lambda profile_id: SimpleNamespace(
+                id=profile_id, target_language="es", feedback_mode="immediate"
+            )
+        ),
+        llm=llm or FakeLLM(get_settings().REPLY_MODELS[0]),
+        elevenlabs_tts=tts or FakeTTS(),
+    )
+
+
+def fake_settings(audio_dir: str) -> dict:
+    """Audio goes to `audio_dir` and the fake providers are not rate limited."""
+    return {
+        "AUDIO_OUTPUT_DIR": audio_dir,
+        "GEMINI_REQUESTS_PER_MINUTE": 0,
+        "GEMINI_TOKENS_PER_MINUTE": 0,
+        "ELEVENLABS_REQUESTS_PER_MINUTE": 0,
+    }
+
+
+def configure_for_fakes():
+    settings = get_settings()
+    for name, value in fake_settings(tempfile.mkdtemp(prefix="engine-audio-")).items():
+        setattr(settings, name, value)
+
+
+async def run_turn(service, user_message_data: str | bytes, audio_mode: str | None = None) -> list[dict]:
+    return [
+        event
+        async for event in service.run_conversation_turn(
+            user_message_data=user_message_data,
+            persona_id=1,
+            language_profile_id=1,
+            audio_mode=audio_mode,
+        )
+    ]
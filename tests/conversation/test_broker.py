@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.conversation.broker import ConversationBroker, ConversationJob, ConversationJobEvent
+from app.conversation.enums import ConversationJobKind
+from app.conversation.worker import ConversationWorker
+from app.core.config import get_settings
+
+
+class SilentBroker(ConversationBroker):
+    """Takes jobs and never answers, like a worker that hangs."""
+
+    def submit(self, job: ConversationJob):
+        pass
+
+
+def test_turn_fails_when_the_worker_sends_no_end_in_time(monkeypatch: pytest.MonkeyPatch) -> None:
+    # turn_timeout() is the budget plus 15s
+    monkeypatch.setattr(get_settings(), "TURN_BUDGET_SECONDS", -15)
+    monkeypatch.setattr(get_settings(), "CONVERSATION_TURN_MARGIN_SECONDS", 0.05)
+    broker = SilentBroker()
+    job = ConversationJob(kind=ConversationJobKind.RUN_TURN, conversation_id="conversation", turn_id="turn")
+
+    async def run():
+        return [event async for event in broker.stream_turn(job)]
+
+    with pytest.raises(RuntimeError, match="did not finish"):
+        asyncio.run(run())
+    assert broker._turns == {}
+    assert broker._turn_conversations == {}
+
+
+def test_dead_worker_fails_its_pending_turns() -> None:
+    broker = SilentBroker()
+    job = ConversationJob(kind=ConversationJobKind.RUN_TURN, conversation_id="conversation", turn_id="turn")
+
+    async def run():
+        turn = asyncio.create_task(anext(broker.stream_turn(job)))
+        await asyncio.sleep(0)
+        broker._fail_turns(["turn"], "conversation-worker-0 exited")
+        await turn
+
+    with pytest.raises(RuntimeError, match="conversation-worker-0 exited"):
+        asyncio.run(run())
+
+
+class RecordingBroker(ConversationBroker):
+    def __init__(self):
+        super().__init__()
+        self.jobs: list[ConversationJob] = []
+
+    def submit(self, job: ConversationJob):
+        self.jobs.append(job)
+        if job.kind == ConversationJobKind.RUN_TURN:
+            self._dispatch(ConversationJobEvent(job.conversation_id, job.turn_id, {"type": "chunk"}))
+
+
+def test_turn_given_up_on_is_cancelled_in_its_worker() -> None:
+    broker = RecordingBroker()
+    job = ConversationJob(kind=ConversationJobKind.RUN_TURN, conversation_id="conversation", turn_id="turn")
+
+    async def run():
+        stream = broker.stream_turn(job)
+        await anext(stream)
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert [(job.kind, job.turn_id) for job in broker.jobs] == [
+        (ConversationJobKind.RUN_TURN, "turn"),
+        (ConversationJobKind.CANCEL_TURN, "turn"),
+    ]
+    assert "turn" in broker._abandoned_turns
+
+
+def test_worker_stops_a_cancelled_turn() -> None:
+    emitted: list[ConversationJobEvent] = []
+
+    async def endless_turn(**payload):
+        while True:
+            await asyncio.sleep(0.01)
+            yield {"type": "chunk"}
+
+    conversation = SimpleNamespace(
+        lock=asyncio.Lock(),
+        db=SimpleNamespace(commit=lambda: None, rollback=lambda: None),
+        service=SimpleNamespace(run_conversation_turn=endless_turn),
+    )
+
+    async def run():
+        worker = ConversationWorker()
+        worker._conversations["conversation"] = asyncio.get_running_loop().create_future()
+        worker._conversations["conversation"].set_result(conversation)
+        turn = asyncio.create_task(
+            worker.handle(
+                ConversationJob(kind=ConversationJobKind.RUN_TURN, conversation_id="conversation", turn_id="turn"),
+                emitted.append,
+            )
+        )
+        await asyncio.sleep(0.05)
+        await worker.handle(
+            ConversationJob(kind=ConversationJobKind.CANCEL_TURN, conversation_id="conversation", turn_id="turn"),
+            emitted.append,
+        )
+        await asyncio.wait_for(turn, timeout=1)
+        return worker
+
+    worker = asyncio.run(run())
+    assert emitted and all(message.event is not None for message in emitted)
+    assert worker._running_turns == {}
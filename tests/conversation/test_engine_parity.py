@@ -0,0 +1,79 @@
+"""
+The same scenarios run through ConversationService on the llama-index Workflow and on
+the direct pipeline must produce the same events and history. Events are compared per
+event type, in order: the feedback and audio tails run concurrently in both engines,
+so how their events interleave is not deterministic.
+"""
+import asyncio
+import re
+from collections import defaultdict
+
+import pytest
+
+from app.core.config import get_settings
+from tests.conversation.fakes import run_turn
+
+ENGINES = ("workflow", "direct")
+AUDIO = b"RIFF\x24\x00\x00\x00WAVEfmt " + b"\x00" * 64
+_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def normalized(events: list[dict]) -> dict[str, list]:
+    by_type = defaultdict(list)
+    for event in events:
+        data = event["data"]
+        if isinstance(data, dict) and "audio_url" in data:
+            # every turn writes its audio under a fresh id
+            data = {**data, "audio_url": _UUID.sub("<id>", data["audio_url"])}
+        by_type[str(event["type"])].append(data)
+    return dict(by_type)
+
+
+async def two_text_turns(service):
+    return await run_turn(service, "hola") + await run_turn(service, "que tal")
+
+
+@pytest.mark.parametrize(
+    ("overrides", "llm_options", "tts_options", "scenario"),
+    [
+        pytest.param({}, {}, {}, lambda service: run_turn(service, "hola, que tal?"), id="text turn"),
+        pytest.param({}, {}, {}, two_text_turns, id="two text turns"),
+        pytest.param({}, {}, {}, lambda service: run_turn(service, AUDIO), id="audio turn"),
+        pytest.param(
+            {"FUSED_VOICE_TURNS": True}, {}, {}, lambda service: run_turn(service, AUDIO), id="fused voice turn"
+        ),
+        pytest.param(
+            {}, {}, {}, lambda service: run_turn(service, "hola", audio_mode="on_demand"), id="on demand audio"
+        ),
+        pytest.param({}, {}, {}, lambda service: run_turn(service, "hola", audio_mode="off"), id="audio off"),
+        pytest.param(
+            {"REPLY_DEADLINE_SECONDS": 0.05},
+            {"token_delay": 0.02},
+            {},
+            lambda service: run_turn(service, "hola"),
+            id="reply deadline",
+        ),
+        pytest.param({}, {}, {"fail": True}, lambda service: run_turn(service, "hola"), id="speech failure"),
+        pytest.param({}, {"fail": True}, {}, lambda service: run_turn(service, "hola"), id="provider failure"),
+    ],
+)
+def test_engines_produce_the_same_events(
+    monkeypatch: pytest.MonkeyPatch, make_service, overrides, llm_options, tts_options, scenario
+) -> None:
+    for name, value in overrides.items():
+        monkeypatch.setattr(get_settings(), name, value)
+
+    async def run(engine: str):
+        service = make_service(engine, llm_options, tts_options)
+        events = await scenario(service)
+        history = [(str(message.role), message.content) for message in service.workflow.history]
+        return normalized(events), history
+
+    async def run_both():
+        return {engine: await run(engine) for engine in ENGINES}
+
+    results = asyncio.run(run_both())
+    workflow_events, workflow_history = results["workflow"]
+    direct_events, direct_history = results["direct"]
+    assert direct_events == workflow_events
+    assert direct_history == workflow_history
@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.conversation.feedback_batching import FeedbackBatcher, FeedbackRequest
+
+
+class UnparsableLLM:
+    """Answers every batch with a response whose structured parse failed."""
+
+    model = "fake-model"
+
+    def as_structured_llm(self, output_cls):
+        async def achat(messages):
+            return SimpleNamespace(raw=None)
+
+        return SimpleNamespace(achat=achat)
+
+
+def request(turn_id: str) -> FeedbackRequest:
+    return FeedbackRequest(
+        turn_id=turn_id,
+        user_message="hola",
+        ai_response="hola, que tal?",
+        persona_prompt="A friendly barista.",
+        evaluation_prompt="Correct grammar.",
+        target_language="es",
+    )
+
+
+def test_unparsable_batch_sends_every_turn_back_to_one_by_one_evaluation() -> None:
+    batcher = FeedbackBatcher(max_turns=2, window_seconds=10)
+
+    async def run():
+        llm = UnparsableLLM()
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.evaluate(request("a"), llm), batcher.evaluate(request("b"), llm)), timeout=1
+        )
+
+    assert asyncio.run(run()) == [None, None]
@@ -0,0 +1,29 @@
+import asyncio
+
+from app.conversation.services import ConversationService
+from app.core.config import get_settings
+from app.core.rate_limiting import Priority, get_provider_limiter
+from tests.conversation.fakes import FakeTTS, build_workflow, run_turn
+
+
+def test_reply_releases_its_llm_slot_while_speech_waits_for_a_tts_slot(fake_llm, fake_tts) -> None:
+    async def run():
+        tts_limiter = get_provider_limiter("elevenlabs", FakeTTS.model_id)
+        llm_limiter = get_provider_limiter("gemini", get_settings().REPLY_MODELS[0])
+        held = [tts_limiter.limit(priority=Priority.INTERACTIVE) for _ in range(tts_limiter.max_concurrency)]
+        for slot in held:
+            await slot.__aenter__()
+        service = ConversationService(build_workflow(fake_llm(), fake_tts()), engine="direct")
+        turn = asyncio.create_task(run_turn(service, "hola"))
+        try:
+            while tts_limiter.queued == 0:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.1)
+            assert llm_limiter.in_flight == 0
+        finally:
+            for slot in held:
+                await slot.__aexit__(None, None, None)
+        events = await turn
+        assert any(str(event["type"]) == "ai_audio_ready" for event in events)
+
+    asyncio.run(run())